@@ -1,22 +1,51 @@
 """
 gateway.py – API Gateway asynchrone + cache Redis
 ───────────────────────────────────────────────────────────────────────────────
-• Sert de façade entre le frontend et le backend MIB (/assets & /machine)
+• Sert de façade entre le frontend et le backend MIB (/assets, /machine(s))
 • Met en cache Redis (TTL = CACHE_TTL) pour soulager le backend
-• Trois endpoints :
+• /api/status : stale-while-revalidate (frais < CACHE_TTL, servi périmé
+  jusqu’à CACHE_STALE_TTL pendant qu’un rafraîchissement tourne en fond)
+• ETag + If-None-Match (304) sur /api/status et /api/machine
+• Corps JSON en cache / reçus du backend renvoyés en octets, sans décodage ;
+  réponses construites via orjson si installé ; GZip (hors flux SSE / NDJSON)
+• Agrégation bornée par STATUS_BUDGET : VM en retard reprises de l’agrégat
+  précédent ("stale") ou listées dans "missing", entrée marquée partielle
+  (servie mais rafraîchie à la requête suivante)
+• STATUS_AGGREGATE_REFS=1 : status:<client> ne garde que les ids, les VM sont
+  relues dans les machine:<id> du backend (valeurs Redis : cf. redis_cache.Codec)
+• /metrics Prometheus : routes, appels backend, cache Redis, fan-out
+• Server-Timing (timings du backend repris en « be-* »), ?profile=1
+• Endpoints :
       1. GET /api/status/<client>   → assets + checks, agrégé & mis en cache
+         GET /api/status/<client>/stream → idem en NDJSON, VM par VM
+         GET /api/status/<client>/checks → checks filtrés / triés / paginés
       2. GET /api/machine/<vm>      → détail direct (pas de cache ici)
       3. GET /api/vmnames/<client>  → liste des noms de VM (auto-complétion)
+      4. GET /api/stream/<client>   → flux SSE des changements (deltas)
+      5. GET /api/summary           → compteurs par client (résumé backend)
+      6. GET /api/checks?status=    → checks d’un statut, tous clients
+      7. GET /api/machine/<vm>/history, /api/history/transitions
+                                    → historique des transitions (backend)
 """
 
 from __future__ import annotations
-import os, asyncio, json
+import os, json, asyncio, time, logging
+from typing import Any, Optional
 from urllib.parse import quote
 
 import httpx
-import redis
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from redis_cache import RedisCache, dumps, dumpb, etag_of, etag_matches
+from singleflight import RedisSingleFlight, SingleFlightError
+from stream import StreamHubs, ndjson
+from checks import CheckTables, CHECKS_PAGE_SIZE
+from timing import ServerTimingMiddleware, span, merge
+from metrics import (REGISTRY, IN_FLIGHT, CONTENT_TYPE, MetricsMiddleware,
+                     cache_event, metrics_text, upstream_hooks)
 
 # ═════════════════════════════════════════════════════════════════════════════
 # Paramètres / environnement
@@ -26,14 +55,64 @@ MIB_BACKEND = os.getenv("MIB_BACKEND_URL", "http://localhost:5001")
 REDIS_HOST  = os.getenv("REDIS_HOST", "localhost")   # conteneur ou localhost
 REDIS_PORT  = int(os.getenv("REDIS_PORT", "6379"))
 CACHE_TTL   = int(os.getenv("CACHE_TTL", "120"))     # secondes (2 min par défaut)
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "3600"))  # durée de vie max (SWR)
+STATUS_AGGREGATE_REFS = os.getenv("STATUS_AGGREGATE_REFS", "0") == "1"  # status:<client> → refs
+STATUS_BUDGET        = float(os.getenv("STATUS_BUDGET",        "8"))    # s ; 0 = pas d’échéance
+STATUS_BUDGET_MARGIN = float(os.getenv("STATUS_BUDGET_MARGIN", "0.5"))  # s laissés au retour
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))   # octets ; 0 = pas de compression
+GZIP_LEVEL    = int(os.getenv("GZIP_LEVEL",    "5"))
+
+# Pool HTTP vers le backend (un seul client pour tout le process)
+HTTP_TIMEOUT          = float(os.getenv("HTTP_TIMEOUT",          "15"))
+HTTP_MAX_CONNECTIONS  = int(os.getenv("HTTP_MAX_CONNECTIONS",    "100"))
+HTTP_MAX_KEEPALIVE    = int(os.getenv("HTTP_MAX_KEEPALIVE",      "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# /api/status/<client>/stream : taille des lots /machines et lots en vol
+# (lots courts : une VM lente ne retient que quelques voisines)
+STATUS_STREAM_BATCH       = int(os.getenv("STATUS_STREAM_BATCH",       "5"))
+STATUS_STREAM_CONCURRENCY = int(os.getenv("STATUS_STREAM_CONCURRENCY", "8"))
 
-# Connexion Redis (decode_responses =True → str plutôt que bytes)
-rds = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+# Connexion Redis asynchrone (pool partagé, cf. redis_cache.py)
+rcache = RedisCache(REDIS_HOST, REDIS_PORT)
+
+# Miss concurrents sur status:<client> → une seule agrégation (tous réplicas)
+flights = RedisSingleFlight(rcache)
+
+logger = logging.getLogger("gateway")
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Réponses JSON : corps déjà sérialisés renvoyés tels quels, sinon dumpb (orjson)
+# ═════════════════════════════════════════════════════════════════════════════
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumpb(content)
+
+def raw_json(body: bytes, headers: Optional[dict] = None,
+             media_type: str = "application/json") -> Response:
+    return Response(body, media_type=media_type, headers=headers)
+
+class SelectiveGZip:
+    """GZip sauf sur les flux (SSE / NDJSON) : le tampon gzip retarderait les événements."""
+
+    def __init__(self, app, minimum_size: int, level: int):
+        self.app  = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=level)
+
+    @staticmethod
+    def is_stream(path: str) -> bool:       # /api/status/<c>/stream, /api/stream/<c>
+        return path.endswith("/stream") or path.startswith("/api/stream/")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self.is_stream(scope["path"]):
+            return await self.gzip(scope, receive, send)
+        return await self.app(scope, receive, send)
 
 # ═════════════════════════════════════════════════════════════════════════════
 # Initialisation FastAPI
 # ═════════════════════════════════════════════════════════════════════════════
-app = FastAPI(title="MIB API-Gateway (async + Redis)")
+app = FastAPI(title="MIB API-Gateway (async + Redis)",
+              default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,99 +121,510 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if GZIP_MIN_SIZE:
+    app.add_middleware(SelectiveGZip, minimum_size=GZIP_MIN_SIZE, level=GZIP_LEVEL)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 @app.get("/")
 def home():
     return {"message": "API-Gateway MIB opérationnel."}
 
 # ═════════════════════════════════════════════════════════════════════════════
-# Helpers Redis : lecture / écriture JSON
+# Client HTTP poolé : créé au startup, fermé au shutdown
 # ═════════════════════════════════════════════════════════════════════════════
-def rget(key: str):
-    """Lecture JSON → objet Python (None si absent)."""
-    val = rds.get(key)
-    return json.loads(val) if val else None
+_http: httpx.AsyncClient | None = None
+
+def backend_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks=upstream_hooks("backend"),
+        )
+    return _http
+
+@app.on_event("startup")
+async def _startup():
+    backend_http()
+    await rcache.startup()
 
-def rset(key: str, obj):
-    """Écriture objet Python → JSON + TTL."""
-    rds.setex(key, CACHE_TTL, json.dumps(obj))
+@app.on_event("shutdown")
+async def _shutdown():
+    if _http is not None:
+        await _http.aclose()
+    await rcache.shutdown()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(metrics_text(), media_type=CONTENT_TYPE)
+
+@app.get("/stats/http")
+def http_stats():
+    """État du pool httpcore vers le backend."""
+    pool  = getattr(getattr(_http, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", []) or [])
+    return {
+        "open"           : _http is not None and not _http.is_closed,
+        "connections"    : len(conns),
+        "idle"           : sum(1 for c in conns if c.is_idle()),
+        "queued"         : len(getattr(pool, "_requests", []) or []),
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive"  : HTTP_MAX_KEEPALIVE,
+    }
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Helpers Redis : corps JSON stockés tels quels (relus en bytes, sans décodage)
+# ═════════════════════════════════════════════════════════════════════════════
+async def rget(key: str) -> Optional[bytes]:
+    """Lecture → corps JSON (None si absent)."""
+    raw = await rcache.get_json(key)
+    cache_event("redis", key, raw is not None)
+    if raw is not None and not isinstance(raw, bytes):      # entrée d’avant set_raw
+        raw = dumpb(raw)
+    return raw
+
+async def rset(key: str, obj) -> bytes:
+    """Écriture objet Python → corps JSON + TTL ; renvoie le corps."""
+    body = dumpb(obj)
+    await rcache.set_raw(key, body, CACHE_TTL)
+    return body
+
+# --- entrées SWR : b"{"t": écrit-à, "e": ETag}\n" + corps JSON, TTL = CACHE_STALE_TTL
+#     Le corps est celui du backend, jamais décodé pour être resservi ;
+#     entry_value() ne le décode qu’à la demande (table des checks, flux).
+#     STATUS_AGGREGATE_REFS=1 : {"t", "e", "r": [assetId…]} – les VM sont relues
+#     dans les machine:<id> du backend (MGET) au lieu d’être recopiées ici,
+#     gardés MACHINE_KEEP_TTL ≥ CACHE_STALE_TTL ; une VM expirée côté backend
+#     rend l’entrée partielle ("p" → servie, rafraîchie en fond)
+async def rget_swr(key: str):
+    with span("redis_read"):
+        entry = await rcache.get_json(key)
+        if isinstance(entry, bytes):
+            meta, _, body = entry.partition(b"\n")
+            entry = {**json.loads(meta), "b": body}
+        elif isinstance(entry, dict) and "r" in entry:
+            entry = await resolve_refs(entry)
+    return entry if isinstance(entry, dict) and "e" in entry else None
+
+async def rset_swr(key: str, body: bytes, partial: int = 0) -> dict:
+    entry = {"t": time.time(), "e": etag_of(body), "b": body}
+    if partial:
+        entry["p"] = partial                # VM absentes ou reprises de l’agrégat précédent
+    frame = dumpb({k: v for k, v in entry.items() if k != "b"}) + b"\n" + body
+    with span("redis_write"):
+        await rcache.set_raw(key, frame, max(CACHE_STALE_TTL, CACHE_TTL))
+    return entry
+
+async def rset_swr_refs(key: str, obj, refs: list) -> dict:
+    with span("serialize"):
+        tags  = [etag_of(dumps(vm)) for vm in obj["data"]]   # = ETag des machine:<id>
+        entry = {"t": time.time(), "e": refs_etag(tags), "v": obj}
+    with span("redis_write"):
+        await rcache.set_json(key, {"t": entry["t"], "e": entry["e"], "r": refs},
+                              max(CACHE_STALE_TTL, CACHE_TTL))
+    return entry
+
+def refs_etag(tags) -> str:
+    return etag_of("|".join(tags))
+
+async def resolve_refs(entry: dict) -> Optional[dict]:
+    envs  = await rcache.mget_json([f"machine:{i}" for i in entry["r"]])
+    found = [(i, env) for i, env in zip(entry["r"], envs)
+             if isinstance(env, dict) and "e" in env]
+    if not found:
+        return None
+    # ETag recalculé : suit les machine:<id> réécrits depuis (poller, /machine)
+    out = {"t": entry["t"], "e": refs_etag(env["e"] for _, env in found),
+           "v": {"data": [env["v"] for _, env in found], "ids": [i for i, _ in found]}}
+    if len(found) < len(entry["r"]):            # VM expirées : servie partielle, à rafraîchir
+        out["p"] = len(entry["r"]) - len(found)
+    return out
+
+def entry_body(entry: dict) -> bytes:
+    if "b" not in entry:
+        with span("serialize"):
+            entry["b"] = dumpb(entry["v"])
+    return entry["b"]
+
+def entry_value(entry: dict):
+    if "v" not in entry:
+        entry["v"] = json.loads(entry["b"])
+    return entry["v"]
+
+def is_fresh(entry: dict) -> bool:
+    """Entrée partielle : toujours à rafraîchir, même jeune."""
+    return not entry.get("p") and time.time() - entry["t"] < CACHE_TTL
+
+def swr_response(request: Request, entry: dict, state: str) -> Response:
+    cache_event("redis", "status:", "hit" if state == "fresh" else state)
+    age = max(0, int(time.time() - entry["t"]))
+    headers = {"Age": str(age), "X-Cache": state, "ETag": entry["e"]}
+    if entry.get("p"):
+        headers["X-Partial"] = str(entry["p"])
+    if etag_matches(request.headers.get("if-none-match"), entry["e"]):
+        return Response(status_code=304, headers=headers)
+    return raw_json(entry_body(entry), headers)
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 1)  /api/status/<client>  – liste des VM d’un client + checks
-#     ↳ lourde : agrège un appel /assets + N appels /machine
-#     ↳ résultat mis en cache Redis
+#     ↳ un seul appel backend /machines?client= (MGET + fetch borné côté backend)
+#     ↳ résultat mis en cache Redis, miss concurrents coalescés (single-flight)
+#     ↳ périmé (CACHE_TTL < âge < CACHE_STALE_TTL) → servi tout de suite,
+#       un seul rafraîchissement planifié en tâche de fond
 # ═════════════════════════════════════════════════════════════════════════════
+_refreshing: dict[str, asyncio.Task] = {}
+REGISTRY.on_collect(lambda: IN_FLIGHT.set(len(_refreshing), stage="swr_refresh"))
+
 @app.get("/api/status/{client}")
-async def get_assets_by_client(client: str):
+async def get_assets_by_client(client: str, request: Request):
+    cache_key = f"status:{client}"
+    entry = await rget_swr(cache_key)
+    if entry is not None:                        # → hit Redis
+        if is_fresh(entry):
+            return swr_response(request, entry, "fresh")
+        schedule_refresh(client)
+        return swr_response(request, entry, "stale")
+
+    try:
+        entry = await refresh_client(client)
+    except SingleFlightError as exc:
+        raise HTTPException(502, str(exc))
+    return swr_response(request, entry, "miss")
+
+async def refresh_client(client: str) -> dict:
+    cache_key = f"status:{client}"
+    return await flights.do(cache_key,
+                            lambda: aggregate_client(client),
+                            lambda: rget_swr(cache_key))
+
+def schedule_refresh(client: str):
+    if client in _refreshing:
+        return
+
+    async def run():
+        try:
+            await refresh_client(client)
+        except Exception as e:
+            logger.warning(f"Rafraîchissement SWR KO pour {client} : {e}")
+        finally:
+            _refreshing.pop(client, None)
+
+    _refreshing[client] = asyncio.create_task(run())
+
+async def aggregate_client(client: str) -> dict:
+    cache_key = f"status:{client}"
+    params = {"client": client}
+    # ─────────── assets + détail de chaque VM : un seul appel batch ──────────
+    #   budget transmis au backend (échéance des fetch /status par VM), marge
+    #   gardée pour la réponse ; au-delà de STATUS_BUDGET l’appel est abandonné
+    if STATUS_BUDGET > 0:
+        params["budget"] = max(0.1, STATUS_BUDGET - STATUS_BUDGET_MARGIN)
+    with span("backend"):
+        call = backend_http().get(f"{MIB_BACKEND}/machines", params=params)
+        try:
+            r = await (asyncio.wait_for(call, STATUS_BUDGET) if STATUS_BUDGET > 0 else call)
+        except asyncio.TimeoutError:
+            raise HTTPException(504, f"Backend sans réponse après {STATUS_BUDGET} s")
+    merge("be", r.headers.get("server-timing"))
+    r.raise_for_status()
+    if r.headers.get("x-partial"):               # échéance dépassée côté backend
+        return await fill_partial(cache_key, r.json())
+    if STATUS_AGGREGATE_REFS:
+        body     = r.json()
+        enriched = body.get("data", [])         # VM en échec déjà écartées
+        ids      = body.get("ids")
+        if ids and len(ids) == len(enriched):
+            return await rset_swr_refs(cache_key, {"data": enriched}, ids)
+
+    return await rset_swr(cache_key, r.content)  # corps backend tel quel → write cache
+
+async def fill_partial(cache_key: str, body: dict) -> dict:
+    """VM manquantes reprises de l’agrégat précédent (listées dans "stale")."""
+    prev  = await rget_swr(cache_key)
+    known = {}
+    if prev is not None:
+        pv    = entry_value(prev)
+        known = dict(zip(map(str, pv.get("ids") or []), pv.get("data", [])))
+    gaps = body.get("missing", [])
+    missing, stale = [], list(body.get("stale", []))
+    for m in gaps:
+        vm = known.get(str(m.get("assetId")))
+        if vm is None:
+            missing.append(m)
+        else:
+            body["data"].append(vm)
+            body["ids"].append(str(m["assetId"]))
+            stale.append(str(m["assetId"]))
+    body.update(missing=missing, stale=stale, partial=True)
+    return await rset_swr(cache_key, dumpb(body), partial=len(gaps) or 1)
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1 bis)  /api/status/<client>/stream  – même contenu, en NDJSON progressif
+#     ↳ une ligne {"type": "vm", "data": VM} dès que son /machines revient
+#       (ordre d’arrivée), puis {"type": "end", "failed": [...], "skipped": [...]}
+#     ↳ entrée SWR présente (fraîche ou périmée) → rejouée depuis le cache,
+#       périmée : rafraîchissement en fond comme /api/status ; vrai miss →
+#       lots /machines, agrégat reconstitué écrit en fin de flux (rset_swr)
+# ═════════════════════════════════════════════════════════════════════════════
+@app.get("/api/status/{client}/stream")
+async def stream_assets_by_client(client: str):
+    entry = await rget_swr(f"status:{client}")
+    if entry is not None:
+        if not is_fresh(entry):
+            schedule_refresh(client)
+        body = replay_ndjson(entry_value(entry).get("data", []))
+    else:
+        body = fan_out_ndjson(client)
+    return StreamingResponse(body, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+async def replay_ndjson(vms: list):
+    for vm in vms:
+        yield ndjson({"type": "vm", "data": vm})
+    yield ndjson({"type": "end", "failed": [], "skipped": [], "source": "cache"})
+
+async def fan_out_ndjson(client: str):
     cache_key = f"status:{client}"
-    cached = rget(cache_key)
-    if cached is not None:                       # → hit Redis
-        return cached
-
-    encoded = quote(client)                      # encodage URL-safe
-    async with httpx.AsyncClient(timeout=15.0) as http:
-        # ───────────────── 1. récupérer les assets du client ────────────────
-        r_assets = await http.get(f"{MIB_BACKEND}/assets?client={encoded}")
-        r_assets.raise_for_status()
-        assets = r_assets.json().get("data", [])
-
-        # ───────────────── 2. détail de chaque VM en parallèle ──────────────
-        async def fetch_vm(asset):
-            name = asset.get("assetName")
-            if not name:
-                return None
-            try:
-                r = await http.get(f"{MIB_BACKEND}/machine/{name}")
-                if r.status_code == 200:
+    try:
+        r = await backend_http().get(f"{MIB_BACKEND}/assets", params={"client": client})
+        r.raise_for_status()
+        names = {str(a["assetId"]): a.get("assetName")
+                 for a in r.json().get("data", []) if a.get("assetId") is not None}
+    except Exception as e:
+        yield ndjson({"type": "end", "failed": [{"client": client, "error": str(e)}],
+                      "skipped": [], "source": "backend"})
+        return
+
+    ids = list(names)
+    sem = asyncio.Semaphore(STATUS_STREAM_CONCURRENCY)
+
+    async def batch(chunk: list) -> dict:
+        async with sem:
+            with IN_FLIGHT.track(stage="machines_batch"):
+                try:
+                    r = await backend_http().post(f"{MIB_BACKEND}/machines",
+                                                  json={"ids": chunk})
+                    r.raise_for_status()
                     return r.json()
-            except Exception:
-                pass                           # on ignore les échecs isolés
-            return None
+                except Exception as e:
+                    return {"errors": [{"assetId": i, "error": str(e)} for i in chunk]}
+
+    # lots de STATUS_STREAM_BATCH VM : chaque lot part dès que son /machines
+    # revient (N/STATUS_STREAM_BATCH allers-retours au lieu de N)
+    tasks = [asyncio.create_task(batch(ids[i:i + STATUS_STREAM_BATCH]))
+             for i in range(0, len(ids), STATUS_STREAM_BATCH)]
+    failed, stale, served = [], [], {}
+    try:
+        for fut in asyncio.as_completed(tasks):
+            res = await fut
+            for asset_id, vm in zip(res.get("ids", []), res.get("data", [])):
+                served[str(asset_id)] = vm
+                yield ndjson({"type": "vm", "data": vm})
+            failed.extend({**e, "machine": names.get(str(e.get("assetId")))}
+                          for e in res.get("errors", []))
+            stale.extend(res.get("stale", []))
+    finally:
+        for t in tasks:                       # client parti → lots restants annulés
+            t.cancel()
 
-        enriched = [
-            vm for vm in await asyncio.gather(*(fetch_vm(a) for a in assets))
-            if vm
-        ]
+    errored = {str(e.get("assetId")) for e in failed}
+    skipped = [i for i in ids if i not in errored and i not in served]
+    await store_fan_out(cache_key, ids, served, failed, stale, skipped, names)
+    yield ndjson({"type": "end", "failed": failed,
+                  "skipped": [names[i] or i for i in skipped], "source": "backend"})
 
-    result = {"data": enriched}
-    rset(cache_key, result)                     # → write cache
-    return result
+async def store_fan_out(cache_key: str, ids: list, served: dict, failed: list,
+                        stale: list, skipped: list, names: dict):
+    """Agrégat reconstitué (ordre de l’inventaire) → entrée SWR, comme aggregate_client."""
+    order = [i for i in ids if i in served]
+    body  = {"data": [served[i] for i in order], "ids": order,
+             "errors": [{k: v for k, v in e.items() if k != "machine"} for e in failed],
+             "stale": stale,
+             "missing": [{"assetId": i, "machine": names[i]} for i in skipped]}
+    try:
+        if STATUS_AGGREGATE_REFS and not skipped:
+            await rset_swr_refs(cache_key, {"data": body["data"]}, order)
+        else:
+            await rset_swr(cache_key, dumpb(body), partial=len(skipped))
+    except Exception as e:
+        logger.warning(f"Écriture SWR du flux {cache_key} KO : {e}")
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1 ter)  /api/status/<client>/checks  – checks filtrés, triés, paginés
+#     ↳ table aplatie une fois par version de l’agrégat SWR (cf. checks.py)
+#     ↳ ?status=&severity=&objectClass= (listes « a,b »), ?vm= (préfixe),
+#       ?sort=lastChange|severity, ?limit=, ?cursor= (renvoyé dans "next")
+#     ↳ pas encore d’agrégat → {"pending": true} + rafraîchissement en fond
+# ═════════════════════════════════════════════════════════════════════════════
+check_tables = CheckTables()
+
+def csv_param(value: Optional[str]) -> list:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+@app.get("/api/status/{client}/checks")
+async def query_client_checks(client: str, request: Request,
+                              status: Optional[str] = None,
+                              severity: Optional[str] = None,
+                              objectClass: Optional[str] = None,
+                              vm: str = "",
+                              sort: str = "lastChange",
+                              limit: int = CHECKS_PAGE_SIZE,
+                              cursor: Optional[str] = None):
+    entry = await rget_swr(f"status:{client}")
+    if entry is None or not is_fresh(entry):
+        schedule_refresh(client)
+    if entry is None:
+        return {"data": [], "next": None, "pending": True}
+
+    etag = etag_of(f"{entry['e']}|{request.url.query}")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    table = check_tables.get(client, entry["e"], entry_value(entry).get("data", []))
+    try:
+        page = table.query(status=csv_param(status), severity=csv_param(severity),
+                           object_class=csv_param(objectClass), vm_prefix=vm,
+                           sort=sort, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
+    return FastJSONResponse({**page, "pending": False}, headers={"ETag": etag})
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 2)  /api/machine/<vm>  – détail d’une VM (pas de cache ici)
+#     ↳ If-None-Match relayé au backend, 304 renvoyé tel quel
 # ═════════════════════════════════════════════════════════════════════════════
+def error_detail(r: httpx.Response) -> Any:
+    """detail d’une erreur backend ; corps non JSON (proxy, page HTML) → texte brut."""
+    if "json" in r.headers.get("content-type", ""):
+        try:
+            body = r.json()
+        except ValueError:
+            return r.text
+        return body.get("detail", r.text) if isinstance(body, dict) else body
+    return r.text
+
+async def proxy_conditional(request: Request, path: str, params=None) -> Response:
+    """GET backend avec If-None-Match relayé ; 304 / ETag repassés tels quels."""
+    inm = request.headers.get("if-none-match")
+    with span("backend"):
+        r = await backend_http().get(f"{MIB_BACKEND}{path}", params=params,
+                                     headers={"If-None-Match": inm} if inm else None)
+    merge("be", r.headers.get("server-timing"))
+    etag = r.headers.get("etag")
+    if r.status_code == 304:
+        return Response(status_code=304, headers={"ETag": etag or ""})
+    if r.status_code in (400, 404, 503):
+        raise HTTPException(r.status_code, error_detail(r))
+    r.raise_for_status()
+    return raw_json(r.content, {"ETag": etag} if etag else None,       # pas de re-sérialisation
+                    r.headers.get("content-type", "application/json"))
+
 @app.get("/api/machine/{machine_name}")
-async def get_machine(machine_name: str):
+async def get_machine(machine_name: str, request: Request):
     try:
-        async with httpx.AsyncClient(timeout=15.0) as http:
-            r = await http.get(f"{MIB_BACKEND}/machine/{machine_name}")
-            if r.status_code == 404:
-                raise HTTPException(404, "Machine non trouvée")
-            r.raise_for_status()
-            return r.json()
+        return await proxy_conditional(request, f"/machine/{quote(machine_name)}")
+    except HTTPException as exc:
+        if exc.status_code == 404:
+            raise HTTPException(404, "Machine non trouvée")
+        raise
     except Exception as e:
         raise HTTPException(500, f"Erreur lors du fetch machine : {e}")
 
+# ═════════════════════════════════════════════════════════════════════════════
+# 2 bis)  /api/summary, /api/checks?status=  – résumé de flotte du backend
+#     ↳ quelques Ko au lieu des agrégats complets (accueil, Critical/Warning)
+# ═════════════════════════════════════════════════════════════════════════════
+@app.get("/api/summary")
+async def get_summary(request: Request, client: Optional[str] = None):
+    try:
+        return await proxy_conditional(request, "/summary",
+                                       {"client": client} if client else None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Erreur lors du fetch summary : {e}")
+
+@app.get("/api/checks")
+async def get_checks(request: Request, status: str, client: Optional[str] = None):
+    params = {"status": status, **({"client": client} if client else {})}
+    try:
+        return await proxy_conditional(request, "/checks", params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Erreur lors du fetch checks : {e}")
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2 ter)  historique des transitions de statut (relayé tel quel)
+# ═════════════════════════════════════════════════════════════════════════════
+@app.get("/api/machine/{machine_name}/history")
+async def get_machine_history(machine_name: str, request: Request):
+    try:
+        return await proxy_conditional(request, f"/machine/{quote(machine_name)}/history",
+                                       dict(request.query_params))
+    except HTTPException as exc:
+        if exc.status_code == 404:
+            raise HTTPException(404, "Machine non trouvée")
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Erreur lors du fetch historique : {e}")
+
+@app.get("/api/history/transitions")
+async def get_transition_counts(request: Request):
+    try:
+        return await proxy_conditional(request, "/history/transitions",
+                                       dict(request.query_params))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Erreur lors du fetch historique : {e}")
+
 # ═════════════════════════════════════════════════════════════════════════════
 # 3)  /api/vmnames/<client>  – liste des noms de VM (auto-complétion)
 # ═════════════════════════════════════════════════════════════════════════════
 @app.get("/api/vmnames/{client}")
 async def list_vm_names(client: str):
     cache_key = f"vmnames:{client}"
-    cached = rget(cache_key)
+    cached = await rget(cache_key)
     if cached is not None:
-        return cached
+        return raw_json(cached)
 
     encoded = quote(client)
-    async with httpx.AsyncClient(timeout=15.0) as http:
-        r = await http.get(f"{MIB_BACKEND}/assets?client={encoded}")
-        r.raise_for_status()
-        names = [
-            a.get("assetName")
-            for a in r.json().get("data", [])
-            if a.get("assetName")
-        ]
-
-    result = {"names": names}
-    rset(cache_key, result)
-    return result
+    r = await backend_http().get(f"{MIB_BACKEND}/assets?client={encoded}")
+    r.raise_for_status()
+    names = [
+        a.get("assetName")
+        for a in r.json().get("data", [])
+        if a.get("assetName")
+    ]
+
+    return raw_json(await rset(cache_key, {"names": names}))
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 4)  /api/stream/<client>  – flux SSE des changements (cf. stream.py)
+#     ↳ relit l’agrégat via le cache SWR, ne pousse que les deltas
+# ═════════════════════════════════════════════════════════════════════════════
+async def load_client_vms(client: str) -> list:
+    entry = await rget_swr(f"status:{client}")
+    if entry is None:
+        entry = await refresh_client(client)
+    elif not is_fresh(entry):
+        schedule_refresh(client)
+    return entry_value(entry).get("data", [])
+
+hubs = StreamHubs(load_client_vms)
+
+@app.get("/api/stream/{client}")
+async def stream_client(client: str, request: Request):
+    return StreamingResponse(
+        hubs.events(client, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,185 @@
+# api-gateway/check_store.py
+"""
+Checks en colonnes (une ligne par check, toute la flotte ou un client)
+• Colonnes catégorielles encodées par dictionnaire : chaque chaîne stockée une
+  fois, un code de 1 à 4 octets par ligne (code 0 = clé absente)
+• Lignes d’une même clé (VM) contiguës, remplacées en bloc : les anciennes sont
+  marquées mortes, compactage quand elles dépassent les vivantes
+• Filtres vectorisés : masque d’octets par colonne (bytes.translate), ET des
+  masques en entiers, lignes retenues par itertools.compress
+• Les dicts ne sont construits qu’à la sortie (rows)
+• Module identique dans backend/ et api-gateway/ (contextes Docker séparés)
+"""
+
+from __future__ import annotations
+from array import array
+from itertools import compress
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+CHECK_FIELDS = ("objectClass", "parameter", "object", "status", "severity",
+                "lastChange", "description")
+COMPACT_MIN = 1024                      # lignes mortes tolérées avant compactage
+
+# filtre d’une colonne : valeurs acceptées, ou prédicat sur la valeur
+Filter = Union[Iterable[Any], Callable[[Any], bool]]
+
+_ABSENT = object()
+
+
+class Dictionary:
+    """Valeur ↔ code (0 réservé à « absent »)."""
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values: List[Any] = [None]
+        self._codes: Dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        c = self._codes.get(value)
+        if c is None:
+            c = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def codes(self, want: Filter) -> set:
+        if callable(want):
+            return {c for v, c in self._codes.items() if want(v)}
+        return {self._codes[v] for v in want if v in self._codes}
+
+    def __len__(self) -> int:
+        return len(self.values) - 1
+
+
+class Column:
+    __slots__ = ("dict", "codes")
+
+    def __init__(self):
+        self.dict  = Dictionary()
+        self.codes = array("B")
+
+    def extend(self, values: List[Any]):
+        code = self.dict.code
+        new = [0 if v is _ABSENT else code(v) for v in values]
+        top = len(self.dict.values) - 1
+        if top >> (8 * self.codes.itemsize):            # code trop large → colonne élargie
+            self.codes = array("H" if top < 1 << 16 else "I", self.codes)
+        self.codes.extend(new)
+
+    def get(self, row: int) -> Any:
+        c = self.codes[row]
+        return _ABSENT if c == 0 else self.dict.values[c]
+
+    def mask(self, codes: set) -> bytes:
+        """Un octet 0/1 par ligne."""
+        if self.codes.typecode == "B":
+            table = bytes(1 if i in codes else 0 for i in range(256))
+            return self.codes.tobytes().translate(table)
+        return bytes(1 if c in codes else 0 for c in self.codes)
+
+
+class CheckStore:
+    def __init__(self, key_fields: Sequence[str] = (),
+                 check_fields: Sequence[str] = CHECK_FIELDS,
+                 defaults: Optional[Dict[str, Any]] = None):
+        """
+        key_fields   : champs communs à toutes les lignes d’une clé (client, vm…)
+        check_fields : champs lus dans chaque check
+        defaults     : valeur mise à la place d’un champ vide (None, "")
+        """
+        self.fields    = tuple(key_fields) + tuple(check_fields)
+        self._key_fields, self._check_fields = tuple(key_fields), tuple(check_fields)
+        self._defaults = defaults or {}
+        self._reset()
+
+    # Écritures ---------------------------------------------------------------
+    def replace(self, key: Hashable, common: Dict[str, Any], checks: Iterable[dict]):
+        """Remplace toutes les lignes de key (checks vides → clé retirée)."""
+        self.remove(key)
+        checks = checks if isinstance(checks, list) else list(checks)
+        n = len(checks)
+        if n:                               # colonne par colonne : un extend chacune
+            for f in self._key_fields:
+                self._cols[f].extend([self._value(common, f)] * n)
+            for f in self._check_fields:
+                self._cols[f].extend([self._value(chk, f) for chk in checks])
+            self._ranges[key] = (len(self._alive), n)
+            self._alive.extend(b"\x01" * n)
+        if self._dead > max(COMPACT_MIN, len(self._alive) - self._dead):
+            self.compact()
+
+    def remove(self, key: Hashable):
+        r = self._ranges.pop(key, None)
+        if r is not None:
+            start, n = r
+            self._alive[start:start + n] = bytes(n)
+            self._dead += n
+
+    def compact(self):
+        """Réécrit les colonnes sans les lignes mortes ni les valeurs orphelines."""
+        old_cols, ranges = self._cols, self._ranges
+        self._reset()
+        for key, (start, n) in ranges.items():
+            new_start = len(self._alive)
+            for f, col in old_cols.items():
+                self._cols[f].extend([col.get(i) for i in range(start, start + n)])
+            self._alive.extend(b"\x01" * n)
+            self._ranges[key] = (new_start, n)
+
+    # Lectures ----------------------------------------------------------------
+    def mask(self, **filters: Filter) -> bytes:
+        """Lignes vivantes qui passent tous les filtres (un octet 0/1 par ligne)."""
+        n = len(self._alive)
+        bits = int.from_bytes(self._alive, "little")
+        for field, want in filters.items():
+            if not bits:
+                break
+            col = self._cols[field]
+            bits &= int.from_bytes(col.mask(col.dict.codes(want)), "little")
+        return bits.to_bytes(n, "little")
+
+    def select(self, **filters: Filter) -> List[int]:
+        return list(compress(range(len(self._alive)), self.mask(**filters)))
+
+    def rows(self, ids: Iterable[int], fields: Optional[Sequence[str]] = None) -> List[dict]:
+        cols = [(f, self._cols[f]) for f in (fields or self.fields)]
+        out = []
+        for i in ids:
+            row = {}
+            for f, col in cols:
+                c = col.codes[i]
+                if c:
+                    row[f] = col.dict.values[c]
+            out.append(row)
+        return out
+
+    def value(self, field: str, row: int) -> Any:
+        v = self._cols[field].get(row)
+        return None if v is _ABSENT else v
+
+    def keys(self) -> List[Hashable]:
+        return list(self._ranges)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows"    : len(self),
+            "dead"    : self._dead,
+            "distinct": {f: len(c.dict) for f, c in self._cols.items()},
+            "bytes"   : sum(len(c.codes) * c.codes.itemsize for c in self._cols.values())
+                        + len(self._alive),
+        }
+
+    def __len__(self) -> int:
+        return len(self._alive) - self._dead
+
+    # Internes ----------------------------------------------------------------
+    def _reset(self):
+        self._cols: Dict[str, Column] = {f: Column() for f in self.fields}
+        self._alive  = bytearray()
+        self._ranges: Dict[Hashable, Tuple[int, int]] = {}
+        self._dead   = 0
+
+    def _value(self, src: dict, field: str) -> Any:
+        v = src.get(field, _ABSENT)
+        if field in self._defaults and (v is _ABSENT or not v):
+            return self._defaults[field]
+        return v
@@ -0,0 +1,143 @@
+# api-gateway/checks.py
+"""
+Table des checks d’un client, aplatie une fois par version de l’agrégat
+• Une ligne par check (client, vm, objectClass, parameter, object, status…),
+  stockée en colonnes codées (check_store) plutôt qu’en dicts
+• Ordres de tri pré-calculés : lastChange (récent d’abord), severity
+• Filtres : status, severity, objectClass, préfixe de VM, évalués une fois par
+  valeur distincte puis appliqués en masque ; seuls les dicts de la page sont créés
+• Pagination par curseur (keyset) : stable même si l’agrégat change
+"""
+
+from __future__ import annotations
+import base64, bisect, json, os
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from check_store import CheckStore
+
+CHECKS_PAGE_SIZE  = int(os.getenv("CHECKS_PAGE_SIZE",  "100"))
+CHECKS_PAGE_MAX   = int(os.getenv("CHECKS_PAGE_MAX",   "1000"))
+CHECKS_TABLES_MAX = int(os.getenv("CHECKS_TABLES_MAX", "64"))
+
+SORT_KEYS = ("lastChange", "severity")
+
+# rang des sévérités connues (plus petit = plus grave), le reste ensuite
+SEVERITY_RANK = {"critical": 0, "major": 1, "high": 1, "minor": 2, "medium": 2,
+                 "warning": 3, "low": 4, "info": 5, "informational": 5}
+
+Row = Dict[str, Any]
+SortKey = Tuple[Any, ...]
+
+# valeurs affichées à la place d’un champ vide
+DEFAULTS = {"vm": "-", "objectClass": "-", "parameter": "-", "object": "-",
+            "status": "Unknown", "severity": "-", "lastChange": "Never",
+            "description": ""}
+
+
+def _tail(r: Row) -> Tuple[str, str]:
+    return (r["vm"], "|".join((r["objectClass"], r["parameter"], r["object"])))
+
+def sort_key(r: Row, sort: str) -> SortKey:
+    """Clé totale (ex-aequo départagés par VM puis check) → curseur non ambigu."""
+    if sort == "severity":
+        sev = r["severity"].lower()
+        return (SEVERITY_RANK.get(sev, 9), sev) + _tail(r)
+    # lastChange décroissant : on trie sur l’inverse des codes ("Never" en dernier)
+    lc = r["lastChange"]
+    if lc == "Never":
+        return (True, "") + _tail(r)
+    return (False, "".join(chr(0x10FFFF - ord(c)) for c in lc) + "\U0010FFFF") + _tail(r)
+
+
+def encode_cursor(sort: str, key: SortKey) -> str:
+    raw = json.dumps([sort, *key]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(sort: str, cursor: str) -> SortKey:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        name, *key = json.loads(base64.urlsafe_b64decode(cursor + pad))
+    except Exception:
+        raise ValueError("curseur invalide")
+    if name != sort:
+        raise ValueError("curseur émis pour un autre tri")
+    return tuple(key)
+
+
+class CheckTable:
+    def __init__(self, client: str, vms: List[dict]):
+        self.store = CheckStore(("client", "vm"), defaults=DEFAULTS)
+        for i, vm in enumerate(vms):        # clé = rang (deux VM peuvent porter le même nom)
+            self.store.replace(i, {"client": client, "vm": vm.get("machine")},
+                               vm.get("monitoring_details", []))
+        # tri fait une fois ici ; chaque requête ne fait que bisect + parcours.
+        # Les lignes transitoires ne servent qu’au calcul des clés.
+        ids  = self.store.select()
+        rows = self.store.rows(ids, ("vm", "objectClass", "parameter", "object",
+                                     "severity", "lastChange"))
+        self._orders: Dict[str, Tuple[List[SortKey], array]] = {}
+        for sort in SORT_KEYS:
+            keyed = sorted(((sort_key(r, sort), i) for r, i in zip(rows, ids)),
+                           key=lambda ki: ki[0])
+            self._orders[sort] = ([k for k, _ in keyed], array("I", (i for _, i in keyed)))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def query(self, *, status: Sequence[str] = (), severity: Sequence[str] = (),
+              object_class: Sequence[str] = (), vm_prefix: str = "",
+              sort: str = "lastChange", cursor: Optional[str] = None,
+              limit: int = CHECKS_PAGE_SIZE) -> Dict[str, Any]:
+        if sort not in self._orders:
+            raise ValueError(f"tri inconnu : {sort}")
+        keys, ordered = self._orders[sort]
+        try:
+            start = bisect.bisect_right(keys, decode_cursor(sort, cursor)) if cursor else 0
+        except TypeError:
+            raise ValueError("curseur invalide")
+        limit = max(1, min(limit, CHECKS_PAGE_MAX))
+
+        want_st  = {s.lower() for s in status}
+        want_sev = {s.lower() for s in severity}
+        want_cls = {s.lower() for s in object_class}
+        prefix   = vm_prefix.lower()
+        # status vide = tout sauf OK (comportement historique du tableau)
+        filters = {"status": (lambda st: st.lower() in want_st) if want_st
+                             else (lambda st: st.lower() != "ok")}
+        if want_sev:
+            filters["severity"] = lambda sev: sev.lower() in want_sev
+        if want_cls:
+            filters["objectClass"] = lambda cls: cls.lower() in want_cls
+        if prefix:
+            filters["vm"] = lambda vm: vm.lower().startswith(prefix)
+        keep = self.store.mask(**filters)
+
+        hits: List[int] = []                # positions dans l’ordre de tri
+        for pos in range(start, len(ordered)):
+            if keep[ordered[pos]]:
+                if len(hits) == limit:
+                    return {"data": self._page(ordered, hits),
+                            "next": encode_cursor(sort, keys[hits[-1]])}
+                hits.append(pos)
+        return {"data": self._page(ordered, hits), "next": None}
+
+    def _page(self, ordered: array, hits: List[int]) -> List[Row]:
+        return self.store.rows(ordered[pos] for pos in hits)
+
+
+class CheckTables:
+    """Une CheckTable par client, reconstruite quand l’ETag de l’agrégat change."""
+
+    def __init__(self, max_tables: int = CHECKS_TABLES_MAX):
+        self._tables: Dict[str, Tuple[str, CheckTable]] = {}
+        self._max = max_tables
+
+    def get(self, client: str, etag: str, vms: List[dict]) -> CheckTable:
+        hit = self._tables.pop(client, None)
+        if hit is None or hit[0] != etag:
+            hit = (etag, CheckTable(client, vms))
+        self._tables[client] = hit
+        if len(self._tables) > self._max:
+            self._tables.pop(next(iter(self._tables)))
+        return hit[1]
@@ -0,0 +1,204 @@
+# api-gateway/redis_cache.py
+"""
+Couche cache Redis asynchrone (redis.asyncio)
+• Pool de connexions partagé, ouvert au startup / fermé au shutdown
+• get/set JSON unitaires + lectures groupées (MGET) et écritures pipelinées (SETEX)
+• Une entrée illisible est traitée comme un miss (jamais d’exception côté handler)
+• Entrées « étiquetées » {"e": empreinte, "v": valeur} : l’ETag est calculé
+  une fois à l’écriture, les lectures n’ont plus qu’à le renvoyer
+• Valeurs encodées par un Codec : octet de version + format (msgpack par défaut,
+  ou JSON), compression zstd (ou zlib) au-delà de CACHE_COMPRESS_MIN ; l’ancien JSON texte
+  reste lisible (CACHE_WIRE_VERSION=0 pour écrire encore l’ancien format)
+• set_raw / corps déjà sérialisés : relus en bytes, renvoyés sans décodage
+• dumpb() : orjson si installé (sinon json) pour les corps construits ici
+"""
+
+from __future__ import annotations
+import os, json, zlib, hashlib, logging
+from typing import Any, Dict, List, Optional, Union
+
+import redis.asyncio as aioredis
+
+REDIS_HOST            = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT            = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+CACHE_CODEC        = os.getenv("CACHE_CODEC",    "msgpack")   # msgpack | json
+CACHE_COMPRESS     = os.getenv("CACHE_COMPRESS", "zstd")      # zstd | zlib | none
+CACHE_COMPRESS_MIN = int(os.getenv("CACHE_COMPRESS_MIN", "1024"))   # octets
+CACHE_WIRE_VERSION = int(os.getenv("CACHE_WIRE_VERSION", "1"))      # 0 = JSON texte
+
+logger = logging.getLogger("redis_cache")
+
+
+# ── JSON tolérant ────────────────────────────────────────────────────────────
+def loads(raw: Optional[Union[str, bytes]]) -> Any:
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.warning("Entrée Redis illisible — traitée comme absente")
+        return None
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+try:
+    import orjson
+except ImportError:                         # dépendance optionnelle
+    orjson = None
+
+def dumpb(obj: Any) -> bytes:
+    """Corps JSON (UTF-8) ; pas forcément identique à dumps() → pas pour les ETag."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# ── Codec des valeurs Redis ──────────────────────────────────────────────────
+#   v1 : [0x01][drapeaux][corps]   drapeaux = format (bits 0-1) | compression (bits 2-3)
+#   v0 : JSON texte brut (écrit avant le codec ; ne commence jamais par 0x01)
+try:
+    import msgpack
+except ImportError:                         # requirements.txt ; absent → repli JSON
+    msgpack = None
+try:
+    import zstandard
+except ImportError:                         # requirements.txt ; absent → repli zlib
+    zstandard = None
+
+WIRE_V1 = 0x01
+FORMATS     = {"json": 0, "msgpack": 1, "bytes": 2}   # bytes : corps opaque (set_raw)
+COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2}
+
+class Codec:
+    def __init__(self, fmt: str = CACHE_CODEC, compression: str = CACHE_COMPRESS,
+                 threshold: int = CACHE_COMPRESS_MIN, version: int = CACHE_WIRE_VERSION):
+        if fmt == "msgpack" and msgpack is None:
+            logger.warning("msgpack absent — valeurs Redis encodées en JSON")
+            fmt = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard absent — compression zlib")
+            compression = "zlib"
+        self.fmt, self.compression = fmt, compression
+        self.threshold, self.version = threshold, version
+        self._zc = zstandard.ZstdCompressor() if compression == "zstd" else None
+
+    def encode(self, obj: Any) -> bytes:
+        if self.version == 0:
+            return dumps(obj).encode()
+        if self.fmt == "msgpack":
+            return self._frame("msgpack", msgpack.packb(obj, use_bin_type=True))
+        return self._frame("json", dumpb(obj))
+
+    def pack(self, body: bytes) -> bytes:
+        """Corps opaque, relu tel quel par decode() ; toujours en v1 (clés nouvelles)."""
+        return self._frame("bytes", body)
+
+    def _frame(self, fmt: str, body: bytes) -> bytes:
+        comp = self.compression if len(body) >= self.threshold else "none"
+        if comp == "zlib":
+            body = zlib.compress(body, 6)
+        elif comp == "zstd":
+            body = self._zc.compress(body)
+        flags = FORMATS[fmt] | COMPRESSORS[comp] << 2
+        return bytes((WIRE_V1, flags)) + body
+
+    def decode(self, raw: Optional[Union[str, bytes]]) -> Any:
+        """Tout format connu, quel que soit le réglage d’écriture ; illisible → None."""
+        if not raw:
+            return None
+        if isinstance(raw, str) or raw[0] != WIRE_V1:
+            return loads(raw)
+        try:
+            fmt, comp = raw[1] & 0b11, raw[1] >> 2 & 0b11
+            if fmt not in FORMATS.values() or comp not in COMPRESSORS.values():
+                raise ValueError(f"drapeaux inconnus {raw[1]:#04x}")
+            body = raw[2:]
+            if comp == COMPRESSORS["zlib"]:
+                body = zlib.decompress(body)
+            elif comp == COMPRESSORS["zstd"]:
+                body = zstandard.ZstdDecompressor().decompress(body)
+            if fmt == FORMATS["bytes"]:
+                return body
+            if fmt == FORMATS["msgpack"]:
+                return msgpack.unpackb(body, raw=False)
+            return json.loads(body)
+        except Exception as e:              # lib absente, corps tronqué…
+            logger.warning(f"Entrée Redis illisible ({e}) — traitée comme absente")
+            return None
+
+
+# ── Empreintes de contenu (ETag) ─────────────────────────────────────────────
+def etag_of(text: Union[str, bytes]) -> str:
+    data = text.encode() if isinstance(text, str) else text
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+def tagged(obj: Any) -> Dict[str, Any]:
+    """Enveloppe {"e": ETag, "v": valeur} calculée à l’écriture."""
+    return {"e": etag_of(dumps(obj)), "v": obj}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class RedisCache:
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT,
+                 max_connections: int = REDIS_MAX_CONNECTIONS,
+                 codec: Optional[Codec] = None):
+        self._host, self._port, self._max = host, port, max_connections
+        self.codec = codec or Codec()
+        self._client: aioredis.Redis | None = None
+
+    # Cycle de vie ------------------------------------------------------------
+    async def startup(self):
+        self._ensure()
+
+    async def shutdown(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> aioredis.Redis:
+        return self._ensure()
+
+    # Lectures / écritures ----------------------------------------------------
+    async def get_json(self, key: str) -> Any:
+        return self.codec.decode(await self.client.get(key))
+
+    async def set_json(self, key: str, obj: Any, ttl: int):
+        await self.client.setex(key, ttl, self.codec.encode(obj))
+
+    async def set_raw(self, key: str, body: bytes, ttl: int):
+        await self.client.setex(key, ttl, self.codec.pack(body))
+
+    async def mget_json(self, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        raws = await self.client.mget(keys)
+        return [self.codec.decode(raw) for raw in raws]
+
+    async def mset_json(self, items: Dict[str, Any], ttl: int):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key, obj in items.items():
+            pipe.setex(key, ttl, self.codec.encode(obj))
+        await pipe.execute()
+
+    # Internes ----------------------------------------------------------------
+    def _ensure(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.Redis(
+                host=self._host, port=self._port,
+                max_connections=self._max,            # octets : valeurs binaires
+            )
+        return self._client
+
+# instance globale
+rcache = RedisCache()
@@ -0,0 +1,40 @@
+# api-gateway/status_buckets.py
+"""
+Classement des statuts de checks MIB (définition unique de « critique »)
+• Critical : critical / ko / error / not ok — Warning : warning / warn
+• Même règle pour le global_status d’une VM, les compteurs du résumé, le
+  drapeau ko_any (boutons de l’accueil, flux SSE) et les pages Critical/Warning
+  (avant : seuls ko / critical et warning y étaient retenus)
+• Module identique dans backend/ et api-gateway/ (contextes Docker séparés)
+"""
+
+from __future__ import annotations
+from typing import Iterable, Optional
+
+STATUS_CRIT = {"critical", "ko", "error", "not ok"}
+STATUS_WARN = {"warning", "warn"}
+
+
+def check_bucket(status: Optional[str]) -> str:
+    """Critical / Warning / OK / Unknown."""
+    raw = (status or "").lower()
+    if raw == "ok":
+        return "OK"
+    if raw in STATUS_CRIT:
+        return "Critical"
+    if raw in STATUS_WARN:
+        return "Warning"
+    return "Unknown"
+
+
+def is_critical(status: Optional[str]) -> bool:
+    return (status or "").lower() in STATUS_CRIT
+
+
+def global_status(buckets: Iterable[str]) -> str:
+    """Pire bucket des checks d’une VM (aucun check → OK)."""
+    seen = set(buckets)
+    for bucket in ("Critical", "Warning", "Unknown"):
+        if bucket in seen:
+            return bucket
+    return "OK"
@@ -0,0 +1,168 @@
+# api-gateway/stream.py
+"""
+Flux SSE des changements par client
+• Un hub par client, démarré au premier abonné, arrêté et oublié au départ
+  du dernier
+• Toutes les STREAM_INTERVAL s : relit l’agrégat, le compare au précédent
+  et ne pousse que les deltas (VM / check ajoutés, modifiés, retirés)
+• Évènement « client » : drapeau ko_any (couleur des boutons de l’accueil)
+"""
+
+from __future__ import annotations
+import os, asyncio, json, logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from status_buckets import is_critical
+
+STREAM_INTERVAL  = float(os.getenv("STREAM_INTERVAL",  "10"))
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+STREAM_QUEUE_MAX = int(os.getenv("STREAM_QUEUE_MAX",   "256"))
+
+logger = logging.getLogger("stream")
+
+Loader = Callable[[str], Awaitable[List[dict]]]
+Snapshot = Dict[str, Dict[str, Any]]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Snapshots & diff
+# ═════════════════════════════════════════════════════════════════════════════
+def check_key(chk: dict) -> str:
+    return "|".join((chk.get("objectClass") or "-",
+                     chk.get("parameter")   or "-",
+                     chk.get("object")      or "-"))
+
+def snapshot(vms: List[dict]) -> Snapshot:
+    return {
+        vm["machine"]: {
+            "status": vm.get("global_status"),
+            "checks": {check_key(c): c for c in vm.get("monitoring_details", [])},
+        }
+        for vm in vms if vm.get("machine")
+    }
+
+def ko_any(snap: Snapshot) -> bool:
+    """Même définition que le ko_any du résumé backend (status_buckets)."""
+    return any(is_critical(c.get("status"))
+               for vm in snap.values() for c in vm["checks"].values())
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> List[dict]:
+    """Liste d’évènements {type, op, vm, ...} pour passer de old à new."""
+    events: List[dict] = []
+    for name in old.keys() - new.keys():
+        events.append({"type": "vm", "op": "remove", "vm": name})
+
+    for name, cur in new.items():
+        prev = old.get(name)
+        if prev is None:
+            events.append({"type": "vm", "op": "add", "vm": name, "status": cur["status"]})
+            prev = {"status": cur["status"], "checks": {}}
+        elif prev["status"] != cur["status"]:
+            events.append({"type": "vm", "op": "status", "vm": name,
+                           "from": prev["status"], "status": cur["status"]})
+
+        for key in prev["checks"].keys() - cur["checks"].keys():
+            events.append({"type": "check", "op": "remove", "vm": name, "key": key})
+        for key, chk in cur["checks"].items():
+            before = prev["checks"].get(key)
+            if before is None:
+                events.append({"type": "check", "op": "add", "vm": name,
+                               "key": key, "check": chk})
+            elif before != chk:
+                events.append({"type": "check", "op": "update", "vm": name,
+                               "key": key, "check": chk,
+                               "from": before.get("status")})
+    return events
+
+def sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+def ndjson(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode() + b"\n"
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Hubs
+# ═════════════════════════════════════════════════════════════════════════════
+class ClientHub:
+    def __init__(self, client: str, loader: Loader):
+        self.client  = client
+        self._loader = loader
+        self._subs:  List[asyncio.Queue] = []
+        self._snap:  Optional[Snapshot] = None
+        self._ko:    Optional[bool] = None
+        self._task:  Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_MAX)
+        if self._ko is not None:
+            q.put_nowait(sse("client", {"client": self.client, "ko_any": self._ko}))
+        self._subs.append(q)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        if q in self._subs:
+            self._subs.remove(q)
+        if not self._subs and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _publish(self, chunk: bytes):
+        for q in self._subs:
+            try:
+                q.put_nowait(chunk)
+            except asyncio.QueueFull:          # abonné trop lent → il recharge
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(sse("reset", {}))
+
+    async def _run(self):
+        while True:
+            try:
+                new = snapshot(await self._loader(self.client))
+                if self._snap is not None:
+                    for ev in diff_snapshots(self._snap, new):
+                        self._publish(sse(ev["type"], ev))
+                self._snap = new
+                ko = ko_any(new)
+                if ko != self._ko:
+                    self._ko = ko
+                    self._publish(sse("client", {"client": self.client, "ko_any": ko}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Flux {self.client} : rechargement KO ({e})")
+            await asyncio.sleep(STREAM_INTERVAL)
+
+
+class StreamHubs:
+    def __init__(self, loader: Loader):
+        self._loader = loader
+        self._hubs: Dict[str, ClientHub] = {}
+
+    async def events(self, client: str,
+                     is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[bytes]:
+        hub = self._hubs.get(client)
+        if hub is None:
+            hub = self._hubs[client] = ClientHub(client, self._loader)
+        q = hub.subscribe()
+        try:
+            yield b"retry: 5000\n\n"
+            while not await is_disconnected():
+                try:
+                    yield await asyncio.wait_for(q.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            hub.unsubscribe(q)
+            if hub.subscribers == 0 and self._hubs.get(client) is hub:
+                del self._hubs[client]          # pas d’entrée permanente par chemin demandé
+
+    def stats(self) -> Dict[str, int]:
+        return {c: h.subscribers for c, h in self._hubs.items() if h.subscribers}
@@ -1,20 +1,40 @@
 ###############################################################################
 # backend/app.py – Backend FastAPI pour l’API MIB
 # ─────────────────────────────────────────────────────────────────────────────
-# • /assets                – liste paginée (cache RAM optionnel)
+# • /assets                – liste filtrable (index résident asset_index)
 # • /machine/<vm>          – détail VM + checks
+# • /machines              – détail de N VM en une passe (MGET + fetch borné)
 #     ↳ 2 niveaux de cache :
-#         1) Redis  machine:<assetId>   TTL = MACHINE_TTL      ★ nouveau
+#         1) Redis  machine:<assetId>   frais MACHINE_TTL      ★ nouveau
+#            (enveloppe {"e": ETag, "v": VM, "x": fin de fraîcheur} → 304 ;
+#             gardée MACHINE_KEEP_TTL pour les agrégats par références du gateway)
 #         2) Redis  status:<assetId>    TTL = STATUS_TTL
-#         3) RAM    all_assets          TTL = CACHE_TTL
-# • Token récupéré / rafraîchi toutes les 15 min (token_manager)
+#     ↳ status:/machine: passent par un L1 LRU en process devant Redis
+#       (tiered_cache, invalidation inter-réplicas par pub/sub)
+# • Token rafraîchi avant son exp JWT, partagé entre réplicas (token_manager)
+# • Un seul client HTTP poolé vers MIB pour tout le process (http_pool)
+# • Concurrence vers MIB ajustée en AIMD par endpoint (limiter)
+# • /metrics Prometheus : routes, appels MIB, caches, token (metrics)
+# • Server-Timing par requête, ?profile=1 → rapport du profileur (timing)
+# • Inventaire indexé en RAM, reconstruit en tâche de fond (asset_index)
+# • /status de chaque asset tenu au chaud par un poller à priorités (poller)
+# • Cache-miss concurrents coalescés (singleflight, verrou Redis entre réplicas)
+# • Résumé de flotte incrémental → /summary, /checks?status= (summary)
+# • Instantané disque inventaire + VM : démarrage à chaud, servi « stale »
+#   puis réconcilié en fond (snapshot)
+# • /machines?budget= : VM pas prêtes à l’échéance listées dans "missing",
+#   leur fetch se termine en fond ; relance couverte des /status lents (hedge)
+# • Historique des transitions de statut (SQLite local) → /machine/<vm>/history,
+#   /history/transitions (history)
 # • Filtre métier fixe : L2Support = “ATQIHF”
 ###############################################################################
 from __future__ import annotations
 from typing import List, Dict, Any, Optional
-import asyncio, os, time, json, logging
-import httpx, redis
-from fastapi import FastAPI, HTTPException, Query
+import asyncio, os, time, logging
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -23,6 +43,22 @@ from dotenv import load_dotenv
 # ─────────────────────────────────────────────────────────────────────────────
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 from .token_manager import token_mgr
+from .asset_index import asset_index
+from .pagination import paginate, extract_total, ASSETS_PER_PAGE
+from .http_pool import mib_http
+from .redis_cache import rcache, tagged, etag_matches
+from .singleflight import SingleFlight, RedisSingleFlight, SingleFlightError
+from .poller import poller
+from .tiered_cache import TieredCache
+from .summary import fleet_summary
+from .status_buckets import check_bucket, global_status
+from .snapshot import snapshots
+from .history import history
+from .limiter import mib_limits, checked, UpstreamBusy
+from .hedge import hedged, hedge_delay
+from .timing import ServerTimingMiddleware, span
+from .metrics import (REGISTRY, IN_FLIGHT, CONTENT_TYPE, MetricsMiddleware,
+                      metrics_text)
 
 # ════════════════════════════════════════════════════════════════════════════
 # Configuration
@@ -33,102 +69,136 @@ ASSET_STATUS  = f"{MIB_BASE}/api/v1/assets/{{asset_id}}/status"
 
 L2_SUPPORT_FILTER = "ATQIHF"
 
-CACHE_TTL    = int(os.getenv("CACHE_TTL",   "0"))    # all_assets (RAM)
 STATUS_TTL   = int(os.getenv("STATUS_TTL",  "60"))   # status VM  (Redis)
 MACHINE_TTL  = int(os.getenv("MACHINE_TTL", "300"))  # détail VM  (Redis) ★ nouveau
+# durée de vie Redis de machine:<id> ≥ CACHE_STALE_TTL du gateway (STATUS_AGGREGATE_REFS)
+MACHINE_KEEP_TTL = int(os.getenv("MACHINE_KEEP_TTL", os.getenv("CACHE_STALE_TTL", "3600")))
+
+ASSET_INDEX_WAIT = float(os.getenv("ASSET_INDEX_WAIT", "30"))  # attente 1er build
+MACHINES_FETCH_CONCURRENCY = int(os.getenv("MACHINES_FETCH_CONCURRENCY", "16"))
+SUMMARY_SEED_CHUNK = int(os.getenv("SUMMARY_SEED_CHUNK", "500"))   # MGET au démarrage
+SNAPSHOT_RECONCILE_CHUNK = int(os.getenv("SNAPSHOT_RECONCILE_CHUNK", "200"))
+SNAPSHOT_RECONCILE_RETRY = float(os.getenv("SNAPSHOT_RECONCILE_RETRY", "5"))   # s
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-rds = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
 logger = logging.getLogger("backend")
 
 # ════════════════════════════════════════════════════════════════════════════
-# Cache RAM très léger (all_assets)
+# Helpers cache JSON : L1 (RAM) → L2 (Redis), cf. tiered_cache
 # ════════════════════════════════════════════════════════════════════════════
-class InMemoryTTLCache:
-    def __init__(self):
-        self._store: Dict[str, Any] = {}
-        self._exp:   Dict[str, float] = {}
-
-    def get(self, key: str):
-        if CACHE_TTL == 0:
-            return None
-        exp = self._exp.get(key)
-        if exp and exp > time.time():
-            return self._store[key]
-        self._store.pop(key, None); self._exp.pop(key, None)
-        return None
-
-    def set(self, key: str, val: Any):
-        if CACHE_TTL == 0:
-            return
-        self._store[key] = val
-        self._exp[key]   = time.time() + CACHE_TTL
-
-cache = InMemoryTTLCache()
+tcache = TieredCache(rcache)
 
-# ════════════════════════════════════════════════════════════════════════════
-# Helpers Redis JSON
-# ════════════════════════════════════════════════════════════════════════════
-def r_status_get(asset_id: str) -> Optional[list]:
-    raw = rds.get(f"status:{asset_id}")
-    return json.loads(raw) if raw else None
+async def r_status_get(asset_id: str) -> Optional[list]:
+    return await tcache.get_json(f"status:{asset_id}")
+
+async def r_status_set(asset_id: str, data: list):
+    await tcache.set_json(f"status:{asset_id}", data, STATUS_TTL)
+
+# --- nouveau : cache complet de /machine (enveloppe {"e": ETag, "v": VM}) ----
+#     "x" : fin de fraîcheur ; au-delà l’entrée reste lisible par le gateway
+#     (références) mais le backend la traite comme un miss
+def machine_env(data: dict, ttl: float = MACHINE_TTL) -> dict:
+    return {**tagged(data), "x": time.time() + ttl}
+
+def machine_fresh(env: Any) -> bool:
+    return isinstance(env, dict) and "e" in env and env.get("x", float("inf")) > time.time()
+
+def machine_keep(ttl: float = MACHINE_TTL) -> int:
+    return int(max(ttl, MACHINE_KEEP_TTL))
 
-def r_status_set(asset_id: str, data: list):
-    rds.setex(f"status:{asset_id}", STATUS_TTL, json.dumps(data))
+async def r_machine_get(asset_id: str) -> Optional[dict]:                    # ★ nouveau
+    env = await tcache.get_json(f"machine:{asset_id}")
+    return env if machine_fresh(env) else None
 
-# --- nouveau : cache complet de /machine ------------------------------------
-def r_machine_get(asset_id: str) -> Optional[dict]:                          # ★ nouveau
-    raw = rds.get(f"machine:{asset_id}")
-    return json.loads(raw) if raw else None
+async def r_machine_set(asset_id: str, data: dict) -> dict:                  # ★ nouveau
+    env = machine_env(data)
+    await tcache.set_json(f"machine:{asset_id}", env, machine_keep())
+    snapshots.discard([asset_id])                # fraîche : plus servie depuis l’instantané
+    return env
 
-def r_machine_set(asset_id: str, data: dict):                                # ★ nouveau
-    rds.setex(f"machine:{asset_id}", MACHINE_TTL, json.dumps(data))
+# --- lectures / écritures groupées (1 aller-retour Redis au plus) -----------
+async def r_mget(prefix: str, asset_ids: List[str]) -> List[Any]:
+    return await tcache.mget_json([f"{prefix}:{i}" for i in asset_ids])
+
+async def r_mset(prefix: str, items: Dict[str, Any], ttl: int):
+    await tcache.mset_json({f"{prefix}:{i}": v for i, v in items.items()}, ttl)
+
+# --- réponses conditionnelles (ETag calculé à l’écriture) --------------------
+def etag_response(request: Request, payload: Any, etag: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {"ETag": etag, **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+def stale_headers(age: Optional[float]) -> Dict[str, str]:
+    """Réponse servie depuis l’instantané disque (avant réconciliation)."""
+    return {"X-Cache": "stale", "Age": str(int(age or 0))}
+
+# --- single-flight : un seul calcul en vol par clé ---------------------------
+machine_flights = RedisSingleFlight(rcache)   # machine:<id>, entre réplicas
+status_flights  = SingleFlight()              # fetch MIB /status, dans le process
 
 # ════════════════════════════════════════════════════════════════════════════
 # Fonctions HTTP → API MIB
 # ════════════════════════════════════════════════════════════════════════════
 async def read_token() -> str:
-    return await token_mgr.get_token()
+    with span("token"):
+        return await token_mgr.get_token()
 
 async def fetch_assets_page(http: httpx.AsyncClient, token: str,
-                            page: int, per_page: int = 100) -> list[dict]:
+                            page: int, per_page: int = ASSETS_PER_PAGE) -> dict:
     payload = {
         "pagination": {"page": page, "perPage": per_page},
         "filtering": [{"property": "l2Support", "rule": "eq",
                        "value": L2_SUPPORT_FILTER}],
     }
-    r = await http.post(ASSETS_SEARCH,
-                        headers={"Authorization": f"Bearer {token}"},
-                        json=payload)
-    r.raise_for_status()
+    with span("mib_assets"):
+        r = await mib_limits["assets_search"].run(lambda: checked(http.post(
+            ASSETS_SEARCH,
+            headers={"Authorization": f"Bearer {token}"},
+            json=payload,
+        )))
+    return r.json()
+
+async def fetch_all_assets(http: httpx.AsyncClient, token: str) -> list[dict]:
+    """Inventaire complet : pages récupérées en parallèle (cf. pagination.py)."""
+    async def fetch(page: int):
+        body = await fetch_assets_page(http, token, page, ASSETS_PER_PAGE)
+        return body.get("data", []), extract_total(body)
+
+    return await paginate(fetch, per_page=ASSETS_PER_PAGE)
+
+async def fetch_status(http: httpx.AsyncClient, token: str, asset_id: str) -> list:
+    with span("mib_status"):
+        r = await mib_limits["status"].run(lambda: checked(http.get(
+            ASSET_STATUS.format(asset_id=asset_id),
+            headers={"Authorization": f"Bearer {token}"},
+        )))
     return r.json().get("data", [])
 
-async def list_assets(http: httpx.AsyncClient, token: str) -> list[dict]:
-    cached = cache.get("all_assets")
-    if cached is not None:
-        return cached
-
-    page, per_page, assets = 1, 100, []
-    while True:
-        chunk = await fetch_assets_page(http, token, page, per_page)
-        if not chunk:
-            break
-        assets.extend(chunk)
-        if len(chunk) < per_page:
-            break
-        page += 1
-
-    cache.set("all_assets", assets)
+async def load_status(asset_id: str) -> list:
+    """Fetch MIB /status coalescé : N requêtes concurrentes → 1 appel (relancé si lent)."""
+    async def run():
+        token = await read_token()
+        return await hedged(lambda: fetch_status(mib_http.client, token, asset_id),
+                            hedge_delay(mib_limits["status"]))
+    return await status_flights.do(f"status:{asset_id}", run)
+
+async def load_inventory() -> list[dict]:
+    """Loader de l’index : toujours un inventaire frais depuis MIB."""
+    token  = await read_token()
+    assets = await fetch_all_assets(mib_http.client, token)
+    fleet_summary.retain(a["assetId"] for a in assets if a.get("assetId") is not None)
     return assets
 
+async def indexed_assets_ready():
+    if not await asset_index.wait_ready(ASSET_INDEX_WAIT):
+        raise HTTPException(503, "Inventaire MIB pas encore chargé")
+
 # ════════════════════════════════════════════════════════════════════════════
 # Normalisation des checks
 # ════════════════════════════════════════════════════════════════════════════
-STATUS_CRIT = {"critical", "ko", "error", "not ok"}
-STATUS_WARN = {"warning", "warn"}
-
 def normalize_check(item: dict) -> Dict[str, str]:
     return {
         "objectClass": item.get("objectClass") or "-",
@@ -141,100 +211,434 @@ def normalize_check(item: dict) -> Dict[str, str]:
     }
 
 def build_status(monitored_by: List[dict]) -> Dict[str, Any]:
-    services, crit, warn, unknown = {}, False, False, False
+    services, buckets = {}, []
     for it in monitored_by:
-        raw  = (it.get("status") or "").lower()
         desc = it.get("description") or it.get("instance", {}).get("instanceName", "Unknown")
-        if raw == "ok":
-            services[desc] = "OK"
-        elif raw in STATUS_CRIT:
-            services[desc] = "Critical"; crit = True
-        elif raw in STATUS_WARN:
-            services[desc] = "Warning";  warn = True
-        else:
-            services[desc] = "Unknown";  unknown = True
+        services[desc] = bucket = check_bucket(it.get("status"))
+        buckets.append(bucket)
+    return {"monitored_services": services, "global_status": global_status(buckets)}
 
-    if crit:        global_status = "Critical"
-    elif warn:      global_status = "Warning"
-    elif unknown:   global_status = "Unknown"
-    else:           global_status = "OK"
+PAYLOAD_SECONDS = REGISTRY.histogram(
+    "payload_build_seconds", "build_status + normalize_check d’une VM",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
 
-    return {"monitored_services": services, "global_status": global_status}
+def build_vm_payload(asset: dict, monitored_by: List[dict]) -> Dict[str, Any]:
+    with PAYLOAD_SECONDS.time(), span("normalize"):
+        return _vm_payload(asset, monitored_by)
+
+def _vm_payload(asset: dict, monitored_by: List[dict]) -> Dict[str, Any]:
+    return {
+        "machine"      : asset.get("assetName"),
+        "assetType"    : asset.get("assetType"),
+        "customerName" : asset.get("customerName"),
+        "organization" : asset.get("organization"),
+        "csuName"      : asset.get("csuName"),
+        "L2Support"    : asset.get("l2Support"),
+        **build_status(monitored_by),
+        "monitoring_details": [normalize_check(it) for it in monitored_by],
+    }
 
 # ════════════════════════════════════════════════════════════════════════════
 # FastAPI
 # ════════════════════════════════════════════════════════════════════════════
 app = FastAPI(title="MIB Backend – cache RAM + Redis")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
+_background: List[asyncio.Task] = []
 
 @app.on_event("startup")
 async def _startup():
+    await mib_http.startup()
+    await rcache.startup()
+    await tcache.startup()
     await token_mgr.startup()
+    warm_start()
+    await history.startup()
+    await asset_index.startup(load_inventory)
+    await poller.startup(poll_asset, asset_index.for_client, rcache)
+    await snapshots.startup(collect_snapshot)
+    _background.append(asyncio.create_task(seed_summary()))
+    _background.append(asyncio.create_task(reconcile_snapshot()))
+
+@app.on_event("shutdown")
+async def _shutdown():
+    for t in _background:
+        t.cancel()
+    await snapshots.shutdown()
+    await poller.shutdown()
+    await history.shutdown()
+    await asset_index.shutdown()
+    await token_mgr.shutdown()
+    await mib_http.shutdown()
+    await tcache.shutdown()
+    await rcache.shutdown()
+
+@app.get("/metrics", summary="Métriques Prometheus", include_in_schema=False)
+async def metrics():
+    return Response(metrics_text(), media_type=CONTENT_TYPE)
+
+@app.get("/stats/http", summary="État du pool HTTP vers MIB")
+async def http_stats():
+    return mib_http.stats()
+
+@app.get("/stats/token", summary="État du token MIB")
+async def token_stats():
+    return token_mgr.stats()
+
+@app.get("/stats/cache", summary="Compteurs du cache L1 / L2")
+async def cache_stats():
+    return tcache.stats()
+
+@app.get("/stats/limiter", summary="Fenêtres de concurrence vers MIB")
+async def limiter_stats():
+    return mib_limits.stats()
+
+@app.get("/stats/poller", summary="État du poller /status")
+async def poller_stats():
+    return poller.stats()
+
+@app.get("/stats/snapshot", summary="Instantané disque (démarrage à chaud)")
+async def snapshot_stats():
+    return {**snapshots.stats(), "index_stale": asset_index.stale}
+
+@app.get("/stats/history", summary="Historique des transitions (SQLite)")
+async def history_stats():
+    return history.stats()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # /assets   – liste filtrable par client
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/assets", summary="Liste des assets (filtrage par client)")
-async def get_assets(client: Optional[str] = Query(None)):
-    token = await read_token()
-    async with httpx.AsyncClient(http2=True, timeout=15, verify=False) as http:
-        assets = await list_assets(http, token)
-
-    if client:
-        assets = [a for a in assets if client.lower()
-                  in a.get("customerName", "").lower()]
-
-    return {"data": assets}
+async def get_assets(request: Request, client: Optional[str] = Query(None)):
+    await indexed_assets_ready()
+    return etag_response(request, {"data": asset_index.for_client(client)},
+                         asset_index.etag_for(client),
+                         stale_headers(asset_index.age) if asset_index.stale else None)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # /machine/<vm> – détail VM + checks (cache Redis complet)
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/machine/{machine_name}", summary="Détail complet d’une VM")
-async def get_machine(machine_name: str):
-    token = await read_token()
-    async with httpx.AsyncClient(http2=True, timeout=15, verify=False) as http:
-
-        # 1) localiser l’asset correspondant
-        assets = await list_assets(http, token)
-        asset  = next((a for a in assets if a.get("assetName") == machine_name), None)
-        if not asset:
-            raise HTTPException(404, "Machine not found")
-        asset_id = asset["assetId"]
-
-        # 2) tenter de lire la VM complète en cache Redis ------------------- ★ nouveau
-        cached_vm = r_machine_get(asset_id)
-        if cached_vm:
-            return cached_vm
-
-        # 3) sinon → récupérer /status (éventuellement déjà cacheé)
-        monitored_by = r_status_get(asset_id)
-        if monitored_by is None:
-            try:
-                r = await http.get(
-                    ASSET_STATUS.format(asset_id=asset_id),
-                    headers={"Authorization": f"Bearer {token}"},
-                )
-                r.raise_for_status()
-                monitored_by = r.json().get("data", [])
-                r_status_set(asset_id, monitored_by)
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(502, f"MIB /status error {exc.response.status_code}")
-
-    status_summary     = build_status(monitored_by)
-    monitoring_details = [normalize_check(it) for it in monitored_by]
-
-    vm_payload = {                                             # ★ nouveau
-        "machine"      : machine_name,
-        "assetType"    : asset.get("assetType"),
-        "customerName" : asset.get("customerName"),
-        "organization" : asset.get("organization"),
-        "csuName"      : asset.get("csuName"),
-        "L2Support"    : asset.get("l2Support"),
-        **status_summary,
-        "monitoring_details": monitoring_details,
+async def get_machine(request: Request, machine_name: str):
+    # 1) localiser l’asset correspondant (lookup O(1) dans l’index)
+    with span("assets"):
+        await indexed_assets_ready()
+        asset = asset_index.by_name(machine_name)
+    if not asset:
+        raise HTTPException(404, "Machine not found")
+    asset_id = asset["assetId"]
+
+    # 2) tenter de lire la VM complète en cache Redis ----------------------- ★ nouveau
+    env = await r_machine_get(asset_id)
+
+    # 3) miss mais VM dans l’instantané disque → servie périmée (réconciliée en fond)
+    if env is None:
+        stale = snapshots.stale_payload(asset_id)
+        if stale is not None:
+            return etag_response(request, stale, tagged(stale)["e"],
+                                 stale_headers(snapshots.loaded.age))
+
+    # 4) miss → un seul calcul par asset, partagé par les requêtes concurrentes
+    if env is None:
+        try:
+            env = await machine_flights.do(
+                f"machine:{asset_id}",
+                lambda: compute_machine(asset),
+                lambda: r_machine_get(asset_id),
+            )
+        except SingleFlightError as exc:
+            raise HTTPException(502, str(exc))
+
+    return etag_response(request, env["v"], env["e"])
+
+async def compute_machine(asset: dict) -> Dict[str, Any]:
+    """Construit la VM, l’écrit en cache et renvoie l’enveloppe étiquetée."""
+    asset_id = asset["assetId"]
+
+    # récupérer /status (éventuellement déjà cacheé)
+    monitored_by = await r_status_get(asset_id)
+    if monitored_by is None:
+        try:
+            monitored_by = await load_status(asset_id)
+            await r_status_set(asset_id, monitored_by)
+        except httpx.HTTPStatusError as exc:
+            raise HTTPException(502, f"MIB /status error {exc.response.status_code}")
+        except UpstreamBusy as exc:
+            raise HTTPException(503, str(exc))
+
+    vm_payload = build_vm_payload(asset, monitored_by)         # ★ nouveau
+    fleet_summary.update(asset_id, vm_payload)
+    history.observe(asset_id, vm_payload)
+    return await r_machine_set(asset_id, vm_payload)           # ★ nouveau
+
+async def poll_asset(asset: dict) -> str:
+    """Appelé par le poller : /status frais → status: + machine: en un pipeline."""
+    asset_id     = str(asset["assetId"])
+    monitored_by = await load_status(asset_id)
+    vm_payload   = build_vm_payload(asset, monitored_by)
+    ttl          = poller.cache_ttl
+    fleet_summary.update(asset_id, vm_payload)
+    history.observe(asset_id, vm_payload)
+    await tcache.set_many([
+        (f"status:{asset_id}",  monitored_by,       max(STATUS_TTL,  ttl)),
+        (f"machine:{asset_id}", machine_env(vm_payload, max(MACHINE_TTL, ttl)),
+         machine_keep(max(MACHINE_TTL, ttl))),
+    ])
+    snapshots.discard([asset_id])                # rafraîchie par le poller
+    return vm_payload["global_status"]
+
+# ─────────────────────────────────────────────────────────────────────────────
+# /machines – détail de plusieurs VM en une seule passe
+#   1) résolution noms/ids via l’index
+#   2) MGET machine:<id>, puis MGET status:<id> pour les manquants
+#   3) fetch MIB /status des seuls manquants, concurrence bornée
+#   4) écriture groupée (pipeline SETEX)
+# ─────────────────────────────────────────────────────────────────────────────
+class MachinesQuery(BaseModel):
+    names: List[str] = []
+    ids:   List[str] = []
+    budget: Optional[float] = None          # s ; None = attendre toutes les VM
+
+_late_fills: set = set()                    # fetch terminés après l’échéance (références)
+
+async def resolve_machines(assets: List[dict], use_snapshot: bool = True,
+                           budget: Optional[float] = None) -> Dict[str, Any]:
+    deadline = None if budget is None else time.monotonic() + budget
+    ids      = [str(a["assetId"]) for a in assets]
+    payloads = {i: env["v"] if machine_fresh(env) else None
+                for i, env in zip(ids, await r_mget("machine", ids))}
+
+    missing  = [i for i in ids if payloads[i] is None]
+    statuses = dict(zip(missing, await r_mget("status", missing)))
+    to_fetch = [i for i in missing if statuses[i] is None]
+
+    # rien en cache mais présent dans l’instantané → servi périmé, réconcilié en fond
+    stale: List[str] = []
+    if use_snapshot and snapshots.loaded is not None:
+        for i in to_fetch:
+            payloads[i] = snapshots.stale_payload(i)
+            if payloads[i] is not None:
+                stale.append(i)
+        to_fetch = [i for i in to_fetch if payloads[i] is None]
+        if stale:                           # déjà périmées : lisibles par les références du gateway
+            await r_mset("machine", {i: machine_env(payloads[i], 0) for i in stale},
+                         machine_keep())
+
+    errors: List[dict] = []
+    late:   List[str]  = []
+    late_set: set = set()
+    if to_fetch:
+        sem = asyncio.Semaphore(MACHINES_FETCH_CONCURRENCY)
+
+        async def one(asset_id: str):
+            async with sem:
+                # slot obtenu après l’échéance : le fetch a quand même lieu,
+                # finish_late met la VM en cache pour le prochain appel
+                try:
+                    with IN_FLIGHT.track(stage="mib_status"):
+                        statuses[asset_id] = await load_status(asset_id)
+                except httpx.HTTPError as exc:
+                    errors.append({"assetId": asset_id, "error": str(exc)})
+        tasks = [asyncio.create_task(one(i)) for i in to_fetch]
+        if deadline is None:
+            await asyncio.gather(*tasks)
+        else:
+            _, pending = await asyncio.wait(tasks, timeout=max(0, deadline - time.monotonic()))
+            if pending:
+                late = [i for i, t in zip(to_fetch, tasks) if t in pending]
+                fill = asyncio.create_task(finish_late(pending, late, assets, statuses))
+                _late_fills.add(fill)
+                fill.add_done_callback(_late_fills.discard)
+        late_set = set(late)                # complétés en fond, pas dans cette réponse
+        await r_mset("status", {i: statuses[i] for i in to_fetch
+                                if i not in late_set and statuses.get(i) is not None},
+                     STATUS_TTL)
+
+    built: Dict[str, dict] = {}
+    for a, asset_id in zip(assets, ids):
+        if payloads[asset_id] is None and asset_id not in late_set \
+                and statuses.get(asset_id) is not None:
+            built[asset_id] = payloads[asset_id] = build_vm_payload(a, statuses[asset_id])
+    await store_payloads(built)
+
+    served  = [i for i in ids if payloads[i] is not None]
+    errored = {e["assetId"] for e in errors}
+    return {
+        "data"   : [payloads[i] for i in served],
+        "ids"    : served,                      # alignés sur data (références machine:<id>)
+        "errors" : errors,
+        "stale"  : stale,                       # servis depuis l’instantané disque
+        "missing": [{"assetId": a["assetId"], "machine": a.get("assetName")}
+                    for a, i in zip(assets, ids)
+                    if payloads[i] is None and i not in errored],   # échéance dépassée
     }
 
-    r_machine_set(asset_id, vm_payload)                        # ★ nouveau
-    return vm_payload
+async def store_payloads(built: Dict[str, dict]):
+    """VM construites → résumé, historique, machine:<id> (pipeline)."""
+    fleet_summary.update_many(built.items())
+    for asset_id, p in built.items():
+        history.observe(asset_id, p)
+    await r_mset("machine", {i: machine_env(p) for i, p in built.items()}, machine_keep())
+    snapshots.discard(built)
+
+async def finish_late(tasks, late: List[str], assets: List[dict], statuses: Dict[str, Any]):
+    """Fetch encore en vol à l’échéance : mis en cache à leur arrivée (prochain appel complet)."""
+    await asyncio.gather(*tasks, return_exceptions=True)
+    by_id = {str(a["assetId"]): a for a in assets}
+    done  = {i: statuses[i] for i in late if statuses.get(i) is not None}
+    try:
+        await r_mset("status", done, STATUS_TTL)
+        await store_payloads({i: build_vm_payload(by_id[i], st) for i, st in done.items()})
+    except Exception as e:
+        logger.warning(f"Mise en cache des VM en retard KO ({e})")
+
+@app.post("/machines", summary="Détail de plusieurs VM (noms ou ids)")
+async def post_machines(query: MachinesQuery):
+    await indexed_assets_ready()
+    assets, not_found, seen = [], [], set()
+    for key, lookup in [(n, asset_index.by_name) for n in query.names] + \
+                       [(i, asset_index.by_id)   for i in query.ids]:
+        asset = lookup(key)
+        if asset is None:
+            not_found.append(key)
+        elif asset["assetId"] not in seen:
+            seen.add(asset["assetId"])
+            assets.append(asset)
+
+    result = await resolve_machines(assets, budget=query.budget)
+    result["not_found"] = not_found
+    return partial_response(result)
+
+@app.get("/machines", summary="Détail de toutes les VM d’un client")
+async def get_machines(client: str = Query(...),
+                       budget: Optional[float] = Query(None, description="échéance en s")):
+    await indexed_assets_ready()
+    assets = [a for a in asset_index.for_client(client) if a.get("assetId") is not None]
+    result = await resolve_machines(assets, budget=budget)
+    result["not_found"] = []
+    return partial_response(result)
+
+def partial_response(result: Dict[str, Any]) -> Response:
+    """X-Partial : nombre de VM manquantes (le gateway ne décode le corps que dans ce cas)."""
+    n = len(result["missing"])
+    return JSONResponse(result, headers={"X-Partial": str(n)} if n else None)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# /summary, /checks – résumé de flotte (cf. summary.py), sans aucun appel MIB
+# ─────────────────────────────────────────────────────────────────────────────
+async def cached_payloads(assets: List[dict]) -> Dict[str, dict]:
+    """machine:<id> présents dans Redis, par MGET de SUMMARY_SEED_CHUNK clés."""
+    ids = [str(a["assetId"]) for a in assets if a.get("assetId") is not None]
+    out: Dict[str, dict] = {}
+    for i in range(0, len(ids), SUMMARY_SEED_CHUNK):
+        chunk = ids[i:i + SUMMARY_SEED_CHUNK]
+        envs  = await rcache.mget_json([f"machine:{a}" for a in chunk])
+        out.update((a, env["v"]) for a, env in zip(chunk, envs)
+                   if isinstance(env, dict) and "v" in env)
+    return out
+
+async def seed_summary():
+    """Au démarrage : amorce le résumé avec les machine:<id> déjà en cache."""
+    await asset_index.wait_ready()
+    fleet_summary.update_many((await cached_payloads(asset_index.for_client())).items())
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Instantané disque (cf. snapshot.py)
+#   démarrage : index + résumé amorcés depuis le fichier, avant tout appel MIB
+#   en fond   : VM de l’instantané remplacées par Redis / MIB, par lots
+# ─────────────────────────────────────────────────────────────────────────────
+def warm_start():
+    if not snapshots.load():
+        return
+    snap = snapshots.loaded
+    asset_index.rebuild(snap.assets(), stale=True, built_at=snap.created)
+    fleet_summary.update_many(snapshots.payloads())
+
+async def collect_snapshot():
+    """Inventaire MIB (jamais celui relu de l’instantané) + VM en cache Redis."""
+    if asset_index.stale or not len(asset_index):
+        return [], {}
+    assets = asset_index.for_client()
+    return assets, await cached_payloads(assets)
+
+async def reconcile_snapshot():
+    while snapshots.loaded is not None:
+        await asset_index.wait_ready()
+        if asset_index.stale:                    # inventaire MIB pas encore relu
+            await asyncio.sleep(1)
+            continue
+        chunk  = snapshots.pending()[:SNAPSHOT_RECONCILE_CHUNK]
+        assets = [a for a in map(asset_index.by_id, chunk) if a is not None]
+        try:
+            result = await resolve_machines(assets, use_snapshot=False)
+        except Exception as e:
+            logger.warning(f"Réconciliation de l’instantané KO : {e}")
+            await asyncio.sleep(SNAPSHOT_RECONCILE_RETRY)
+            continue
+        failed = {str(e["assetId"]) for e in result["errors"]}
+        snapshots.discard(i for i in chunk if i not in failed)   # + VM sorties de l’inventaire
+        snapshots.retry_later(i for i in chunk if i in failed)   # fin de file, abandon après N
+        if failed and len(failed) == len(chunk):
+            await asyncio.sleep(SNAPSHOT_RECONCILE_RETRY)
+
+@app.get("/summary", summary="Compteurs par client (VM et checks par statut)")
+async def get_summary(request: Request, client: Optional[str] = Query(None)):
+    payload = {
+        "clients": fleet_summary.clients(client),
+        "known"  : len(fleet_summary),
+        "total"  : len(asset_index),
+    }
+    return etag_response(request, payload,
+                         fleet_summary.etag("summary", client, str(len(asset_index))))
+
+@app.get("/checks", summary="Checks d’un statut donné (index inversé)")
+async def get_checks(request: Request, status: str = Query(...),
+                     client: Optional[str] = Query(None)):
+    return etag_response(request, {"data": fleet_summary.checks(status, client)},
+                         fleet_summary.etag("checks", status.lower(), client))
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Historique – transitions de statut enregistrées à chaque /status normalisé
+# ─────────────────────────────────────────────────────────────────────────────
+def history_window(window: float, until: Optional[float]) -> tuple:
+    if not history.enabled:
+        raise HTTPException(503, "Historique désactivé")
+    if window <= 0:
+        raise HTTPException(400, "window doit être > 0")
+    until = until or time.time()
+    return until - window, until
+
+@app.get("/machine/{machine_name}/history", summary="Transitions de statut d’une VM")
+async def get_machine_history(request: Request, machine_name: str,
+                              window: float = Query(86400, description="secondes"),
+                              until: Optional[float] = Query(None, description="epoch s"),
+                              check: Optional[str] = Query(None, description="objectClass|parameter|object, * = VM")):
+    await indexed_assets_ready()
+    asset = asset_index.by_name(machine_name)
+    if not asset:
+        raise HTTPException(404, "Machine not found")
+    since, until = history_window(window, until)
+    payload = {
+        "machine": machine_name,
+        "since"  : since,
+        "until"  : until,
+        "checks" : await history.machine(asset["assetId"], since, until, check),
+    }
+    return etag_response(request, payload, tagged(payload)["e"])
+
+@app.get("/history/transitions", summary="Nombre de transitions par client sur une fenêtre")
+async def get_transition_counts(request: Request,
+                                window: float = Query(86400, description="secondes"),
+                                until: Optional[float] = Query(None, description="epoch s"),
+                                client: Optional[str] = Query(None)):
+    since, until = history_window(window, until)
+    payload = {
+        "since"  : since,
+        "until"  : until,
+        "clients": await history.client_counts(since, until, client),
+    }
+    return etag_response(request, payload, tagged(payload)["e"])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Lancement local
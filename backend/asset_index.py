@@ -0,0 +1,149 @@
+# backend/asset_index.py
+"""
+Index résident de l’inventaire ATQIHF
+• Reconstruit en tâche de fond toutes les ASSET_INDEX_REFRESH secondes
+• Lookups O(1) par assetName et assetId
+• Regroupement pré-calculé par customerName ; filtres ?client= et leurs ETag
+  mémorisés dans un petit LRU (ASSET_INDEX_FILTER_MEMO entrées)
+• Les handlers HTTP ne font que lire l’index (jamais d’appel MIB)
+• Peut être amorcé depuis l’instantané disque (stale=True) en attendant MIB
+"""
+
+from __future__ import annotations
+import os, asyncio, time, logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .redis_cache import dumps, etag_of
+
+ASSET_INDEX_REFRESH = int(os.getenv("ASSET_INDEX_REFRESH", "300"))  # secondes
+ASSET_INDEX_RETRY   = int(os.getenv("ASSET_INDEX_RETRY",   "15"))   # après échec
+ASSET_INDEX_FILTER_MEMO = int(os.getenv("ASSET_INDEX_FILTER_MEMO", "64"))  # filtres retenus
+
+logger = logging.getLogger("asset_index")
+
+Loader = Callable[[], Awaitable[List[dict]]]
+
+
+def _memo_get(memo: OrderedDict, key: str):
+    val = memo.get(key)
+    if val is not None:
+        memo.move_to_end(key)
+    return val
+
+def _memo_put(memo: OrderedDict, key: str, val):
+    memo[key] = val
+    while len(memo) > ASSET_INDEX_FILTER_MEMO:
+        memo.popitem(last=False)
+
+
+class AssetIndex:
+    def __init__(self):
+        self._by_name:     Dict[str, dict]       = {}
+        self._by_id:       Dict[str, dict]       = {}
+        self._by_customer: Dict[str, List[dict]] = {}
+        self._assets:      List[dict]            = []
+        # mémos bornés (LRU) : ?client= est une chaîne libre venue de la requête
+        self._by_filter: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._etags:     "OrderedDict[str, str]"        = OrderedDict()
+        self._built_at:    float | None          = None
+        self.stale = False                               # construit depuis l’instantané
+        self._ready  = asyncio.Event()
+        self._task:  asyncio.Task | None = None
+        self._loader: Loader | None = None
+
+    # API publique ------------------------------------------------------------
+    async def startup(self, loader: Loader):
+        """Enregistre le loader et lance la reconstruction périodique."""
+        self._loader = loader
+        self._task   = asyncio.create_task(self._refresher())
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def wait_ready(self, timeout: float | None = None) -> bool:
+        """Attend le premier build (démarrage à froid)."""
+        if self._ready.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def rebuild(self, assets: List[dict], stale: bool = False, built_at: float | None = None):
+        """Construit les nouvelles tables puis les publie d’un seul coup."""
+        by_name, by_id, by_customer = {}, {}, {}
+        for a in assets:
+            if a.get("assetName"):
+                by_name[a["assetName"]] = a
+            if a.get("assetId") is not None:
+                by_id[str(a["assetId"])] = a
+            cust = (a.get("customerName") or "").lower()
+            by_customer.setdefault(cust, []).append(a)
+
+        # swap atomique (pas d’await entre les affectations)
+        self._by_name, self._by_id, self._by_customer = by_name, by_id, by_customer
+        self._by_filter, self._etags = OrderedDict(), OrderedDict()
+        self._assets   = list(assets)
+        self._built_at = built_at or time.time()
+        self.stale     = stale
+        self._ready.set()
+
+    def by_name(self, name: str) -> Optional[dict]:
+        return self._by_name.get(name)
+
+    def by_id(self, asset_id: Any) -> Optional[dict]:
+        return self._by_id.get(str(asset_id))
+
+    def for_client(self, client: Optional[str] = None) -> List[dict]:
+        """
+        Même sémantique que l’ancien filtre : sous-chaîne, insensible à la casse.
+        On ne parcourt que les clés client (quelques dizaines), pas les assets.
+        """
+        if not client:
+            return self._assets
+        needle = client.lower()
+        out = _memo_get(self._by_filter, needle)
+        if out is None:
+            out = []
+            for cust, group in self._by_customer.items():
+                if needle in cust:
+                    out.extend(group)
+            _memo_put(self._by_filter, needle, out)
+        return out
+
+    def etag_for(self, client: Optional[str] = None) -> str:
+        """Empreinte de for_client(client), calculée une fois par build (LRU)."""
+        key = (client or "").lower()
+        etag = _memo_get(self._etags, key)
+        if etag is None:
+            etag = etag_of(dumps({"data": self.for_client(client)}))
+            _memo_put(self._etags, key, etag)
+        return etag
+
+    @property
+    def age(self) -> float | None:
+        return None if self._built_at is None else time.time() - self._built_at
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    # Internes ----------------------------------------------------------------
+    async def _refresher(self):
+        while True:
+            try:
+                self.rebuild(await self._loader())
+                logger.info(f"📇  Index assets reconstruit ({len(self)} assets)")
+                delay = ASSET_INDEX_REFRESH
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reconstruction index KO : {e}")
+                delay = ASSET_INDEX_RETRY
+            await asyncio.sleep(delay)
+
+# instance globale
+asset_index = AssetIndex()
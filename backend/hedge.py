@@ -0,0 +1,63 @@
+# backend/hedge.py
+"""
+Relance « couverte » (hedged request) des appels MIB /status
+• Pas de réponse après le quantile HEDGE_QUANTILE des latences récentes
+  (limiteur de l’endpoint) → un second appel identique est lancé
+• Le premier succès l’emporte, l’autre appel est annulé
+• Désactivé par défaut (HEDGE_ENABLED=1) : au plus un appel en plus par VM lente
+"""
+
+from __future__ import annotations
+import os, asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .metrics import REGISTRY
+
+HEDGE_ENABLED   = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_QUANTILE  = float(os.getenv("HEDGE_QUANTILE",  "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))    # s, plancher du délai
+
+T = TypeVar("T")
+
+HEDGES = REGISTRY.counter("mib_hedged_requests_total",
+                          "Relances couvertes vers MIB, par issue", ("endpoint", "outcome"))
+
+
+def hedge_delay(limiter) -> Optional[float]:
+    """Délai avant relance, ou None (désactivé / pas assez d’historique)."""
+    if not HEDGE_ENABLED:
+        return None
+    q = limiter.quantile(HEDGE_QUANTILE)
+    return None if q is None else max(HEDGE_MIN_DELAY, q)
+
+
+async def hedged(make: Callable[[], Awaitable[T]], delay: Optional[float],
+                 endpoint: str = "status") -> T:
+    """make() une fois, puis une seconde fois si la première dépasse delay."""
+    first = asyncio.ensure_future(make())
+    if delay is None:
+        return await first
+    pending, second = {first}, None
+    error: Optional[BaseException] = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            second = asyncio.ensure_future(make())
+            pending.add(second)
+        while True:
+            for t in done:
+                if t.exception() is None:
+                    if second is not None:
+                        HEDGES.inc(endpoint=endpoint,
+                                   outcome="hedge_won" if t is second else "first_won")
+                    return t.result()
+                error = t.exception()
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if second is not None:
+            HEDGES.inc(endpoint=endpoint, outcome="failed")
+        raise error
+    finally:
+        for t in pending:                   # perdant, ou appelant annulé
+            t.cancel()
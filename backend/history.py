@@ -0,0 +1,345 @@
+# backend/history.py
+"""
+Historique des statuts : seules les transitions par (asset, check) sont gardées
+• Dernier état connu de chaque VM en RAM : un /status inchangé ne coûte qu’une
+  comparaison de dicts, rien n’est écrit
+• Transitions bufferisées puis écrites par lots dans SQLite (WAL) en tâche de
+  fond ; table WITHOUT ROWID rangée par (série, ts) → lecture d’une plage contiguë
+• Rétention : HISTORY_RETENTION ; la dernière transition avant la coupure est
+  gardée comme état initial de chaque série
+• Sous-échantillonnage au-delà de HISTORY_DOWNSAMPLE_AFTER : une ligne par
+  série et par tranche HISTORY_DOWNSAMPLE_BUCKET (n = transitions fusionnées)
+• Base locale au réplica (volume /var/lib/mib) ; HISTORY_PATH vide = désactivé
+"""
+
+from __future__ import annotations
+import os, time, sqlite3, asyncio, logging, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+HISTORY_PATH              = os.getenv("HISTORY_PATH", "/var/lib/mib/history.db")
+HISTORY_RETENTION         = float(os.getenv("HISTORY_RETENTION",         str(30 * 86400)))  # s
+HISTORY_DOWNSAMPLE_AFTER  = float(os.getenv("HISTORY_DOWNSAMPLE_AFTER",  str(7 * 86400)))   # s
+HISTORY_DOWNSAMPLE_BUCKET = float(os.getenv("HISTORY_DOWNSAMPLE_BUCKET", "3600"))           # s
+HISTORY_FLUSH_INTERVAL    = float(os.getenv("HISTORY_FLUSH_INTERVAL",    "2"))              # s
+HISTORY_MAINTENANCE_INTERVAL = float(os.getenv("HISTORY_MAINTENANCE_INTERVAL", "3600"))     # s
+
+logger = logging.getLogger("history")
+
+VM_CHECK = "*"                          # série du global_status de la VM
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id        INTEGER PRIMARY KEY,
+    asset     TEXT NOT NULL,
+    check_key TEXT NOT NULL,
+    vm        TEXT,
+    client    TEXT,
+    UNIQUE (asset, check_key)
+);
+CREATE INDEX IF NOT EXISTS series_client ON series (client);
+CREATE TABLE IF NOT EXISTS transitions (
+    series INTEGER NOT NULL,
+    ts     INTEGER NOT NULL,            -- ms epoch
+    prev   TEXT,                        -- NULL = première observation
+    status TEXT,                        -- NULL = check disparu
+    n      INTEGER NOT NULL DEFAULT 1,  -- > 1 après sous-échantillonnage
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+"""
+
+# (ts ms, assetId, vm, client, check, ancien statut, nouveau statut)
+Transition = Tuple[int, str, str, str, str, Optional[str], Optional[str]]
+
+
+def check_key(chk: dict) -> str:
+    return "|".join((chk.get("objectClass") or "-", chk.get("parameter") or "-",
+                     chk.get("object") or "-"))
+
+def states_of(payload: dict) -> Dict[str, str]:
+    """Statut courant de chaque série d’une VM (global_status compris)."""
+    states = {VM_CHECK: payload.get("global_status") or "Unknown"}
+    for chk in payload.get("monitoring_details", []):
+        states[check_key(chk)] = chk.get("status") or "Unknown"
+    return states
+
+def time_in_state(initial: Optional[str], changes: List[Tuple[int, Optional[str]]],
+                  since: int, until: int) -> Dict[str, float]:
+    """Secondes passées dans chaque statut sur [since, until] (ts en ms)."""
+    spent: Dict[str, float] = {}
+    state, t = initial, since
+    for ts, status in changes:
+        if state is not None:
+            spent[state] = spent.get(state, 0) + (ts - t) / 1000
+        state, t = status, ts
+    if state is not None:
+        spent[state] = spent.get(state, 0) + (until - t) / 1000
+    return {k: round(v, 3) for k, v in spent.items()}
+
+
+class HistoryStore:
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self.version = 0                    # incrémenté à chaque lot écrit (ETag)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()       # connexion partagée entre threads to_thread
+        self._last: Dict[str, Dict[str, str]] = {}       # assetId → check → statut
+        self._series: Dict[Tuple[str, str], Tuple[int, str, str]] = {}  # → (id, vm, client)
+        self._pending: List[Transition] = []
+        self._tasks: List[asyncio.Task] = []
+        self.recorded = self.written = self.flushes = 0
+        self.last_maintenance: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    # Cycle de vie ------------------------------------------------------------
+    async def startup(self):
+        if not self.path:
+            return
+        try:
+            await asyncio.to_thread(self.open)
+        except Exception as e:
+            logger.warning(f"Historique désactivé ({e})")
+            return
+        self._tasks = [asyncio.create_task(self._writer()),
+                       asyncio.create_task(self._maintainer())]
+
+    async def shutdown(self):
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+        if self._db is not None:
+            await self.flush()
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    def open(self):
+        """Ouvre la base et recharge le dernier état de chaque série."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        for sid, asset, check, vm, client in db.execute(
+                "SELECT id, asset, check_key, vm, client FROM series"):
+            self._series[(asset, check)] = (sid, vm, client)
+        # colonne nue + MAX() : SQLite renvoie le statut de la ligne la plus récente
+        for asset, check, status, _ in db.execute(
+                "SELECT s.asset, s.check_key, t.status, MAX(t.ts) FROM transitions t "
+                "JOIN series s ON s.id = t.series GROUP BY t.series"):
+            if status is not None:
+                self._last.setdefault(asset, {})[check] = status
+        self._db = db
+        logger.info(f"🕓  Historique ouvert ({len(self._series)} séries)")
+
+    # Écritures ---------------------------------------------------------------
+    def observe(self, asset_id: Any, payload: dict, ts: Optional[float] = None) -> int:
+        """Compare au dernier état connu ; bufferise les transitions, renvoie leur nombre."""
+        if self._db is None:
+            return 0
+        asset_id = str(asset_id)
+        cur  = states_of(payload)
+        last = self._last.get(asset_id, {})
+        if cur == last:
+            return 0
+        ms     = int((ts or time.time()) * 1000)
+        vm     = payload.get("machine") or ""
+        client = payload.get("customerName") or ""
+        out = [(ms, asset_id, vm, client, k, last.get(k), v)
+               for k, v in cur.items() if last.get(k) != v]
+        out += [(ms, asset_id, vm, client, k, v, None) for k, v in last.items() if k not in cur]
+        self._last[asset_id] = cur
+        self._pending.extend(out)
+        self.recorded += len(out)
+        return len(out)
+
+    async def flush(self):
+        if self._db is None or not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception:
+            self._pending[:0] = batch       # rejoué au prochain lot
+            raise
+        self.written += len(batch)
+        self.flushes += 1
+        self.version += 1
+
+    def _write(self, batch: List[Transition]):
+        rows, seen = [], {}                 # séries créées / modifiées, publiées après COMMIT
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                for ms, asset, vm, client, check, prev, status in batch:
+                    known = seen.get((asset, check)) or self._series.get((asset, check))
+                    if known is None:
+                        sid = db.execute(
+                            "INSERT INTO series (asset, check_key, vm, client) VALUES (?,?,?,?)",
+                            (asset, check, vm, client)).lastrowid
+                        seen[(asset, check)] = (sid, vm, client)
+                    else:
+                        sid = known[0]
+                        if known[1:] != (vm, client):        # VM renommée / changée de client
+                            db.execute("UPDATE series SET vm = ?, client = ? WHERE id = ?",
+                                       (vm, client, sid))
+                            seen[(asset, check)] = (sid, vm, client)
+                    rows.append((sid, ms, prev, status))
+                db.executemany("INSERT OR REPLACE INTO transitions (series, ts, prev, status) "
+                               "VALUES (?,?,?,?)", rows)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self._series.update(seen)
+
+    # Rétention / sous-échantillonnage ------------------------------------------
+    def maintain(self, now: Optional[float] = None) -> Dict[str, int]:
+        now  = now or time.time()
+        cut  = int((now - HISTORY_RETENTION) * 1000)
+        hi   = int((now - HISTORY_DOWNSAMPLE_AFTER) * 1000)
+        bk   = max(1, int(HISTORY_DOWNSAMPLE_BUCKET * 1000))
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                # au-delà de la rétention : seule la dernière ligne de chaque série reste
+                dropped = db.execute(
+                    "DELETE FROM transitions WHERE ts < :cut AND EXISTS ("
+                    " SELECT 1 FROM transitions t2 WHERE t2.series = transitions.series"
+                    " AND t2.ts > transitions.ts AND t2.ts < :cut)", {"cut": cut}).rowcount
+                dropped += db.execute("DELETE FROM transitions WHERE ts < ? AND status IS NULL",
+                                      (cut,)).rowcount
+                db.execute("DELETE FROM series WHERE id NOT IN (SELECT series FROM transitions)")
+
+                groups = db.execute(
+                    "SELECT series, MIN(ts), MAX(ts), SUM(n) FROM transitions"
+                    " WHERE ts >= ? AND ts < ? AND prev IS NOT NULL"     # 1res observations gardées
+                    " GROUP BY series, ts / ? HAVING COUNT(*) > 1",
+                    (cut, hi, bk)).fetchall()
+                merged = 0
+                for sid, first, last, total in groups:
+                    prev = db.execute("SELECT prev FROM transitions WHERE series = ? AND ts = ?",
+                                      (sid, first)).fetchone()[0]
+                    merged += db.execute(
+                        "DELETE FROM transitions WHERE series = ? AND ts >= ? AND ts < ?"
+                        " AND prev IS NOT NULL",
+                        (sid, first, last)).rowcount
+                    db.execute("UPDATE transitions SET prev = ?, n = ? WHERE series = ? AND ts = ?",
+                               (prev, total, sid, last))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            alive = {sid for sid, in db.execute("SELECT id FROM series")}
+            self._series = {k: v for k, v in self._series.items() if v[0] in alive}
+        self.last_maintenance = now
+        self.version += 1
+        return {"dropped": dropped, "merged": merged}
+
+    # Lectures ----------------------------------------------------------------
+    async def machine(self, asset_id: Any, since: float, until: float,
+                      check: Optional[str] = None) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._machine, str(asset_id),
+                                       int(since * 1000), int(until * 1000), check)
+
+    def _machine(self, asset: str, since: int, until: int,
+                 check: Optional[str]) -> List[Dict[str, Any]]:
+        where, args = "s.asset = ?", [asset]
+        if check:
+            where += " AND s.check_key = ?"
+            args.append(check)
+        with self._lock:
+            initial = {k: st for k, st, _ in self._db.execute(
+                "SELECT s.check_key, t.status, MAX(t.ts) FROM transitions t"
+                f" JOIN series s ON s.id = t.series WHERE {where} AND t.ts < ?"
+                " GROUP BY t.series", (*args, since))}
+            rows = self._db.execute(
+                "SELECT s.check_key, t.ts, t.prev, t.status, t.n FROM transitions t"
+                f" JOIN series s ON s.id = t.series WHERE {where} AND t.ts >= ? AND t.ts < ?"
+                " ORDER BY s.check_key, t.ts", (*args, since, until)).fetchall()
+
+        by_check: Dict[str, List[tuple]] = {k: [] for k in initial}
+        for key, ts, prev, status, n in rows:
+            by_check.setdefault(key, []).append((ts, prev, status, n))
+        out = []
+        for key in sorted(by_check):
+            changes = by_check[key]
+            out.append({
+                "check"        : key,
+                "initial"      : initial.get(key),
+                "transitions"  : [{"ts": ts / 1000, "from": prev, "to": status, "n": n}
+                                  for ts, prev, status, n in changes],
+                "time_in_state": time_in_state(initial.get(key),
+                                               [(ts, status) for ts, _, status, _ in changes],
+                                               since, until),
+            })
+        return out
+
+    async def client_counts(self, since: float, until: float,
+                            client: Optional[str] = None) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._client_counts, int(since * 1000),
+                                       int(until * 1000), client)
+
+    def _client_counts(self, since: int, until: int,
+                       client: Optional[str]) -> List[Dict[str, Any]]:
+        # premières observations / checks disparus : pas des changements de statut
+        where, args = "t.ts >= ? AND t.ts < ? AND t.prev IS NOT NULL AND t.status IS NOT NULL", \
+                      [since, until]
+        if client:
+            where += " AND s.client = ?"
+            args.append(client)
+        with self._lock:
+            totals = self._db.execute(
+                "SELECT s.client, SUM(t.n), COUNT(DISTINCT s.asset), COUNT(DISTINCT t.series)"
+                f" FROM transitions t JOIN series s ON s.id = t.series WHERE {where}"
+                " GROUP BY s.client ORDER BY s.client", args).fetchall()
+            to = self._db.execute(
+                "SELECT s.client, t.status, SUM(t.n) FROM transitions t"
+                f" JOIN series s ON s.id = t.series WHERE {where}"
+                " GROUP BY s.client, t.status", args).fetchall()
+        by_status: Dict[str, Dict[str, int]] = {}
+        for c, status, n in to:
+            by_status.setdefault(c, {})[status] = n
+        return [{"client": c, "transitions": n, "vms": vms, "checks": checks,
+                 "to": by_status.get(c, {})}
+                for c, n, vms, checks in totals]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path"            : self.path,
+            "enabled"         : self.enabled,
+            "series"          : len(self._series),
+            "pending"         : len(self._pending),
+            "recorded"        : self.recorded,
+            "written"         : self.written,
+            "flushes"         : self.flushes,
+            "last_maintenance": self.last_maintenance,
+        }
+
+    # Tâches de fond ------------------------------------------------------------
+    async def _writer(self):
+        while True:
+            await asyncio.sleep(HISTORY_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Écriture de l’historique KO ({e})")
+
+    async def _maintainer(self):
+        while True:
+            try:
+                res = await asyncio.to_thread(self.maintain)
+                logger.info(f"🕓  Historique entretenu ({res})")
+            except Exception as e:
+                logger.warning(f"Entretien de l’historique KO ({e})")
+            await asyncio.sleep(HISTORY_MAINTENANCE_INTERVAL)
+
+# instance globale
+history = HistoryStore()
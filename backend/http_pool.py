@@ -0,0 +1,98 @@
+# backend/http_pool.py
+"""
+Client HTTP partagé vers l’API MIB
+• Un seul httpx.AsyncClient pour tout le process (créé au startup, fermé au shutdown)
+• Limites du pool, keep-alive et HTTP/2 configurables par l’environnement
+• stats() → état du pool (exposé par /stats/http)
+"""
+
+from __future__ import annotations
+import os, logging
+from typing import Any, Dict
+
+import httpx
+
+HTTP_MAX_CONNECTIONS  = int(os.getenv("HTTP_MAX_CONNECTIONS",    "100"))
+HTTP_MAX_KEEPALIVE    = int(os.getenv("HTTP_MAX_KEEPALIVE",      "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT          = float(os.getenv("HTTP_TIMEOUT",          "15"))
+HTTP_HTTP2            = os.getenv("HTTP_HTTP2", "1") == "1"
+
+logger = logging.getLogger("http_pool")
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def pool_stats(client: httpx.AsyncClient | None) -> Dict[str, Any]:
+    """Photographie du pool httpcore (connexions actives / inactives / HTTP/2)."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", []) or [])
+    return {
+        "open"       : client is not None and not client.is_closed,
+        "connections": len(conns),
+        "idle"       : sum(1 for c in conns if c.is_idle()),
+        "available"  : sum(1 for c in conns if c.is_available()),
+        "http2"      : sum(1 for c in conns if "HTTP/2" in c.info()),
+        "queued"     : len(getattr(pool, "_requests", []) or []),
+    }
+
+
+class HttpPool:
+    def __init__(self, http2: bool = HTTP_HTTP2, verify: bool = False):
+        self._http2  = http2
+        self._verify = verify
+        self._client: httpx.AsyncClient | None = None
+        self.requests = 0
+
+    # API publique ------------------------------------------------------------
+    async def startup(self):
+        self._ensure()
+
+    async def shutdown(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._ensure()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **pool_stats(self._client),
+            "requests"       : self.requests,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive"  : HTTP_MAX_KEEPALIVE,
+            "http2_enabled"  : self._http2,
+        }
+
+    # Internes ----------------------------------------------------------------
+    def _ensure(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            if self._http2 and not _h2_available():
+                logger.warning("Paquet h2 absent — HTTP/2 désactivé (pip install httpx[http2])")
+                self._http2 = False
+            self._client = httpx.AsyncClient(
+                http2=self._http2,
+                verify=self._verify,
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                event_hooks={"request": [self._count]},
+            )
+        return self._client
+
+    async def _count(self, _request: httpx.Request):
+        self.requests += 1
+
+# instance globale (MIB)
+mib_http = HttpPool()
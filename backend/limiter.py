@@ -0,0 +1,185 @@
+# backend/limiter.py
+"""
+Limiteur de concurrence adaptatif vers l’API MIB (AIMD)
+• Une fenêtre de requêtes en vol par endpoint (assets/search, status)
+• Succès sous LIMITER_TARGET_LATENCY → fenêtre +1 par fenêtre complète
+• 429 / 5xx / timeout / latence > cible → fenêtre × LIMITER_BACKOFF
+  (au plus une baisse par latence observée, comme TCP)
+• Au-delà de la fenêtre : file FIFO bornée, attente max LIMITER_QUEUE_TIMEOUT
+• Latences des derniers succès gardées (quantile → délai de relance, cf. hedge)
+"""
+
+from __future__ import annotations
+import os, asyncio, time, logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+from .metrics import REGISTRY, UPSTREAM_SECONDS
+
+LIMITER_INITIAL        = float(os.getenv("LIMITER_INITIAL",        "8"))
+LIMITER_MIN            = float(os.getenv("LIMITER_MIN",            "1"))
+LIMITER_MAX            = float(os.getenv("LIMITER_MAX",            "64"))
+LIMITER_BACKOFF        = float(os.getenv("LIMITER_BACKOFF",        "0.7"))
+LIMITER_TARGET_LATENCY = float(os.getenv("LIMITER_TARGET_LATENCY", "2.0"))   # s
+LIMITER_QUEUE_MAX      = int(os.getenv("LIMITER_QUEUE_MAX",        "500"))
+LIMITER_QUEUE_TIMEOUT  = float(os.getenv("LIMITER_QUEUE_TIMEOUT",  "10"))    # s
+LIMITER_LATENCY_WINDOW = int(os.getenv("LIMITER_LATENCY_WINDOW",   "256"))   # derniers succès
+
+logger = logging.getLogger("limiter")
+
+
+class UpstreamBusy(httpx.PoolTimeout):
+    """File du limiteur pleine ou attente trop longue (traité comme un HTTPError)."""
+
+
+def is_overload(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+async def checked(call: Awaitable[httpx.Response]) -> httpx.Response:
+    """raise_for_status() dans l’appel limité : le limiteur voit le code d’erreur."""
+    resp = await call
+    resp.raise_for_status()
+    return resp
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, initial: float = LIMITER_INITIAL,
+                 minimum: float = LIMITER_MIN, maximum: float = LIMITER_MAX,
+                 target_latency: float = LIMITER_TARGET_LATENCY,
+                 queue_max: int = LIMITER_QUEUE_MAX,
+                 queue_timeout: float = LIMITER_QUEUE_TIMEOUT):
+        self.name      = name
+        self.limit     = initial
+        self._min, self._max = minimum, maximum
+        self._target   = target_latency
+        self._queue_max     = queue_max
+        self._queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_drop = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LIMITER_LATENCY_WINDOW)
+        self.ok = self.overloads = self.rejected = 0
+
+    async def run(self, fn: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Exécute fn() dans la fenêtre ; sa réponse / erreur ajuste la fenêtre.
+        fn() lève de préférence HTTPStatusError (cf. checked) ; une réponse
+        429 / 5xx renvoyée telle quelle compte aussi comme surcharge.
+        """
+        await self._acquire()
+        start = time.monotonic()
+        overload, status = True, "error"
+        try:
+            resp = await fn()
+            overload, status = is_overload(resp.status_code), str(resp.status_code)
+            return resp
+        except httpx.HTTPStatusError as exc:
+            overload = is_overload(exc.response.status_code)
+            status   = str(exc.response.status_code)
+            raise
+        except asyncio.CancelledError:                  # appelant parti : neutre
+            overload, status = False, "cancelled"
+            raise
+        finally:
+            latency = time.monotonic() - start
+            UPSTREAM_SECONDS.observe(latency, upstream="mib", endpoint=self.name,
+                                     status=status)
+            self._release(latency, overload)
+            if status.startswith("2"):
+                self._latencies.append(latency)
+
+    def quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """Quantile des latences récentes (None tant qu’il y a trop peu d’échantillons)."""
+        if len(self._latencies) < min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit"    : round(self.limit, 2),
+            "in_flight": self._in_flight,
+            "queued"   : len(self._waiters),
+            "ok"       : self.ok,
+            "overloads": self.overloads,
+            "rejected" : self.rejected,
+        }
+
+    # Internes ----------------------------------------------------------------
+    async def _acquire(self):
+        if self._in_flight < int(self.limit) and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self._queue_max:
+            self.rejected += 1
+            raise UpstreamBusy(f"MIB {self.name} : file du limiteur pleine")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self._queue_timeout)   # slot transmis par _wake
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamBusy(f"MIB {self.name} : attente du limiteur dépassée")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():             # slot reçu puis annulé
+                self._in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+
+    def _release(self, latency: float, overload: bool):
+        self._in_flight -= 1
+        now = time.monotonic()
+        if overload or latency > self._target:
+            self.overloads += 1
+            if now - self._last_drop > latency:         # une baisse par « RTT »
+                self.limit = max(self._min, self.limit * LIMITER_BACKOFF)
+                self._last_drop = now
+                logger.info(f"Limiteur {self.name} → {self.limit:.1f}")
+        else:
+            self.ok += 1
+            self.limit = min(self._max, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._in_flight < int(self.limit):
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._in_flight += 1
+                fut.set_result(None)
+
+
+class Limiters:
+    """Un AdaptiveLimiter par endpoint MIB, créé au premier usage."""
+
+    def __init__(self):
+        self._by_name: Dict[str, AdaptiveLimiter] = {}
+
+    def __getitem__(self, name: str) -> AdaptiveLimiter:
+        lim = self._by_name.get(name)
+        if lim is None:
+            lim = self._by_name[name] = AdaptiveLimiter(name)
+        return lim
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {n: l.stats() for n, l in self._by_name.items()}
+
+    def export(self):
+        """Jauges Prometheus (appelé avant chaque rendu de /metrics)."""
+        for n, st in self.stats().items():
+            for field in ("limit", "in_flight", "queued"):
+                _LIMITER.set(st[field], endpoint=n, field=field)
+
+
+_LIMITER = REGISTRY.gauge("mib_limiter", "Fenêtre / en vol / file du limiteur MIB",
+                          ("endpoint", "field"))
+
+# instance globale
+mib_limits = Limiters()
+REGISTRY.on_collect(mib_limits.export)
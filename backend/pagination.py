@@ -0,0 +1,71 @@
+# backend/pagination.py
+"""
+Pagination parallèle à concurrence bornée
+• Page 1 d’abord : si MIB renvoie un total → on connaît le nombre de pages,
+  rien n’est demandé au-delà de ceil(total / per_page)
+• Sinon : fenêtres spéculatives de ASSETS_PAGE_WINDOW pages en parallèle
+• Sémaphore ASSETS_PAGE_CONCURRENCY, pages ré-assemblées dans l’ordre
+• Arrêt à la première page courte / vide
+"""
+
+from __future__ import annotations
+import os, asyncio, math
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+ASSETS_PER_PAGE          = int(os.getenv("ASSETS_PER_PAGE",          "100"))
+ASSETS_PAGE_CONCURRENCY  = int(os.getenv("ASSETS_PAGE_CONCURRENCY",  "8"))
+ASSETS_PAGE_WINDOW       = int(os.getenv("ASSETS_PAGE_WINDOW",       "8"))
+
+# fetch(page) → (éléments de la page, total annoncé ou None)
+PageFetcher = Callable[[int], Awaitable[Tuple[List[dict], Optional[int]]]]
+
+
+def extract_total(body: dict) -> Optional[int]:
+    """Cherche un total d’éléments dans les formats de réponse connus."""
+    for holder in (body.get("pagination"), body.get("meta"), body):
+        if not isinstance(holder, dict):
+            continue
+        # pas de "count" : souvent la taille de la page, pas celle de l’inventaire
+        for key in ("total", "totalCount", "totalItems"):
+            val = holder.get(key)
+            if isinstance(val, int) and not isinstance(val, bool):
+                return val
+    return None
+
+
+async def paginate(fetch: PageFetcher,
+                   per_page: int = ASSETS_PER_PAGE,
+                   concurrency: int = ASSETS_PAGE_CONCURRENCY,
+                   window: int = ASSETS_PAGE_WINDOW) -> List[dict]:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(page: int) -> List[dict]:
+        async with sem:
+            items, _ = await fetch(page)
+            return items
+
+    first, total = await fetch(1)
+    items = list(first)
+    if len(first) < per_page:
+        return items
+
+    # 1) total connu → exactement les pages restantes, d’un coup
+    if total is not None:
+        last = math.ceil(total / per_page)
+        pages = await asyncio.gather(*(bounded(p) for p in range(2, last + 1)))
+        for chunk in pages:
+            items.extend(chunk)
+            if len(chunk) < per_page:
+                break
+        return items
+
+    # 2) total inconnu → fenêtres spéculatives jusqu’à la page courte
+    start = 2
+    while True:
+        pages = await asyncio.gather(
+            *(bounded(p) for p in range(start, start + max(1, window))))
+        for chunk in pages:
+            items.extend(chunk)
+            if len(chunk) < per_page:
+                return items
+        start += len(pages)
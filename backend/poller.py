@@ -0,0 +1,259 @@
+# backend/poller.py
+"""
+Poller de fond des /status MIB (cache toujours chaud)
+• Un échéancier par asset (tas trié sur la prochaine échéance)
+• Intervalle selon le dernier global_status : Critical/Warning souvent, OK rarement,
+  et plus souvent encore pendant POLL_CHANGED_WINDOW après un changement d’état
+• Budget global de requêtes vers MIB (seau à jetons POLL_RATE / POLL_BURST)
+• Gigue ±POLL_JITTER sur chaque intervalle pour étaler la charge
+• Un seul réplica poll à la fois : bail Redis poller:leader (SET NX PX, renouvelé
+  tant que le réplica vit) ; Redis KO → poll local, comme le single-flight
+"""
+
+from __future__ import annotations
+import os, asyncio, heapq, random, time, uuid, logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+POLL_ENABLED           = os.getenv("POLL_ENABLED", "1") == "1"
+POLL_INTERVAL_CRITICAL = float(os.getenv("POLL_INTERVAL_CRITICAL", "30"))
+POLL_INTERVAL_WARNING  = float(os.getenv("POLL_INTERVAL_WARNING",  "60"))
+POLL_INTERVAL_UNKNOWN  = float(os.getenv("POLL_INTERVAL_UNKNOWN",  "120"))
+POLL_INTERVAL_OK       = float(os.getenv("POLL_INTERVAL_OK",       "300"))
+POLL_INTERVAL_CHANGED  = float(os.getenv("POLL_INTERVAL_CHANGED",  "15"))
+POLL_INTERVAL_ERROR    = float(os.getenv("POLL_INTERVAL_ERROR",    "60"))
+POLL_CHANGED_WINDOW    = float(os.getenv("POLL_CHANGED_WINDOW",    "600"))
+POLL_RATE              = float(os.getenv("POLL_RATE",              "5"))    # req/s
+POLL_BURST             = float(os.getenv("POLL_BURST",             "10"))
+POLL_JITTER            = float(os.getenv("POLL_JITTER",            "0.2"))
+POLL_WORKERS           = int(os.getenv("POLL_WORKERS",             "8"))
+POLL_LEASE_TTL         = float(os.getenv("POLL_LEASE_TTL",         "30"))   # s
+
+logger = logging.getLogger("poller")
+
+# poll(asset) → global_status ("OK" / "Warning" / "Critical" / "Unknown")
+PollFn   = Callable[[dict], Awaitable[str]]
+AssetsFn = Callable[[], List[dict]]
+
+LEASE_KEY = "poller:leader"
+
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+INTERVALS = {
+    "Critical": POLL_INTERVAL_CRITICAL,
+    "Warning" : POLL_INTERVAL_WARNING,
+    "Unknown" : POLL_INTERVAL_UNKNOWN,
+    "OK"      : POLL_INTERVAL_OK,
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, max(1.0, burst)
+        self._tokens  = self.burst
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens  = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Lease:
+    """Bail exclusif entre réplicas (clé Redis à durée de vie, propriétaire = jeton)."""
+
+    def __init__(self, rcache, key: str = LEASE_KEY, ttl: float = POLL_LEASE_TTL):
+        self._rcache = rcache
+        self.key, self.ttl = key, ttl
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    async def hold(self) -> bool:
+        """Renouvelle le bail s’il est à nous, sinon tente de le prendre."""
+        client, px = self._rcache.client, int(self.ttl * 1000)
+        try:
+            held = bool(await client.eval(_RENEW, 1, self.key, self.token, px)) or \
+                   bool(await client.set(self.key, self.token, nx=True, px=px))
+        except Exception as e:                      # Redis KO → chaque réplica poll
+            logger.warning(f"Bail du poller indisponible ({e}) — poll local")
+            held = True
+        if held != self.held:
+            logger.info("🗳️  Poller : bail " + ("pris" if held else "perdu"))
+        self.held = held
+        return held
+
+    async def release(self):
+        if self.held:
+            self.held = False
+            try:
+                await self._rcache.client.eval(_RELEASE, 1, self.key, self.token)
+            except Exception:
+                pass                                # expirera seul
+
+
+class _AssetState:
+    __slots__ = ("asset", "status", "changed_at", "polled_at", "errors", "due")
+
+    def __init__(self, asset: dict):
+        self.asset      = asset
+        self.status:     str | None   = None
+        self.changed_at: float | None = None
+        self.polled_at:  float | None = None
+        self.errors     = 0
+        self.due        = 0.0     # échéance courante (les autres entrées du tas sont périmées)
+
+
+class StatusPoller:
+    def __init__(self):
+        self._states: Dict[str, _AssetState] = {}
+        self._heap:   List[Tuple[float, str]] = []
+        self._bucket = TokenBucket(POLL_RATE, POLL_BURST)
+        self._queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+        self._poll:   PollFn | None   = None
+        self._assets: AssetsFn | None = None
+        self._lease:  Optional[Lease] = None
+        self.polls = 0
+        self.failures = 0
+
+    # API publique ------------------------------------------------------------
+    @property
+    def cache_ttl(self) -> int:
+        """TTL des entrées écrites : survit à l’intervalle le plus long (+ gigue)."""
+        longest = max(*INTERVALS.values(), POLL_INTERVAL_ERROR)
+        return int(longest * (1 + POLL_JITTER) * 2)
+
+    async def startup(self, poll: PollFn, assets: AssetsFn, rcache=None):
+        """rcache : bail partagé entre réplicas (None = ce réplica poll toujours)."""
+        if not POLL_ENABLED:
+            return
+        self._poll, self._assets = poll, assets
+        self._lease = Lease(rcache) if rcache is not None else None
+        self._queue = asyncio.Queue(maxsize=POLL_WORKERS * 2)
+        self._tasks = [asyncio.create_task(self._scheduler())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(POLL_WORKERS)]
+        if self._lease is not None:
+            self._tasks.append(asyncio.create_task(self._keep_lease()))
+
+    async def shutdown(self):
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+        if self._lease is not None:
+            await self._lease.release()             # un autre réplica reprend sans attendre le TTL
+
+    def interval(self, state: _AssetState, now: float) -> float:
+        if state.errors:
+            base = POLL_INTERVAL_ERROR
+        elif state.changed_at is not None and now - state.changed_at < POLL_CHANGED_WINDOW:
+            base = POLL_INTERVAL_CHANGED
+        else:
+            base = INTERVALS.get(state.status or "Unknown", POLL_INTERVAL_UNKNOWN)
+        return base * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    def stats(self) -> Dict[str, Any]:
+        by_status: Dict[str, int] = {}
+        for st in self._states.values():
+            by_status[st.status or "pending"] = by_status.get(st.status or "pending", 0) + 1
+        return {
+            "enabled"  : POLL_ENABLED,
+            "leader"   : self._lease is None or self._lease.held,
+            "assets"   : len(self._states),
+            "by_status": by_status,
+            "polls"    : self.polls,
+            "failures" : self.failures,
+            "queued"   : self._queue.qsize() if self._queue else 0,
+            "rate"     : POLL_RATE,
+        }
+
+    # Internes ----------------------------------------------------------------
+    def _sync(self, now: float):
+        """Aligne l’échéancier sur l’index d’assets (ajouts / retraits)."""
+        current = {str(a["assetId"]): a for a in self._assets() if a.get("assetId") is not None}
+        for asset_id, asset in current.items():
+            st = self._states.get(asset_id)
+            if st is None:
+                st = self._states[asset_id] = _AssetState(asset)
+                # premiers polls étalés sur une fenêtre au lieu d’une rafale
+                spread = len(current) / max(POLL_RATE, 0.1)
+                self._push(st, asset_id, now + random.uniform(0, spread))
+            else:
+                st.asset = asset
+        for asset_id in set(self._states) - set(current):
+            del self._states[asset_id]            # l’entrée du tas sera ignorée
+
+    def _push(self, st: _AssetState, asset_id: str, due: float):
+        st.due = due
+        heapq.heappush(self._heap, (due, asset_id))
+
+    async def _scheduler(self):
+        last_sync: float | None = None
+        while True:
+            if self._lease is not None and not self._lease.held:
+                self._states.clear()                # suiveur : rien en attente
+                self._heap.clear()
+                last_sync = None                    # futur leader : premiers polls étalés
+                await asyncio.sleep(1.0)
+                continue
+            now = time.monotonic()
+            if last_sync is None or now - last_sync > 30:
+                self._sync(now)
+                last_sync = now
+            if not self._heap or self._heap[0][0] > now:
+                await asyncio.sleep(min(1.0, self._heap[0][0] - now) if self._heap else 1.0)
+                continue
+            due, asset_id = heapq.heappop(self._heap)
+            st = self._states.get(asset_id)
+            if st is None or st.due != due:
+                continue
+            await self._bucket.acquire()
+            await self._queue.put(asset_id)
+
+    async def _keep_lease(self):
+        """Renouvelé à part : un scheduler bloqué (file pleine) ne perd pas le bail."""
+        while True:
+            await self._lease.hold()
+            await asyncio.sleep(self._lease.ttl / 3)
+
+    async def _worker(self):
+        while True:
+            asset_id = await self._queue.get()
+            st = self._states.get(asset_id)
+            if st is None:
+                continue
+            try:
+                status = await self._poll(st.asset)
+                if status != st.status:
+                    if st.status is not None:
+                        st.changed_at = time.monotonic()
+                    st.status = status
+                st.errors = 0
+                self.polls += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                st.errors += 1
+                self.failures += 1
+                logger.warning(f"Poll {asset_id} KO : {e}")
+            now = time.monotonic()
+            st.polled_at = now
+            self._push(st, asset_id, now + self.interval(st, now))
+
+# instance globale
+poller = StatusPoller()
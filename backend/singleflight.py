@@ -0,0 +1,108 @@
+# backend/singleflight.py
+"""
+Coalescence des cache-miss concurrents (« single-flight »)
+• SingleFlight       : dans le process, un seul calcul en vol par clé ;
+                       tous les appelants reçoivent le même résultat / la même erreur
+• RedisSingleFlight  : entre réplicas, verrou Redis SET NX PX ;
+                       les suiveurs relisent le cache jusqu’à ce que le leader l’ait rempli
+"""
+
+from __future__ import annotations
+import os, asyncio, time, uuid, logging
+from typing import Any, Awaitable, Callable, Dict
+
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", "30"))   # s
+SINGLEFLIGHT_WAIT     = float(os.getenv("SINGLEFLIGHT_WAIT",     "20"))   # s
+SINGLEFLIGHT_POLL     = float(os.getenv("SINGLEFLIGHT_POLL",     "0.05")) # s
+SINGLEFLIGHT_ERR_TTL  = int(os.getenv("SINGLEFLIGHT_ERR_TTL",    "5"))    # s
+
+logger = logging.getLogger("singleflight")
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlightError(RuntimeError):
+    """Erreur du leader (autre réplica) relayée aux suiveurs."""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        # shield : l’annulation d’un appelant n’annule pas le calcul partagé
+        return await asyncio.shield(task)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()   # évite « exception was never retrieved »
+
+
+class RedisSingleFlight:
+    def __init__(self, rcache, local: SingleFlight | None = None):
+        self._rcache = rcache
+        self._local  = local or SingleFlight()
+
+    async def do(self, key: str,
+                 fn:   Callable[[], Awaitable[Any]],
+                 read: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        fn   : calcule ET écrit la valeur en cache, puis la renvoie
+        read : relit la valeur en cache (None si absente)
+        """
+        return await self._local.do(key, lambda: self._distributed(key, fn, read))
+
+    # Internes ----------------------------------------------------------------
+    async def _distributed(self, key, fn, read):
+        client   = self._rcache.client
+        lock_key = f"sf:lock:{key}"
+        err_key  = f"sf:err:{key}"
+        token    = uuid.uuid4().hex
+        deadline = time.monotonic() + SINGLEFLIGHT_WAIT
+
+        while True:
+            try:
+                acquired = await client.set(lock_key, token, nx=True,
+                                            px=int(SINGLEFLIGHT_LOCK_TTL * 1000))
+            except Exception as e:                  # Redis KO → calcul local
+                logger.warning(f"Verrou single-flight indisponible ({e})")
+                return await fn()
+
+            if acquired:
+                await client.delete(err_key)        # erreur d’un tour précédent
+                try:
+                    return await fn()
+                except Exception as e:
+                    await client.setex(err_key, SINGLEFLIGHT_ERR_TTL, str(e))
+                    raise
+                finally:
+                    await client.eval(_RELEASE, 1, lock_key, token)
+
+            # suiveur : attendre que le leader remplisse le cache
+            while time.monotonic() < deadline:
+                await asyncio.sleep(SINGLEFLIGHT_POLL)
+                value = await read()
+                if value is not None:
+                    return value
+                err = await client.get(err_key)
+                if err:
+                    raise SingleFlightError(err.decode(errors="replace"))
+                if not await client.exists(lock_key):
+                    break                           # leader parti sans résultat
+            else:
+                return await fn()                   # attente épuisée
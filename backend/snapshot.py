@@ -0,0 +1,322 @@
+# backend/snapshot.py
+"""
+Instantané disque de l’inventaire et des derniers statuts VM (démarrage à chaud)
+• Fichier colonne : un tableau d’indices par colonne (mmap), valeurs distinctes
+  en dictionnaire dans l’en-tête (clients, statuts, sévérités se répètent beaucoup)
+• Tables : assets, vms (champs simples du payload), services, checks
+• Écrit toutes les SNAPSHOT_INTERVAL s et à l’arrêt (fichier temporaire + rename)
+• Relu au démarrage : index et résumé servis tout de suite (marqués périmés),
+  chaque payload n’est décodé qu’à la demande
+• File de réconciliation : VM en échec remises en fin de file, abandonnées
+  après SNAPSHOT_RECONCILE_ATTEMPTS échecs ; rafraîchies ailleurs → retirées
+"""
+
+from __future__ import annotations
+import os, sys, json, mmap, time, asyncio, logging
+from array import array
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+SNAPSHOT_PATH     = os.getenv("SNAPSHOT_PATH", "/var/lib/mib/snapshot.bin")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))     # s ; 0 = jamais
+SNAPSHOT_MAX_AGE  = float(os.getenv("SNAPSHOT_MAX_AGE",  "86400"))   # s ; plus vieux → ignoré
+SNAPSHOT_RECONCILE_ATTEMPTS = int(os.getenv("SNAPSHOT_RECONCILE_ATTEMPTS", "5"))
+
+logger = logging.getLogger("snapshot")
+
+MAGIC = b"MIBSNAP\x01"
+
+# Champs structurés du payload VM, rangés dans leurs propres tables
+SERVICES = "monitored_services"
+CHECKS   = "monitoring_details"
+
+# collect() → (inventaire, {assetId: payload VM})
+Collect = Callable[[], Awaitable[Tuple[List[dict], Dict[str, dict]]]]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Encodage colonne
+# ═════════════════════════════════════════════════════════════════════════════
+_ABSENT = object()                      # clé absente ≠ valeur None
+
+def _typecode(n: int) -> str:
+    return "B" if n < 1 << 8 else "H" if n < 1 << 16 else "I"
+
+def _dict_column(values: List[Any]) -> Tuple[list, array]:
+    """Indice 0 = clé absente ; valeurs distinctes (comparées en JSON) à partir de 1."""
+    distinct: Dict[Tuple[bool, str], int] = {}
+    table: list = [None]
+    idx: List[int] = []
+    for v in values:
+        if v is _ABSENT:
+            idx.append(0)
+            continue
+        key = (True, v) if isinstance(v, str) else (False, json.dumps(v, sort_keys=True))
+        i = distinct.get(key)
+        if i is None:
+            i = distinct[key] = len(table)
+            table.append(v)
+        idx.append(i)
+    return table, array(_typecode(len(table)), idx)
+
+def _table(rows: List[dict], ints: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    names: Dict[str, None] = {}
+    for r in rows:
+        names.update(dict.fromkeys(r))
+    cols = {}
+    for name in names:
+        values = [r.get(name, _ABSENT) for r in rows]
+        if name in ints:
+            cols[name] = (None, array(_typecode(max(values, default=0) + 1), values))
+        else:
+            cols[name] = _dict_column(values)
+    return {"rows": len(rows), "columns": cols}
+
+def encode(assets: List[dict], payloads: Dict[str, dict], created: float) -> bytes:
+    vms, services, checks = [], [], []
+    asset_rows = {str(a.get("assetId")): i for i, a in enumerate(assets)}
+    for asset_id, p in payloads.items():
+        row = asset_rows.get(asset_id)
+        if row is None or not isinstance(p, dict):
+            continue
+        svc = p.get(SERVICES) or {}
+        chk = p.get(CHECKS) or []
+        vm  = {k: v for k, v in p.items() if k not in (SERVICES, CHECKS)}
+        vm.update({"_asset": row, "_svc0": len(services), "_svcs": len(svc),
+                   "_chk0": len(checks), "_chks": len(chk)})
+        vms.append(vm)
+        services.extend({"name": k, "status": v} for k, v in svc.items())
+        checks.extend(chk)
+
+    tables = {
+        "assets"  : _table(assets),
+        "vms"     : _table(vms, ints=("_asset", "_svc0", "_svcs", "_chk0", "_chks")),
+        "services": _table(services),
+        "checks"  : _table(checks),
+    }
+    header: Dict[str, Any] = {"created": created, "byteorder": sys.byteorder, "tables": {}}
+    blobs: List[bytes] = []
+    offset = 0
+    for tname, t in tables.items():
+        cols = {}
+        for cname, (values, idx) in t["columns"].items():
+            raw = idx.tobytes()
+            cols[cname] = {"type": idx.typecode, "off": offset, "len": len(raw),
+                           "dict": values}
+            blobs.append(raw)
+            offset += len(raw)
+        header["tables"][tname] = {"rows": t["rows"], "columns": cols}
+    head = json.dumps(header, separators=(",", ":")).encode()
+    return MAGIC + len(head).to_bytes(4, "little") + head + b"".join(blobs)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Lecture (mmap, décodage paresseux)
+# ═════════════════════════════════════════════════════════════════════════════
+class _Column:
+    __slots__ = ("values", "idx")
+
+    def __init__(self, values: Optional[list], idx):
+        self.values, self.idx = values, idx
+
+    def get(self, i: int) -> Any:
+        if self.values is None:
+            return self.idx[i]
+        j = self.idx[i]
+        return _ABSENT if j == 0 else self.values[j]
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError("format d’instantané inconnu")
+        hlen = int.from_bytes(self._mm[8:12], "little")
+        header = json.loads(self._mm[12:12 + hlen])
+        base, swap = 12 + hlen, header["byteorder"] != sys.byteorder
+        self.created = header["created"]
+        self._tables: Dict[str, Tuple[int, Dict[str, _Column]]] = {}
+        view = memoryview(self._mm)
+        for tname, t in header["tables"].items():
+            cols = {}
+            for cname, c in t["columns"].items():
+                raw = view[base + c["off"]: base + c["off"] + c["len"]]
+                if swap:
+                    idx = array(c["type"], raw)
+                    idx.byteswap()
+                else:
+                    idx = raw.cast(c["type"])
+                cols[cname] = _Column(c["dict"], idx)
+            self._tables[tname] = (t["rows"], cols)
+        self._vm_rows: Dict[str, int] = {}
+        rows, cols = self._tables["vms"]
+        for i in range(rows):
+            asset = self._row("assets", cols["_asset"].get(i))
+            self._vm_rows[str(asset.get("assetId"))] = i
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created
+
+    def assets(self) -> List[dict]:
+        return [self._row("assets", i) for i in range(self._tables["assets"][0])]
+
+    def payload(self, asset_id: str) -> Optional[dict]:
+        i = self._vm_rows.get(str(asset_id))
+        if i is None:
+            return None
+        vm = self._row("vms", i)
+        s0, sn, c0, cn = (vm.pop(k) for k in ("_svc0", "_svcs", "_chk0", "_chks"))
+        vm.pop("_asset")
+        services = [self._row("services", j) for j in range(s0, s0 + sn)]
+        vm[SERVICES] = {s["name"]: s["status"] for s in services}
+        vm[CHECKS]   = [self._row("checks", j) for j in range(c0, c0 + cn)]
+        return vm
+
+    def asset_ids(self) -> List[str]:
+        return list(self._vm_rows)
+
+    def close(self):
+        self._tables, self._vm_rows = {}, {}
+        try:
+            self._mm.close()
+        except BufferError:                 # vues encore référencées : libérées au GC
+            pass
+
+    def _row(self, table: str, i: int) -> dict:
+        out = {}
+        for name, col in self._tables[table][1].items():
+            v = col.get(i)
+            if v is not _ABSENT:
+                out[name] = v
+        return out
+
+
+def write_snapshot(path: str, assets: List[dict], payloads: Dict[str, dict]) -> int:
+    data = encode(assets, payloads, time.time())
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)                   # lecteurs : ancien ou nouveau, jamais partiel
+    return len(data)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Cycle de vie : chargement au démarrage, écriture périodique
+# ═════════════════════════════════════════════════════════════════════════════
+class SnapshotStore:
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self.loaded: Optional[Snapshot] = None
+        # VM servies depuis l’instantané, pas encore rafraîchies → échecs (ordre = file)
+        self._pending: Dict[str, int] = {}
+        self._collect: Collect | None = None
+        self._task:   asyncio.Task | None = None
+        self.saves, self.last_bytes, self.last_save = 0, 0, None
+
+    def load(self) -> bool:
+        try:
+            snap = Snapshot(self.path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Instantané illisible ({e}) — ignoré")
+            return False
+        if snap.age > SNAPSHOT_MAX_AGE:
+            logger.info(f"Instantané trop ancien ({snap.age:.0f} s) — ignoré")
+            snap.close()
+            return False
+        self.loaded   = snap
+        self._pending = dict.fromkeys(snap.asset_ids(), 0)
+        logger.info(f"💾  Instantané chargé ({len(self._pending)} VM, âge {snap.age:.0f} s)")
+        return True
+
+    def stale_payload(self, asset_id: str) -> Optional[dict]:
+        if self.loaded is None or str(asset_id) not in self._pending:
+            return None
+        return self.loaded.payload(asset_id)
+
+    def pending(self) -> List[str]:
+        return list(self._pending)
+
+    def payloads(self) -> Iterator[Tuple[str, dict]]:
+        for asset_id in list(self._pending):
+            p = self.stale_payload(asset_id)
+            if p is not None:
+                yield asset_id, p
+
+    def discard(self, asset_ids):
+        """VM rafraîchies : l’instantané ne les sert plus (libéré une fois vide)."""
+        for i in asset_ids:
+            self._pending.pop(str(i), None)
+        self._release()
+
+    def retry_later(self, asset_ids) -> List[str]:
+        """Échecs de réconciliation : fin de file, abandon après N échecs (renvoyés)."""
+        dropped = []
+        for i in map(str, asset_ids):
+            n = self._pending.pop(i, None)
+            if n is None:
+                continue
+            if n + 1 >= SNAPSHOT_RECONCILE_ATTEMPTS:
+                dropped.append(i)
+            else:
+                self._pending[i] = n + 1
+        if dropped:
+            logger.warning(f"Instantané : {len(dropped)} VM abandonnées après "
+                           f"{SNAPSHOT_RECONCILE_ATTEMPTS} échecs")
+        self._release()
+        return dropped
+
+    def _release(self):
+        if self.loaded is not None and not self._pending:
+            self.loaded.close()
+            self.loaded = None
+
+    async def startup(self, collect: Collect):
+        self._collect = collect
+        if SNAPSHOT_INTERVAL > 0:
+            self._task = asyncio.create_task(self._writer())
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            await self.save()               # dernier état pour le prochain démarrage
+
+    async def save(self):
+        if self._collect is None:
+            return
+        try:
+            assets, payloads = await self._collect()
+            if not assets:
+                return
+            self.last_bytes = await asyncio.to_thread(write_snapshot, self.path,
+                                                      assets, payloads)
+            self.saves += 1
+            self.last_save = time.time()
+            logger.info(f"💾  Instantané écrit ({len(payloads)} VM, {self.last_bytes} o)")
+        except Exception as e:
+            logger.warning(f"Écriture de l’instantané KO ({e})")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path"      : self.path,
+            "loaded_age": None if self.loaded is None else round(self.loaded.age),
+            "pending"   : len(self._pending),
+            "saves"     : self.saves,
+            "last_bytes": self.last_bytes,
+            "last_save" : self.last_save,
+        }
+
+    async def _writer(self):
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            await self.save()
+
+# instance globale
+snapshots = SnapshotStore()
@@ -0,0 +1,137 @@
+# backend/summary.py
+"""
+Résumé de flotte tenu à jour incrémentalement
+• Alimenté à chaque écriture d’un payload machine (poller, /machine, /machines)
+• Par client : nombre de VM par global_status, nombre de checks par statut
+• Checks de toute la flotte en colonnes (check_store) : /checks?status= filtre
+  par masques sur les codes, les dicts ne sont construits que pour la réponse
+• ETag dérivé d’un numéro de version (aucune sérialisation pour le calculer)
+"""
+
+from __future__ import annotations
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .redis_cache import etag_of
+from .check_store import CheckStore, CHECK_FIELDS
+from .status_buckets import check_bucket
+
+
+class _VmEntry:
+    __slots__ = ("client", "vm", "status", "by_bucket", "sig")
+
+    def __init__(self, client: str, vm: str, status: str,
+                 by_bucket: Dict[str, int], sig: int):
+        self.client    = client
+        self.vm        = vm
+        self.status    = status
+        self.by_bucket = by_bucket          # bucket → nombre de checks
+        self.sig       = sig                # empreinte des checks (les lignes sont dans le store)
+
+    def same_as(self, other: "_VmEntry") -> bool:
+        return (self.client, self.vm, self.status, self.sig) == \
+               (other.client, other.vm, other.status, other.sig)
+
+
+class FleetSummary:
+    def __init__(self):
+        self._vms:       Dict[str, _VmEntry]             = {}
+        self._vm_counts: Dict[str, Dict[str, int]]       = {}   # client → global_status → n
+        self._chk_counts: Dict[str, Dict[str, int]]      = {}   # client → bucket → n
+        self._checks = CheckStore(("client", "vm", "global_status"))
+        self._origin  = uuid.uuid4().hex[:8]
+        self.version  = 0
+
+    # Écritures ---------------------------------------------------------------
+    def update(self, asset_id: Any, payload: dict) -> bool:
+        """Remplace la contribution d’une VM ; False si rien n’a changé."""
+        asset_id  = str(asset_id)
+        checks    = payload.get("monitoring_details", [])
+        by_bucket: Dict[str, int] = {}
+        for chk in checks:
+            b = check_bucket(chk.get("status"))
+            by_bucket[b] = by_bucket.get(b, 0) + 1
+        entry = _VmEntry(payload.get("customerName") or "",
+                         payload.get("machine") or "",
+                         payload.get("global_status") or "Unknown",
+                         by_bucket,
+                         hash(tuple(tuple(c.get(f) for f in CHECK_FIELDS) for c in checks)))
+
+        old = self._vms.get(asset_id)
+        if old is not None and old.same_as(entry):
+            return False
+        if old is not None:
+            self._apply(old, -1)
+        self._vms[asset_id] = entry
+        self._apply(entry, +1)
+        self._checks.replace(asset_id, {"client": entry.client, "vm": entry.vm,
+                                        "global_status": entry.status}, checks)
+        self.version += 1
+        return True
+
+    def update_many(self, items: Iterable[Tuple[Any, dict]]):
+        for asset_id, payload in items:
+            if payload is not None:
+                self.update(asset_id, payload)
+
+    def retain(self, asset_ids: Iterable[Any]):
+        """Oublie les VM sorties de l’inventaire."""
+        keep = {str(i) for i in asset_ids}
+        gone = [i for i in self._vms if i not in keep]
+        for asset_id in gone:
+            self._apply(self._vms.pop(asset_id), -1)
+            self._checks.remove(asset_id)
+        if gone:
+            self.version += 1
+
+    # Lectures ----------------------------------------------------------------
+    def clients(self, client: Optional[str] = None) -> Dict[str, dict]:
+        """Compteurs par client (filtre sous-chaîne, insensible à la casse)."""
+        needle = (client or "").lower()
+        return {
+            name: {
+                "vms"   : dict(self._vm_counts.get(name, {})),
+                "checks": dict(counts),
+                "ko_any": counts.get("Critical", 0) > 0,
+            }
+            for name, counts in self._chk_counts.items()
+            if needle in name.lower()
+        }
+
+    def checks(self, status: str, client: Optional[str] = None) -> List[dict]:
+        """Checks d’un statut, déjà aplatis (client, vm, global_status, check…)."""
+        bucket  = check_bucket(status)
+        filters = {"status": lambda st: check_bucket(st) == bucket}
+        if client:
+            needle = client.lower()
+            filters["client"] = lambda c: needle in c.lower()
+        ids = self._checks.select(**filters)
+        # tri (client, vm) sur les codes relus, ordre des checks d’une VM conservé
+        ids.sort(key=lambda i: (self._checks.value("client", i), self._checks.value("vm", i)))
+        return self._checks.rows(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"vms": len(self._vms), "checks": self._checks.stats()}
+
+    def etag(self, *parts: Optional[str]) -> str:
+        return etag_of("|".join((self._origin, str(self.version), *(p or "" for p in parts))))
+
+    def __len__(self) -> int:
+        return len(self._vms)
+
+    # Internes ----------------------------------------------------------------
+    def _apply(self, e: _VmEntry, sign: int):
+        vms = self._vm_counts.setdefault(e.client, {})
+        vms[e.status] = vms.get(e.status, 0) + sign
+        chk = self._chk_counts.setdefault(e.client, {})
+        for bucket, n in e.by_bucket.items():
+            chk[bucket] = chk.get(bucket, 0) + sign * n
+        for counts in (vms, chk):
+            for k in [k for k, n in counts.items() if n <= 0]:
+                del counts[k]
+        if not vms:
+            self._vm_counts.pop(e.client, None)
+            self._chk_counts.pop(e.client, None)
+
+
+fleet_summary = FleetSummary()
@@ -0,0 +1,229 @@
+# backend/tiered_cache.py
+"""
+Cache à deux niveaux pour status:<id> / machine:<id>
+• L1 : LRU en process, TTL par clé, bornée en entrées ET en octets,
+       compteurs hits / misses / evictions / expirations ; les valeurs y sont
+       décodées, leur taille est estimée (JSON compact × L1_OBJECT_OVERHEAD),
+       pas celle de l’entrée Redis compressée
+• L2 : Redis (redis_cache.rcache)
+• Toute écriture publie les clés sur CACHE_INVALIDATE_CHANNEL :
+  les autres réplicas les retirent de leur L1
+"""
+
+from __future__ import annotations
+import os, asyncio, json, time, uuid, logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .redis_cache import RedisCache, dumpb, loads
+from .metrics import cache_event
+from .timing import span
+
+L1_MAX_ENTRIES           = int(os.getenv("L1_MAX_ENTRIES", "5000"))
+L1_MAX_BYTES             = int(os.getenv("L1_MAX_BYTES",   str(64 * 1024 * 1024)))
+L1_TTL                   = float(os.getenv("L1_TTL",       "30"))   # plafond L1 (s)
+L1_SWEEP_INTERVAL        = float(os.getenv("L1_SWEEP_INTERVAL", "30"))
+L1_OBJECT_OVERHEAD       = float(os.getenv("L1_OBJECT_OVERHEAD", "6"))  # octets RAM / octet JSON
+CACHE_INVALIDATE_CHANNEL = os.getenv("CACHE_INVALIDATE_CHANNEL", "cache:invalidate")
+
+logger = logging.getLogger("tiered_cache")
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# L1 : LRU + TTL par clé
+# ════════════════════════════════════════════════════════════════════════════
+def decoded_size(obj: Any) -> int:
+    """Empreinte mémoire estimée d’une valeur décodée (dicts / str Python)."""
+    return int(len(dumpb(obj)) * L1_OBJECT_OVERHEAD)
+
+class LRUTTLCache:
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES,
+                 max_bytes: int = L1_MAX_BYTES, default_ttl: float = 0):
+        self._store: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes   = max_bytes
+        self._default_ttl = default_ttl
+        self._bytes       = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: str):
+        item = self._store.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        val, exp, _ = item
+        if exp <= time.time():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._store.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def set(self, key: str, val: Any, ttl: Optional[float] = None, size: int = 0):
+        ttl = self._default_ttl if ttl is None else ttl
+        if ttl <= 0 or size > self._max_bytes:
+            return
+        self._drop(key)
+        self._store[key] = (val, time.time() + ttl, size)
+        self._bytes += size
+        if len(self._store) > self._max_entries or self._bytes > self._max_bytes:
+            self.purge_expired()
+        while len(self._store) > self._max_entries or self._bytes > self._max_bytes:
+            oldest = next(iter(self._store))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._drop(key)
+
+    def clear(self):
+        self._store.clear()
+        self._bytes = 0
+
+    def purge_expired(self) -> int:
+        now  = time.time()
+        dead = [k for k, (_, exp, _) in self._store.items() if exp <= now]
+        for k in dead:
+            self._drop(k)
+        self.expirations += len(dead)
+        return len(dead)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries"    : len(self._store),
+            "bytes"      : self._bytes,
+            "hits"       : self.hits,
+            "misses"     : self.misses,
+            "hit_ratio"  : round(self.hits / lookups, 4) if lookups else None,
+            "evictions"  : self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _drop(self, key: str):
+        item = self._store.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# L1 + L2 (Redis) + invalidation inter-réplicas (pub/sub)
+# ════════════════════════════════════════════════════════════════════════════
+class TieredCache:
+    def __init__(self, l2: RedisCache, l1: LRUTTLCache | None = None,
+                 l1_ttl: float = L1_TTL, channel: str = CACHE_INVALIDATE_CHANNEL):
+        self.l1       = l1 or LRUTTLCache()
+        self._l2      = l2
+        self._l1_ttl  = l1_ttl
+        self._channel = channel
+        self._origin  = uuid.uuid4().hex
+        self._tasks: List[asyncio.Task] = []
+        self.l2_hits = self.l2_misses = 0
+
+    # Cycle de vie ------------------------------------------------------------
+    async def startup(self):
+        self._tasks = [asyncio.create_task(self._listen()),
+                       asyncio.create_task(self._sweeper())]
+
+    async def shutdown(self):
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+
+    # Lectures ----------------------------------------------------------------
+    async def get_json(self, key: str) -> Any:
+        val = self.l1.get(key)
+        cache_event("l1", key, val is not None)
+        if val is not None:
+            return val
+        with span("redis_read"):
+            raw = await self._l2.client.get(key)
+        return self._fill(key, raw)
+
+    async def mget_json(self, keys: List[str]) -> List[Any]:
+        out  = [self.l1.get(k) for k in keys]
+        for k, v in zip(keys, out):
+            cache_event("l1", k, v is not None)
+        miss = [i for i, v in enumerate(out) if v is None]
+        if miss:
+            with span("redis_read"):
+                raws = await self._l2.client.mget([keys[i] for i in miss])
+            for i, raw in zip(miss, raws):
+                out[i] = self._fill(keys[i], raw)
+        return out
+
+    # Écritures ---------------------------------------------------------------
+    async def set_json(self, key: str, obj: Any, ttl: int):
+        await self.set_many([(key, obj, ttl)])
+
+    async def mset_json(self, items: Dict[str, Any], ttl: int):
+        await self.set_many([(k, v, ttl) for k, v in items.items()])
+
+    async def set_many(self, entries: Iterable[Tuple[str, Any, int]]):
+        """SETEX pipelinés + mise à jour L1 + une seule publication d’invalidation."""
+        entries = list(entries)
+        if not entries:
+            return
+        pipe = self._l2.client.pipeline(transaction=False)
+        for key, obj, ttl in entries:
+            raw = self._l2.codec.encode(obj)
+            pipe.setex(key, ttl, raw)
+            self.l1.set(key, obj, min(ttl, self._l1_ttl), decoded_size(obj))
+        pipe.publish(self._channel, json.dumps({"o": self._origin,
+                                                "k": [e[0] for e in entries]}))
+        with span("redis_write"):
+            await pipe.execute()
+
+    async def invalidate(self, *keys: str):
+        for k in keys:
+            self.l1.delete(k)
+        pipe = self._l2.client.pipeline(transaction=False)
+        pipe.delete(*keys)
+        pipe.publish(self._channel, json.dumps({"o": self._origin, "k": list(keys)}))
+        await pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"l1": self.l1.stats(),
+                "l2": {"hits": self.l2_hits, "misses": self.l2_misses}}
+
+    # Internes ----------------------------------------------------------------
+    def _fill(self, key: str, raw: Optional[bytes]) -> Any:
+        val = self._l2.codec.decode(raw)
+        cache_event("l2", key, val is not None)
+        if val is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        self.l1.set(key, val, self._l1_ttl, decoded_size(val))
+        return val
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self._l2.client.pubsub()
+                await pubsub.subscribe(self._channel)
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "message":
+                        continue
+                    data = loads(msg.get("data"))
+                    if not data or data.get("o") == self._origin:
+                        continue
+                    for k in data.get("k", []):
+                        self.l1.delete(k)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # abonnement perdu : on vide L1 (invalidations manquées) et on retente
+                logger.warning(f"Abonnement invalidations KO ({e}) — L1 vidé")
+                self.l1.clear()
+                await asyncio.sleep(1)
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(L1_SWEEP_INTERVAL)
+            self.l1.purge_expired()
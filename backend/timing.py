@@ -0,0 +1,165 @@
+# backend/timing.py
+"""
+Décomposition du temps par requête → en-tête Server-Timing
+• span("redis_read") : durée ajoutée à la requête courante (contextvar),
+  cumulée si l’étape se répète ou tourne en parallèle (gather)
+• merge("be", en-tête) : reprend les timings d’un service appelé (préfixés)
+• ?profile=1 ou X-Profile: 1 → la réponse est remplacée par le rapport du
+  profileur (pyinstrument si installé, sinon cProfile) ; désactivé par défaut
+  (PROFILE_ENABLED=1), un seul profil à la fois (409 sinon), flux non profilés
+• Module identique dans backend/, api-gateway/ et frontend/ (contextes Docker séparés)
+"""
+
+from __future__ import annotations
+import os, io, time, contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+
+_current: contextvars.ContextVar[Optional[Dict[str, float]]] = \
+    contextvars.ContextVar("server_timing", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:                     # hors requête (poller, tâches de fond)
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def merge(prefix: str, header: Optional[str]):
+    """Ajoute les entrées « nom;dur=ms » d’un en-tête Server-Timing amont."""
+    timings = _current.get()
+    if timings is None or not header:
+        return
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for p in params.split(";"):
+            key, _, val = p.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[f"{prefix}-{name}"] = float(val)
+                except ValueError:
+                    pass
+
+def header_value(timings: Dict[str, float], total_ms: float) -> str:
+    parts = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Profileur à la demande
+# ═════════════════════════════════════════════════════════════════════════════
+def _wants_profile(scope) -> bool:
+    if not PROFILE_ENABLED:
+        return False
+    qs = scope.get("query_string", b"").decode()
+    if "profile=1" in qs.split("&"):
+        return True
+    return any(k == b"x-profile" and v == b"1" for k, v in scope.get("headers", []))
+
+def _is_stream(headers) -> bool:
+    """StreamingResponse : pas de content-length (SSE, NDJSON, relais)."""
+    return not any(k == b"content-length" for k, _ in headers)
+
+_profiling = False          # cProfile est global au process : un profil à la fois
+
+class _Profiler:
+    """pyinstrument (échantillonnage, async) si dispo ; sinon cProfile."""
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self._p, self.kind = Profiler(async_mode="enabled"), "pyinstrument"
+        except ImportError:
+            import cProfile
+            self._p, self.kind = cProfile.Profile(), "cProfile"
+
+    def start(self):
+        self._p.start() if self.kind == "pyinstrument" else self._p.enable()
+
+    def stop(self):
+        self._p.stop() if self.kind == "pyinstrument" else self._p.disable()
+
+    def report(self) -> str:
+        if self.kind == "pyinstrument":
+            return self._p.output_text(unicode=True, color=False)
+        import pstats
+        out = io.StringIO()
+        out.write("(cProfile : tout le process, requêtes concurrentes comprises)\n")
+        pstats.Stats(self._p, stream=out).sort_stats("cumulative").print_stats(40)
+        return out.getvalue()
+
+
+class ServerTimingMiddleware:
+    """ASGI pur : ajoute Server-Timing au début de la réponse (flux compris)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: Dict[str, float] = {}
+        token = _current.set(timings)
+        start = time.perf_counter()
+        profiler = _Profiler() if _wants_profile(scope) else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", header_value(timings, total).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        global _profiling
+        try:
+            if profiler is None:
+                return await self.app(scope, receive, send_wrapper)
+            if _profiling:
+                body = "Profil déjà en cours, réessayer plus tard\n".encode()
+                await send_wrapper({"type": "http.response.start", "status": 409,
+                                    "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                                (b"content-length", str(len(body)).encode())]})
+                return await send({"type": "http.response.body", "body": body})
+
+            status = {"code": 500, "stream": False}
+
+            async def swallow(message):         # corps d’origine remplacé par le rapport
+                global _profiling
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    if _is_stream(message.get("headers", [])):
+                        status["stream"] = True     # flux sans fin : relayé, pas profilé
+                        profiler.stop()
+                        _profiling = False
+                if status["stream"]:
+                    await send_wrapper(message)
+
+            _profiling = True
+            profiler.start()
+            try:
+                await self.app(scope, receive, swallow)
+            finally:
+                if not status["stream"]:
+                    profiler.stop()
+                    _profiling = False
+            if status["stream"]:
+                return
+            body = (f"# {profiler.kind} — {scope['method']} {scope['path']} "
+                    f"→ {status['code']}\n\n{profiler.report()}").encode()
+            await send_wrapper({"type": "http.response.start", "status": 200,
+                                "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                            (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            _current.reset(token)
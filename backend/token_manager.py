@@ -2,15 +2,26 @@
 """
 Gestion automatique du access-token pour l’API MIB
 • POST /api/auth/login  (x-www-form-urlencoded) – au démarrage
-• POST /api/auth/refresh – toutes les 15 min
+• POST /api/auth/refresh – planifié min(TOKEN_REFRESH_AHEAD, 20 % de la durée
+  de vie) avant l’expiration, jamais plus souvent que TOKEN_REFRESH_MIN_SLEEP
+• Expiration lue dans le claim « exp » du JWT (TOKEN_DEFAULT_TTL sinon)
+• get_token() sans verrou tant que le token est valide
+• Token partagé entre réplicas via Redis (mib:token) ; un seul réplica
+  rafraîchit à la fois (verrou single-flight Redis), les autres relisent
 • Fournit await token_mgr.get_token() au reste du backend
 """
 
 from __future__ import annotations
-import os, asyncio, datetime, httpx, logging
+import os, asyncio, base64, json, time, logging
 from pathlib import Path
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
+from .http_pool import mib_http
+from .redis_cache import rcache
+from .singleflight import RedisSingleFlight
+from .metrics import REGISTRY
+
 # ── .env ──────────────────────────────────────────────────────────────────────
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 
@@ -23,66 +34,173 @@ CAS_PASS = os.getenv("CASIMIR_PASSWORD")
 if not CAS_USER or not CAS_PASS:
     raise RuntimeError("CASIMIR_ACCOUNT ou CASIMIR_PASSWORD manquants")
 
+TOKEN_DEFAULT_TTL   = float(os.getenv("TOKEN_DEFAULT_TTL",   "840"))  # sans claim exp
+TOKEN_REFRESH_AHEAD = float(os.getenv("TOKEN_REFRESH_AHEAD", "120"))  # s avant exp
+TOKEN_MIN_VALIDITY  = float(os.getenv("TOKEN_MIN_VALIDITY",  "15"))   # marge fast path
+TOKEN_RETRY         = float(os.getenv("TOKEN_RETRY",         "30"))   # après échec
+TOKEN_REFRESH_MIN_SLEEP = float(os.getenv("TOKEN_REFRESH_MIN_SLEEP", "5"))  # s entre réveils
+TOKEN_REDIS_KEY     = os.getenv("TOKEN_REDIS_KEY", "mib:token")
+
 logger = logging.getLogger("token_manager")
 
+TOKEN_RENEWALS = REGISTRY.counter("mib_token_renewals_total",
+                                  "Tokens MIB obtenus (login, refresh, adopté d’un autre réplica)",
+                                  ("kind",))
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """Claim « exp » (epoch s) d’un JWT, sans vérifier la signature ; None sinon."""
+    try:
+        payload = token.split(".")[1]
+        claims  = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return None
+
 # ── Singleton ────────────────────────────────────────────────────────────────
 class TokenManager:
-    def __init__(self):
-        self._token:  str | None = None
-        self._expiry: datetime.datetime | None = None
-        self._lock   = asyncio.Lock()
+    def __init__(self, shared=rcache):
+        # (token, expiration epoch) remplacé d’un bloc → lecture sans verrou
+        self._state:  Tuple[Optional[str], float] = (None, 0.0)
+        self._lifetime = 0.0                     # durée de vie du token à l’adoption
+        self._lock    = asyncio.Lock()
+        self._task:   asyncio.Task | None = None
+        self._shared  = shared
+        self._flights = RedisSingleFlight(shared)
+        self.logins = self.refreshes = self.adopted = 0
 
     # API publique ------------------------------------------------------------
     async def startup(self):
         try:
-            await self._login()
+            await self._renew(force=False)
         except Exception as e:
             logger.error(f"Login initial KO : {e} — nouvelle tentative à la demande")
-        asyncio.create_task(self._refresher())
+        self._task = asyncio.create_task(self._refresher())
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
 
     async def get_token(self) -> str:
+        token, exp = self._state
+        if token and exp - time.time() > TOKEN_MIN_VALIDITY:     # fast path
+            return token
         async with self._lock:
-            if not self._token or self._is_expired():
-                await self._refresh_or_login()
-            return self._token
+            token, exp = self._state
+            if not token or exp - time.time() <= TOKEN_MIN_VALIDITY:
+                await self._renew(force=False)
+            return self._state[0]
+
+    def stats(self) -> dict:
+        token, exp = self._state
+        return {"valid": bool(token) and exp > time.time(),
+                "expires_in": round(exp - time.time()) if token else None,
+                "logins": self.logins, "refreshes": self.refreshes,
+                "adopted": self.adopted}
 
     # Internes ----------------------------------------------------------------
-    async def _login(self):
+    async def _renew(self, force: bool):
+        """
+        Adopte le token partagé s’il est plus récent, sinon un seul réplica
+        rafraîchit (verrou Redis) et publie ; les autres relisent mib:token.
+        force=True : rafraîchissement anticipé (token encore valide).
+        """
+        horizon = time.time() + (self._lead() if force else TOKEN_MIN_VALIDITY)
+
+        async def read():
+            entry = await self._read_shared()
+            return entry if entry and entry[1] > horizon else None
+
+        produced = False
+
+        async def renew():
+            nonlocal produced
+            entry = await read()                     # un autre réplica a pu finir
+            if entry is None:
+                entry, produced = await self._refresh_or_login(), True
+                await self._write_shared(entry)
+            return entry
+
+        entry = await self._flights.do(TOKEN_REDIS_KEY, renew, read)
+        if entry[0] != self._state[0]:
+            self.adopted += not produced
+            if not produced:
+                TOKEN_RENEWALS.inc(kind="adopted")
+            self._state, self._lifetime = entry, max(0.0, entry[1] - time.time())
+
+    async def _read_shared(self) -> Optional[Tuple[str, float]]:
+        try:
+            entry = await self._shared.get_json(TOKEN_REDIS_KEY)
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or not entry.get("t"):
+            return None
+        return entry["t"], float(entry["x"])
+
+    async def _write_shared(self, entry: Tuple[str, float]):
+        ttl = int(entry[1] - time.time())
+        if ttl <= 0:
+            return
+        try:
+            await self._shared.set_json(TOKEN_REDIS_KEY, {"t": entry[0], "x": entry[1]}, ttl)
+        except Exception as e:
+            logger.warning(f"Partage du token impossible ({e})")
+
+    async def _login(self) -> Tuple[str, float]:
         """Appel /auth/login en x-www-form-urlencoded (obligatoire)."""
         data    = {"userId": CAS_USER, "password": CAS_PASS}
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        async with httpx.AsyncClient(verify=False, timeout=10) as http:
-            r = await http.post(LOGIN_URL, data=data, headers=headers)
-            r.raise_for_status()
-            self._token  = r.json()["accessToken"]
-            self._expiry = datetime.datetime.utcnow() + datetime.timedelta(minutes=14)
-            logger.info("✅  Nouveau token obtenu")
-
-    async def _refresh(self):
-        headers = {"Authorization": f"Bearer {self._token}"}
-        async with httpx.AsyncClient(verify=False, timeout=10, headers=headers) as http:
-            r = await http.post(REFRESH_URL)
-            r.raise_for_status()
-            self._token  = r.json()["accessToken"]
-            self._expiry = datetime.datetime.utcnow() + datetime.timedelta(minutes=14)
-            logger.info("🔄  Token rafraîchi")
-
-    async def _refresh_or_login(self):
-        try:
-            await self._refresh()
-        except Exception as e:
-            logger.warning(f"Refresh KO ({e}) — login complet")
-            await self._login()
+        r = await mib_http.client.post(LOGIN_URL, data=data, headers=headers, timeout=10)
+        r.raise_for_status()
+        self.logins += 1
+        TOKEN_RENEWALS.inc(kind="login")
+        logger.info("✅  Nouveau token obtenu")
+        return self._entry(r.json()["accessToken"])
+
+    async def _refresh(self) -> Tuple[str, float]:
+        headers = {"Authorization": f"Bearer {self._state[0]}"}
+        r = await mib_http.client.post(REFRESH_URL, headers=headers, timeout=10)
+        r.raise_for_status()
+        self.refreshes += 1
+        TOKEN_RENEWALS.inc(kind="refresh")
+        logger.info("🔄  Token rafraîchi")
+        return self._entry(r.json()["accessToken"])
+
+    async def _refresh_or_login(self) -> Tuple[str, float]:
+        token, exp = self._state
+        if token and exp > time.time():
+            try:
+                return await self._refresh()
+            except Exception as e:
+                logger.warning(f"Refresh KO ({e}) — login complet")
+        return await self._login()
+
+    @staticmethod
+    def _entry(token: str) -> Tuple[str, float]:
+        return token, jwt_expiry(token) or time.time() + TOKEN_DEFAULT_TTL
 
-    def _is_expired(self) -> bool:
-        return not self._expiry or self._expiry <= datetime.datetime.utcnow()
+    def _lead(self) -> float:
+        """Avance du refresh : TOKEN_REFRESH_AHEAD, ramenée à 20 % des tokens courts."""
+        if not self._lifetime:
+            return TOKEN_REFRESH_AHEAD
+        return min(TOKEN_REFRESH_AHEAD, 0.2 * self._lifetime)
 
     async def _refresher(self):
+        """Se réveille _lead() s avant l’expiration du token courant."""
         while True:
-            await asyncio.sleep(900)  # 15 min
-            async with self._lock:
-                if self._is_expired():
-                    await self._refresh_or_login()
+            _, exp = self._state
+            delay = exp - self._lead() - time.time() if exp else TOKEN_RETRY
+            await asyncio.sleep(max(delay, TOKEN_REFRESH_MIN_SLEEP))
+            try:
+                async with self._lock:
+                    if self._state[1] - time.time() <= self._lead():
+                        await self._renew(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:                  # token courant conservé
+                logger.error(f"Rafraîchissement planifié KO : {e}")
+                await asyncio.sleep(TOKEN_RETRY)
 
 # instance globale
 token_mgr = TokenManager()
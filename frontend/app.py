@@ -3,16 +3,30 @@
 # ─────────────────────────────────────────────────────────────────────────────
 # • Sert les pages HTML (Jinja2) du dashboard.
 # • Interroge l’API-Gateway (async httpx) pour récupérer les données.
+# • Accueil et Critical/Warning lisent le résumé de flotte (/api/summary,
+#   /api/checks) au lieu des agrégats complets de chaque client.
+# • Requêtes conditionnelles (If-None-Match) vers le gateway ; les pages
+#   portent elles-mêmes un ETag → 304 sans re-rendu Jinja si rien n’a changé.
+# • /metrics Prometheus : pages, appels gateway, cache ETag local.
+# • Server-Timing par page (timings du gateway repris en « gw-* »), ?profile=1.
+# • Relaie le flux SSE des deltas (/stream/<client>) appliqué en place par la vue client.
+# • Accueil : couleurs rafraîchies toutes les HOME_REFRESH s via /summary/colors
+#   (un seul GET conditionnel, pas un flux par bouton).
+# • Vue client rendue progressivement depuis le flux NDJSON du gateway.
 ###############################################################################
 from __future__ import annotations
-from typing import List, Dict, Optional
-import asyncio, httpx
+from typing import Any, Dict, Optional, Tuple
+import hashlib, os, httpx
+from urllib.parse import quote, urlencode
 
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from timing import ServerTimingMiddleware, span, merge
+from metrics import CONTENT_TYPE, MetricsMiddleware, cache_event, metrics_text, upstream_hooks
+
 # ═════════════════════════════════════════════════════════════════════════════
 # Paramètres globaux
 # ═════════════════════════════════════════════════════════════════════════════
@@ -23,101 +37,229 @@ VALID_CLIENTS = [
     "VERIFONE SYSTEMS FRANCE SAS",
 ]
 
+# Pool HTTP vers l’API-Gateway (un seul client pour tout le process)
+HTTP_TIMEOUT          = float(os.getenv("HTTP_TIMEOUT",          "15"))
+HTTP_MAX_CONNECTIONS  = int(os.getenv("HTTP_MAX_CONNECTIONS",    "50"))
+HTTP_MAX_KEEPALIVE    = int(os.getenv("HTTP_MAX_KEEPALIVE",      "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+ETAG_CACHE_MAX        = int(os.getenv("ETAG_CACHE_MAX",          "512"))
+HOME_REFRESH          = float(os.getenv("HOME_REFRESH",          "30"))   # s
+
 # ═════════════════════════════════════════════════════════════════════════════
 # Initialisation FastAPI
 # ═════════════════════════════════════════════════════════════════════════════
 app = FastAPI(title="Frontend – ATQIHF Dashboard")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
+def render(name: str, context: dict) -> HTMLResponse:
+    """TemplateResponse chronométré (étape « render » du Server-Timing)."""
+    with span("render"):
+        return templates.TemplateResponse(name, context)
 
 # ═════════════════════════════════════════════════════════════════════════════
-# Helpers couleur-santé des boutons   (seulement rouge ou vert)
+# Client HTTP poolé : créé au startup, fermé au shutdown
 # ═════════════════════════════════════════════════════════════════════════════
-def compute_global_status(vms: List[Dict]) -> str:
-    """
-    Retourne 'KO_ANY' dès qu'un seul check est Ko/Critical dans *une* VM.
-    Sinon 'ALL_OK'.
-    """
-    for vm in vms:
-        for chk in vm.get("monitoring_details", []):
-            if chk["status"].lower() in {"ko", "critical"}:
-                return "KO_ANY"
-    return "ALL_OK"
+_http: Optional[httpx.AsyncClient] = None
+
+def gateway_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks=upstream_hooks("gateway"),
+        )
+    return _http
+
+@app.on_event("startup")
+async def _startup():
+    gateway_http()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    if _http is not None:
+        await _http.aclose()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(metrics_text(), media_type=CONTENT_TYPE)
+
+@app.get("/stats/http")
+def http_stats():
+    pool  = getattr(getattr(_http, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", []) or [])
+    return {
+        "open"           : _http is not None and not _http.is_closed,
+        "connections"    : len(conns),
+        "idle"           : sum(1 for c in conns if c.is_idle()),
+        "queued"         : len(getattr(pool, "_requests", []) or []),
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive"  : HTTP_MAX_KEEPALIVE,
+    }
+
+# ═════════════════════════════════════════════════════════════════════════════
+# GET conditionnels vers le gateway : url → (ETag, JSON déjà décodé)
+# ═════════════════════════════════════════════════════════════════════════════
+_etag_cache: Dict[str, Tuple[str, Any]] = {}
 
+async def gateway_json(path: str) -> Tuple[Any, Optional[str]]:
+    """GET JSON avec If-None-Match ; sur 304 on ressert la copie locale."""
+    url  = f"{API_GATEWAY}{path}"
+    prev = _etag_cache.get(url)
+    with span("gateway"):
+        r = await gateway_http().get(url, headers={"If-None-Match": prev[0]} if prev else None)
+    merge("gw", r.headers.get("server-timing"))
+    family = path.split("?")[0].strip("/").split("/")[1]      # /api/<famille>/…
+    cache_event("etag", family, r.status_code == 304 and prev is not None)
+    if r.status_code == 304 and prev:
+        return prev[1], prev[0]
+    r.raise_for_status()
+    data, etag = r.json(), r.headers.get("etag")
+    if etag:
+        _etag_cache.pop(url, None)
+        _etag_cache[url] = (etag, data)
+        if len(_etag_cache) > ETAG_CACHE_MAX:          # le plus ancien sort
+            _etag_cache.pop(next(iter(_etag_cache)))
+    return data, etag
 
-def status_to_color(tag: str) -> str:
+def page_etag(*parts: Optional[str]) -> Optional[str]:
+    """ETag d’une page = empreinte des ETag amont (None si l’un manque)."""
+    if any(p is None for p in parts):
+        return None
+    digest = hashlib.blake2b("|".join(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    if etag and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def with_etag(response: Response, etag: Optional[str]) -> Response:
+    if etag:
+        response.headers["ETag"] = etag
+    return response
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Helpers couleur-santé des boutons   (rouge, vert, gris si inconnu)
+# ═════════════════════════════════════════════════════════════════════════════
+def status_to_color(counts: Optional[Dict]) -> str:
     """
-    Mappe vers la classe Tailwind :
-      • KO_ANY  → rouge
-      • ALL_OK  → vert
+    Mappe l’entrée /api/summary d’un client vers la classe Tailwind :
+      • au moins un check Critical    → rouge
+        (bucket Critical du backend : critical / ko / error / not ok)
+      • sinon                         → vert
+      • client absent du résumé       → gris
     """
-    return "bg-red-600 hover:bg-red-700" if tag == "KO_ANY" \
+    if counts is None:
+        return "bg-gray-400 hover:bg-gray-500"
+    return "bg-red-600 hover:bg-red-700" if counts.get("ko_any") \
            else "bg-green-600 hover:bg-green-700"
 
-# 1) Accueil – boutons clients
+def client_counts(known: Dict[str, dict], label: str) -> Optional[Dict]:
+    """
+    Entrée du résumé pour un client configuré : même règle que le filtre du
+    backend (sous-chaîne insensible à la casse), les customerName qui
+    correspondent sont fusionnés ; None si aucun.
+    """
+    needle  = label.lower()
+    matches = [v for k, v in known.items() if needle in k.lower()]
+    if not matches:
+        return None
+    return {"ko_any": any(v.get("ko_any") for v in matches)}
+
+# 1) Accueil – boutons clients   (un seul appel /api/summary, quelques Ko)
 # ═════════════════════════════════════════════════════════════════════════════
 @app.get("/")
 async def index(request: Request):
-    client_statuses: List[Dict] = []
-
-    async with httpx.AsyncClient() as http:
-        async def fetch_client(c):
-            try:
-                r = await http.get(f"{API_GATEWAY}/api/status/{c}")
-                data = r.json().get("data", [])
-                color = status_to_color(compute_global_status(data))
-            except Exception:
-                color = "bg-gray-400 hover:bg-gray-500"
-            client_statuses.append({
-                "name": c,
-                "color": color,
-                "url": f"/status/{c}?all_ko=1",   # ← enlace directo a la tabla KO
-            })
-
-        await asyncio.gather(*(fetch_client(c) for c in VALID_CLIENTS))
-
-    return templates.TemplateResponse("index.html", {
+    try:
+        summary, upstream = await gateway_json("/api/summary")
+    except Exception:
+        summary, upstream = {}, None
+
+    etag = page_etag("index", upstream)
+    if (resp := not_modified(request, etag)) is not None:
+        return resp
+
+    known = summary.get("clients", {})
+    client_statuses = [{
+        "name" : c,
+        "color": status_to_color(client_counts(known, c)),
+        "url"  : f"/status/{c}?all_ko=1",   # ← enlace directo a la tabla KO
+    } for c in VALID_CLIENTS]
+
+    return with_etag(render("index.html", {
         "request": request,
         "clients": client_statuses,
-    })
+        "refresh": HOME_REFRESH,
+    }), etag)
+
+@app.get("/summary/colors")
+async def index_colors(request: Request):
+    """ko_any par client configuré (None = absent), relu par l’accueil."""
+    try:
+        summary, upstream = await gateway_json("/api/summary")
+    except Exception:
+        raise HTTPException(502, "Résumé indisponible")
+
+    etag = page_etag("colors", upstream)
+    if (resp := not_modified(request, etag)) is not None:
+        return resp
+
+    known = summary.get("clients", {})
+    colors = {}
+    for c in VALID_CLIENTS:
+        counts = client_counts(known, c)
+        colors[c] = None if counts is None else counts["ko_any"]
+    return with_etag(JSONResponse(colors), etag)
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 2)  Vue client  – tableau complet des checks KO/Critical
+# 2)  Vue client  – checks KO/Warning, filtrés / triés / paginés par le gateway
+#     ↳ une page de CHECKS_PAGE_SIZE lignes, curseur « next » dans le lien
+#     ↳ agrégat pas encore en cache → rendu progressif depuis le flux NDJSON
+#       de /status/<client>/stream (ordre d’arrivée des VM)
 # ─────────────────────────────────────────────────────────────────────────────
+CHECK_FILTERS = ("status", "severity", "objectClass", "vm", "sort", "cursor")
+
 @app.get("/status/{client}", response_class=HTMLResponse)
 async def client_dashboard(request: Request, client: str):
     if client not in VALID_CLIENTS:
         raise HTTPException(404, "Client not found")
 
-    # ── 1) Traer TODOS los assets+status de este cliente ────────────────────
-    async with httpx.AsyncClient() as http:
-        r = await http.get(f"{API_GATEWAY}/api/status/{client}")
-        r.raise_for_status()
-        vms = r.json().get("data", [])
-
-    # ── 2) Aplanar todos los checks KO/Warning en una sola lista ─────────
-    rows: List[dict] = []
-    for vm in vms:
-        for chk in vm.get("monitoring_details", []):
-            st = chk.get("status", "").lower()
-            if st != "ok":
-                rows.append({
-                    "client"      : client,
-                    "vm"          : vm["machine"],
-                    "objectClass" : chk.get("objectClass") or "-",
-                    "parameter"   : chk.get("parameter")   or "-",
-                    "object"      : chk.get("object")      or "-",
-                    "status"      : chk.get("status")      or "Unknown",
-                    "severity"    : chk.get("severity")    or "-",
-                    "lastChange"  : chk.get("lastChange")  or "Never",
-                    "description" : chk.get("description") or "",
-                })
-
-    return templates.TemplateResponse("client_dashboard.html", {
-        "request": request,
-        "client":   client,
-        "rows":     rows,
-    })
+    filters = {k: request.query_params[k] for k in CHECK_FILTERS
+               if request.query_params.get(k)}
+    qs = urlencode(filters)
+    body, upstream = await gateway_json(f"/api/status/{quote(client)}/checks?{qs}")
+    progressive = bool(body.get("pending"))
+
+    etag = None if progressive else page_etag("status", client, upstream)
+    if (resp := not_modified(request, etag)) is not None:
+        return resp
+
+    base = f"/status/{quote(client)}"
+    nxt  = body.get("next")
+    keep = {k: v for k, v in filters.items() if k != "cursor"}
+    return with_etag(render("client_dashboard.html", {
+        "request"    : request,
+        "client"     : client,
+        "rows"       : body.get("data", []),
+        "progressive": progressive,
+        "filters"    : keep,
+        "first_url"  : f"{base}?{urlencode(keep)}" if "cursor" in filters else None,
+        "next_url"   : f"{base}?{urlencode({**keep, 'cursor': nxt})}" if nxt else None,
+    }), etag)
+
+@app.get("/status/{client}/stream")
+async def client_rows_stream(client: str):
+    if client not in VALID_CLIENTS:
+        raise HTTPException(404, "Client not found")
+    return await relay(f"/api/status/{client}/stream", "application/x-ndjson")
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -126,18 +268,22 @@ async def client_dashboard(request: Request, client: str):
 @app.get("/machine/{machine_name}", response_class=HTMLResponse)
 async def machine_details(request: Request, machine_name: str):
     try:
-        async with httpx.AsyncClient() as http:
-            r = await http.get(f"{API_GATEWAY}/api/machine/{machine_name}")
-            if r.status_code == 404:
-                raise HTTPException(404, "Machine not found")
-            machine = r.json()
+        machine, upstream = await gateway_json(f"/api/machine/{machine_name}")
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise HTTPException(404, "Machine not found")
+        raise HTTPException(500, str(e))
     except Exception as e:
         raise HTTPException(500, str(e))
 
-    return templates.TemplateResponse("machine_details.html", {
+    etag = page_etag("machine", upstream)
+    if (resp := not_modified(request, etag)) is not None:
+        return resp
+
+    return with_etag(render("machine_details.html", {
         "request": request,
         "machine": machine,
-    })
+    }), etag)
 
 # 4) Agrégat Critical / Warning  – paramètre optionnel
 # ═════════════════════════════════════════════════════════════════════════════
@@ -148,7 +294,7 @@ async def show_critical_assets(
 ):
     # ─── cas 1 : pas de paramètre → afficher seulement les deux boutons ──────
     if status is None:
-        return templates.TemplateResponse("critical_assets.html", {
+        return render("critical_assets.html", {
             "request": request,
             "rows":   [],
             "status": "",
@@ -159,28 +305,59 @@ async def show_critical_assets(
     if status not in {"Critical", "Warning"}:
         raise HTTPException(400, "status doit être Critical ou Warning")
 
-    rows: List[dict] = []
-
-    async with httpx.AsyncClient() as http:
-        async def gather_client(client_name):
-            try:
-                r = await http.get(f"{API_GATEWAY}/api/status/{client_name}")
-                for vm in r.json().get("data", []):
-                    if vm.get("global_status") != status:
-                        continue
-                    for chk in vm.get("monitoring_details", []):
-                        chk_status = chk["status"].lower()
-                        if status == "Critical" and chk_status in {"critical", "ko"}:
-                            rows.append({"client": client_name, "vm": vm["machine"], **chk})
-                        elif status == "Warning" and chk_status == "warning":
-                            rows.append({"client": client_name, "vm": vm["machine"], **chk})
-            except Exception:
-                pass  # silencer les erreurs d’un client
-
-        await asyncio.gather(*(gather_client(c) for c in VALID_CLIENTS))
-
-    return templates.TemplateResponse("critical_assets.html", {
+    # ─── cas 3 : index inversé du backend (checks déjà aplatis) ─────────────
+    try:
+        body, upstream = await gateway_json(f"/api/checks?status={status}")
+    except Exception:
+        body, upstream = {}, None
+
+    etag = page_etag("critical", status, upstream)
+    if (resp := not_modified(request, etag)) is not None:
+        return resp
+
+    # checks du bucket (status_buckets du backend : Critical inclut error /
+    # not ok, Warning inclut warn), sur les VM de ce global_status ; clients
+    # retrouvés comme sur l’accueil (sous-chaîne insensible à la casse)
+    rows = []
+    for r in body.get("data", []):
+        label = next((c for c in VALID_CLIENTS
+                      if c.lower() in (r.get("client") or "").lower()), None)
+        if label is not None and r.get("global_status") == status:
+            rows.append({**r, "client": label})
+
+    return with_etag(render("critical_assets.html", {
         "request": request,
         "rows":   rows,
         "status": status,
-    }) 
\ No newline at end of file
+    }), etag)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 5)  Flux SSE  – relais du flux de deltas du gateway (même origine que la page)
+# ─────────────────────────────────────────────────────────────────────────────
+async def relay(path: str, media_type: str) -> StreamingResponse:
+    """Relaie un flux du gateway octet par octet (même origine que la page)."""
+    http = gateway_http()
+    req  = http.build_request(
+        "GET", f"{API_GATEWAY}{path}",
+        timeout=httpx.Timeout(HTTP_TIMEOUT, read=None),   # flux long
+    )
+    upstream = await http.send(req, stream=True)
+
+    async def body():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stream/{client}")
+async def stream_client(client: str):
+    if client not in VALID_CLIENTS:
+        raise HTTPException(404, "Client not found")
+    return await relay(f"/api/stream/{client}", "text/event-stream")
@@ -0,0 +1,218 @@
+# frontend/metrics.py
+"""
+Métriques au format texte Prometheus, sans dépendance externe
+• Counter / Gauge / Histogram avec labels, registre global REGISTRY
+• MetricsMiddleware (ASGI) : latence par route gabarit (/machine/{machine_name})
+• metrics_text() → corps de GET /metrics ; upstream_hooks() pour httpx
+• Module identique dans backend/, api-gateway/ et frontend/ (contextes Docker séparés)
+"""
+
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labels=()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        return super().render() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_num(v)}"
+            for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        """+1 pendant le bloc (requêtes / lots en vol)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Labels, List[float]] = {}   # [compteurs…, somme, total]
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        out = super().render()
+        for key, row in self._values.items():
+            bounds = [_num(b) for b in self.buckets] + ["+Inf"]
+            for le, n in zip(bounds, row[:-2] + row[-1:]):
+                labels = _fmt_labels(self.labelnames, key, 'le="%s"' % le)
+                out.append(f"{self.name}_bucket{labels} {_num(n)}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {row[-2]!r}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_num(row[-1])}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._hooks:   List[Callable[[], None]] = []
+
+    def counter(self, name: str, doc: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, doc, labels)
+
+    def gauge(self, name: str, doc: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, doc, labels)
+
+    def histogram(self, name: str, doc: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, doc, labels, buckets=buckets)
+
+    def on_collect(self, fn: Callable[[], None]):
+        """fn() est appelé avant chaque rendu (jauges lues ailleurs : stats())."""
+        self._hooks.append(fn)
+
+    def render(self) -> str:
+        for fn in self._hooks:
+            fn()
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def _get(self, cls, name, doc, labels, **kw):
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = cls(name, doc, labels, **kw)
+        return m
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP servies",
+    ("method", "route", "status"))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_request_duration_seconds", "Durée des appels sortants (jusqu’aux en-têtes)",
+    ("upstream", "endpoint", "status"))
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Lectures de cache par niveau, famille de clés et résultat",
+    ("tier", "family", "result"))
+IN_FLIGHT = REGISTRY.gauge(
+    "fanout_in_flight", "Appels / lots en vol par étape de fan-out", ("stage",))
+
+
+def cache_event(tier: str, key: str, hit: bool | str):
+    """hit : True / False, ou un résultat nommé ("stale"…) ; famille = préfixe de clé."""
+    result = hit if isinstance(hit, str) else ("hit" if hit else "miss")
+    CACHE_REQUESTS.inc(tier=tier, family=key.split(":", 1)[0], result=result)
+
+def upstream_hooks(upstream: str) -> Dict[str, list]:
+    """event_hooks httpx : latence jusqu’aux en-têtes, par préfixe de chemin (/api/x)."""
+    async def on_request(request):
+        request.extensions["t0"] = time.perf_counter()
+
+    async def on_response(response):
+        t0 = response.request.extensions.get("t0")
+        if t0 is not None:
+            parts    = response.request.url.path.strip("/").split("/")
+            endpoint = "/" + "/".join(parts[:2] if parts[0] == "api" else parts[:1])
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, upstream=upstream,
+                                     endpoint=endpoint, status=str(response.status_code))
+
+    return {"request": [on_request], "response": [on_response]}
+
+def metrics_text() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """ASGI pur : n’enveloppe pas le corps (compatible SSE / NDJSON)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start, status = time.perf_counter(), "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                    route=route, status=status)
@@ -0,0 +1,293 @@
+# tests/perf/bench.py
+"""
+Banc de charge de bout en bout, hors ligne (faux MIB → backend → gateway → frontend)
+• Lance fake_mib.py + les trois services (uvicorn) en sous-processus
+• Scénarios :
+    cold   : Redis vidé (FLUSHDB) + services redémarrés (L1 vides, pas
+             d’instantané disque : démarrage réellement à froid)
+    warm   : mêmes processus, caches amorcés par un premier passage
+    expiry : TTL courts, amorçage puis attente de l’expiration → rafale
+• Par cible : p50 / p95 / p99, débit, erreurs ; par scénario : appels reçus
+  par le faux MIB (login, search, status…)
+• Instantané et historique du backend dans un répertoire temporaire
+  (rien d’écrit sous /var/lib/mib), instantané périodique désactivé
+
+Prérequis : un Redis local (REDIS_HOST / REDIS_PORT, 6379 par défaut) ;
+le frontend vise la gateway sur localhost:5000 (ports fixes ci-dessous).
+
+    python tests/perf/bench.py --assets 2000 --checks 20 --latency 0.05 \
+           --concurrency 32 --duration 15 --json bench.json
+"""
+
+from __future__ import annotations
+import argparse, asyncio, json, os, subprocess, sys, tempfile, time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[2]
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+from fake_mib import CUSTOMERS          # noqa: E402
+
+MIB_PORT      = 9443
+BACKEND_PORT  = 5001
+GATEWAY_PORT  = 5000                    # fixé en dur dans frontend/app.py
+FRONTEND_PORT = 5002
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+EXPIRY_TTL = 5                          # s — TTL courts du scénario expiry
+
+Target = Tuple[str, str]                # (libellé, URL)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Processus
+# ═════════════════════════════════════════════════════════════════════════════
+class Service:
+    def __init__(self, name: str, argv: List[str], cwd: Path, port: int,
+                 env: Optional[Dict[str, str]] = None, health: str = "/docs"):
+        self.name, self.argv, self.cwd, self.port = name, argv, cwd, port
+        self.env, self.health = env or {}, health
+        self.proc: Optional[subprocess.Popen] = None
+
+    async def start(self, extra_env: Optional[Dict[str, str]] = None, timeout: float = 30):
+        env = {**os.environ, **self.env, **(extra_env or {})}
+        self.proc = subprocess.Popen(self.argv, cwd=self.cwd, env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        url, deadline = f"http://127.0.0.1:{self.port}{self.health}", time.monotonic() + timeout
+        async with httpx.AsyncClient() as http:
+            while time.monotonic() < deadline:
+                if self.proc.poll() is not None:
+                    err = self.proc.stderr.read().decode(errors="replace")
+                    raise RuntimeError(f"{self.name} s’est arrêté :\n{err[-2000:]}")
+                try:
+                    if (await http.get(url, timeout=1)).status_code < 500:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"{self.name} : pas de réponse sur {url}")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+
+
+def uvicorn(module: str, port: int) -> List[str]:
+    return [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1",
+            "--port", str(port), "--log-level", "warning"]
+
+def build_services(args, state: Path) -> Tuple[Service, List[Service]]:
+    mib = Service("fake-mib", [
+        sys.executable, str(HERE / "fake_mib.py"), "--port", str(MIB_PORT),
+        "--assets", str(args.assets), "--checks", str(args.checks), "--mix", args.mix,
+        "--latency", str(args.latency), "--errors", str(args.errors),
+        "--token-ttl", str(args.token_ttl)], ROOT, MIB_PORT)
+    backend_env = {
+        "MIB_BASE"         : f"http://127.0.0.1:{MIB_PORT}",
+        "CASIMIR_ACCOUNT"  : "bench",
+        "CASIMIR_PASSWORD" : "bench",
+        "POLL_ENABLED"     : "1" if args.poll else "0",
+        "REDIS_HOST"       : REDIS_HOST,
+        "REDIS_PORT"       : str(REDIS_PORT),
+        "SNAPSHOT_PATH"    : str(state / "snapshot.bin"),
+        "SNAPSHOT_INTERVAL": "0",           # ni écriture périodique ni à l’arrêt
+        "HISTORY_PATH"     : str(state / "history.db"),
+    }
+    apps = [
+        Service("backend", uvicorn("backend.app:app", BACKEND_PORT), ROOT,
+                BACKEND_PORT, backend_env),
+        Service("gateway", uvicorn("app:app", GATEWAY_PORT), ROOT / "api-gateway",
+                GATEWAY_PORT, {"MIB_BACKEND_URL": f"http://127.0.0.1:{BACKEND_PORT}",
+                               "REDIS_HOST": REDIS_HOST, "REDIS_PORT": str(REDIS_PORT)}),
+        Service("frontend", uvicorn("app:app", FRONTEND_PORT), ROOT / "frontend",
+                FRONTEND_PORT),
+    ]
+    return mib, apps
+
+
+async def flush_redis():
+    import redis.asyncio as aioredis
+    r = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+    try:
+        await r.flushdb()
+    finally:
+        await r.aclose()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Charge
+# ═════════════════════════════════════════════════════════════════════════════
+def targets(args) -> List[Target]:
+    be, gw, fe = (f"http://127.0.0.1:{p}" for p in (BACKEND_PORT, GATEWAY_PORT, FRONTEND_PORT))
+    clients = CUSTOMERS[:args.clients]
+    vms     = [f"vm-{i:05d}" for i in range(1, args.assets) if i % 10][:args.machines]
+    out: List[Target] = []
+    out += [("backend /machine", f"{be}/machine/{vm}") for vm in vms]
+    out += [("backend /machines", f"{be}/machines?client={c}") for c in clients]
+    out += [("gateway /api/status", f"{gw}/api/status/{c}") for c in clients]
+    out += [("gateway /api/summary", f"{gw}/api/summary")]
+    out += [("frontend /", f"{fe}/")]
+    out += [("frontend /status", f"{fe}/status/{c}") for c in clients]
+    return out
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+async def run_load(tlist: List[Target], concurrency: int, duration: float,
+                   requests: int = 0) -> Dict[str, dict]:
+    """concurrency workers parcourent tlist en boucle (durée ou nombre de requêtes)."""
+    lat: Dict[str, List[float]] = defaultdict(list)
+    err: Dict[str, int] = defaultdict(int)
+    cursor = {"i": 0}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(http: httpx.AsyncClient):
+        while True:
+            i = cursor["i"]
+            if (requests and i >= requests) or (not requests and time.monotonic() >= deadline):
+                return
+            cursor["i"] += 1
+            label, url = tlist[i % len(tlist)]
+            t0 = time.perf_counter()
+            try:
+                r = await http.get(url)
+                if r.status_code >= 400:
+                    err[label] += 1
+            except httpx.HTTPError:
+                err[label] += 1
+            lat[label].append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=60, limits=limits) as http:
+        await asyncio.gather(*(worker(http) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for label, values in lat.items():
+        values.sort()
+        report[label] = {
+            "count" : len(values),
+            "errors": err[label],
+            "rps"   : round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+        }
+    return report
+
+
+async def mib_calls(op: str) -> Dict[str, int]:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{MIB_PORT}") as http:
+        if op == "reset":
+            await http.post("/_reset")
+            return {}
+        return (await http.get("/_stats")).json()["calls"]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Scénarios
+# ═════════════════════════════════════════════════════════════════════════════
+async def restart(apps: List[Service], extra_env: Optional[Dict[str, str]] = None):
+    for svc in reversed(apps):
+        svc.stop()
+    for svc in apps:
+        await svc.start(extra_env)
+
+def wipe_snapshot(state: Path):
+    """Aucun démarrage à chaud depuis un instantané laissé par un run précédent."""
+    (state / "snapshot.bin").unlink(missing_ok=True)
+
+async def scenario(name: str, apps: List[Service], tlist: List[Target], args,
+                   state: Path) -> dict:
+    if name == "cold":
+        await flush_redis()
+        wipe_snapshot(state)
+        await restart(apps)
+    elif name == "warm":
+        await run_load(tlist, args.concurrency, 0, requests=len(tlist))   # amorçage
+    elif name == "expiry":
+        ttl = str(EXPIRY_TTL)
+        await flush_redis()
+        wipe_snapshot(state)
+        await restart(apps, {"STATUS_TTL": ttl, "MACHINE_TTL": ttl, "CACHE_TTL": ttl,
+                             "CACHE_STALE_TTL": ttl})
+        await run_load(tlist, args.concurrency, 0, requests=len(tlist))
+        await asyncio.sleep(EXPIRY_TTL + 1)
+    await mib_calls("reset")
+    if name == "expiry":                 # rafale : tout le monde en même temps
+        report = await run_load(tlist, args.concurrency, 0,
+                                requests=max(len(tlist), args.concurrency * 4))
+    else:
+        report = await run_load(tlist, args.concurrency, args.duration)
+    return {"targets": report, "mib_calls": await mib_calls("stats")}
+
+
+def print_report(name: str, result: dict):
+    print(f"\n── {name} " + "─" * (72 - len(name)))
+    print(f"{'cible':<24}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for label, r in result["targets"].items():
+        print(f"{label:<24}{r['count']:>7}{r['errors']:>6}{r['rps']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+    calls = ", ".join(f"{k}={v}" for k, v in sorted(result["mib_calls"].items())) or "aucun"
+    print(f"appels MIB : {calls}")
+
+
+async def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Banc de charge MIB hors ligne")
+    ap.add_argument("--scenarios",   default="cold,warm,expiry")
+    ap.add_argument("--assets",      type=int,   default=500)
+    ap.add_argument("--checks",      type=int,   default=10)
+    ap.add_argument("--mix",         default="ok=0.9,warning=0.07,critical=0.03")
+    ap.add_argument("--latency",     type=float, default=0.02, help="latence MIB moyenne (s)")
+    ap.add_argument("--errors",      type=float, default=0.0,  help="taux d’erreurs MIB")
+    ap.add_argument("--token-ttl",   type=float, default=900)
+    ap.add_argument("--clients",     type=int,   default=len(CUSTOMERS))
+    ap.add_argument("--machines",    type=int,   default=50, help="VM visées par /machine")
+    ap.add_argument("--concurrency", type=int,   default=16)
+    ap.add_argument("--duration",    type=float, default=10, help="durée cold / warm (s)")
+    ap.add_argument("--poll",        action="store_true", help="laisser tourner le poller")
+    ap.add_argument("--json",        help="écrit aussi les résultats dans ce fichier")
+    args = ap.parse_args(argv)
+
+    tmp   = tempfile.TemporaryDirectory(prefix="mib-bench-")
+    state = Path(tmp.name)
+    mib, apps = build_services(args, state)
+    tlist = targets(args)
+    results = {}
+    try:
+        await mib.start()
+        for svc in apps:
+            await svc.start()
+        for name in args.scenarios.split(","):
+            results[name] = await scenario(name.strip(), apps, tlist, args, state)
+            print_report(name, results[name])
+    finally:
+        for svc in reversed(apps):
+            svc.stop()
+        mib.stop()
+        tmp.cleanup()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "results": results},
+                                              indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,204 @@
+# tests/perf/fake_mib.py
+"""
+Faux MIB pour les tests de charge hors ligne
+• /api/auth/login (form-urlencoded), /api/auth/refresh → JWT avec claim exp
+• /api/v1/assets/search : pagination + filtre l2Support (règle eq)
+• /api/v1/assets/{id}/status : checks générés, statuts selon un mélange donné
+• Parc configurable (assets × checks × mélange de statuts), latence et taux
+  d’erreur injectables ; /_stats → appels reçus par endpoint, /_flip → change
+  le statut d’une fraction des checks, /_reset → remet les compteurs à zéro
+
+Lancement :
+    python -m tests.perf.fake_mib --port 9443 --assets 2000 --checks 20 \
+           --mix ok=0.9,warning=0.07,critical=0.03 --latency 0.05 --errors 0.01
+"""
+
+from __future__ import annotations
+import argparse, asyncio, base64, json, random, time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+CUSTOMERS = [
+    "ORANGE APPLICATIONS FOR BUSINESS",
+    "CTRE HOSP UNIVERSITAIRE DE MONTPELLIER",
+    "VERIFONE SYSTEMS FRANCE SAS",
+]
+OBJECT_CLASSES = ["CPU", "Memory", "Disk", "Network", "Process", "Service"]
+SEVERITIES     = {"ok": "Info", "warning": "Minor", "critical": "Critical",
+                  "unknown": "Unknown"}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """« ok=0.9,warning=0.07,critical=0.03 » → poids normalisés."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip().lower()] = float(weight)
+    total = sum(mix.values()) or 1.0
+    return {k: v / total for k, v in mix.items()}
+
+def make_jwt(ttl: float) -> str:
+    def seg(obj) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    claims = {"sub": "fake", "exp": int(time.time() + ttl), "jti": random.getrandbits(64)}
+    return f"{seg({'alg': 'none'})}.{seg(claims)}.fake"
+
+
+class Fleet:
+    def __init__(self, assets: int, checks: int, mix: Dict[str, float],
+                 l2_support: str = "ATQIHF", seed: int = 42):
+        rnd = random.Random(seed)
+        self.mix = mix
+        self.assets: List[dict] = []
+        self.status: Dict[str, List[dict]] = {}
+        for i in range(assets):
+            asset_id = str(100000 + i)
+            self.assets.append({
+                "assetId"     : asset_id,
+                "assetName"   : f"vm-{i:05d}",
+                "assetType"   : "VM",
+                "customerName": CUSTOMERS[i % len(CUSTOMERS)],
+                "organization": "OBS",
+                "csuName"     : "CSU-FAKE",
+                "l2Support"   : l2_support if i % 10 else "OTHER",   # 10 % hors filtre
+            })
+            self.status[asset_id] = [self._check(rnd, j) for j in range(checks)]
+
+    def _check(self, rnd: random.Random, j: int) -> dict:
+        st = rnd.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        oc = OBJECT_CLASSES[j % len(OBJECT_CLASSES)]
+        return {
+            "objectClass": oc,
+            "parameter"  : f"{oc.lower()}_{j}",
+            "object"     : f"obj{j}",
+            "status"     : st.capitalize(),
+            "severity"   : SEVERITIES.get(st, "Unknown"),
+            "lastChange" : time.strftime("%Y-%m-%dT%H:%M:%SZ",
+                                         time.gmtime(time.time() - rnd.randint(0, 86400))),
+            "description": f"{oc} check {j}",
+            "instance"   : {"instanceName": f"{oc}-{j}"},
+        }
+
+    def flip(self, fraction: float, rnd: Optional[random.Random] = None) -> int:
+        rnd = rnd or random.Random()
+        changed = 0
+        for checks in self.status.values():
+            for k, chk in enumerate(checks):
+                if rnd.random() < fraction:
+                    checks[k] = {**self._check(rnd, k), "objectClass": chk["objectClass"],
+                                 "parameter": chk["parameter"], "object": chk["object"]}
+                    changed += 1
+        return changed
+
+
+def create_app(assets: int = 500, checks: int = 10, mix: str = "ok=0.9,warning=0.07,critical=0.03",
+               latency: float = 0.0, jitter: float = 0.5, errors: float = 0.0,
+               token_ttl: float = 900, seed: int = 42) -> FastAPI:
+    app   = FastAPI(title="Fake MIB")
+    fleet = Fleet(assets, checks, parse_mix(mix), seed=seed)
+    calls: Counter = Counter()
+    valid_tokens: Dict[str, float] = {}
+    rnd = random.Random(seed)
+
+    async def simulate(endpoint: str):
+        calls[endpoint] += 1
+        if latency:
+            await asyncio.sleep(max(0.0, rnd.gauss(latency, latency * jitter)))
+        if errors and rnd.random() < errors:
+            calls[f"{endpoint}:error"] += 1
+            raise HTTPException(503, "fake MIB : erreur injectée")
+
+    def check_auth(request: Request):
+        auth  = request.headers.get("authorization", "")
+        token = auth.removeprefix("Bearer ").strip()
+        if valid_tokens.get(token, 0) < time.time():
+            calls["unauthorized"] += 1
+            raise HTTPException(401, "token invalide ou expiré")
+        return token
+
+    def issue() -> dict:
+        token = make_jwt(token_ttl)
+        valid_tokens[token] = time.time() + token_ttl
+        return {"accessToken": token}
+
+    @app.post("/api/auth/login")
+    async def login(request: Request):
+        form = parse_qs((await request.body()).decode())    # sans python-multipart
+        if not form.get("userId") or not form.get("password"):
+            raise HTTPException(422, "userId / password requis (form-urlencoded)")
+        await simulate("login")
+        return issue()
+
+    @app.post("/api/auth/refresh")
+    async def refresh(request: Request):
+        await simulate("refresh")
+        valid_tokens.pop(check_auth(request), None)
+        return issue()
+
+    @app.post("/api/v1/assets/search")
+    async def search(request: Request):
+        check_auth(request)
+        await simulate("search")
+        body = await request.json()
+        page     = int(body.get("pagination", {}).get("page", 1))
+        per_page = int(body.get("pagination", {}).get("perPage", 100))
+        items = fleet.assets
+        for f in body.get("filtering", []):
+            if f.get("rule") == "eq":
+                items = [a for a in items if a.get(f["property"]) == f.get("value")]
+        start = (page - 1) * per_page
+        return {"data": items[start:start + per_page],
+                "pagination": {"page": page, "perPage": per_page, "total": len(items)}}
+
+    @app.get("/api/v1/assets/{asset_id}/status")
+    async def status(asset_id: str, request: Request):
+        check_auth(request)
+        await simulate("status")
+        if asset_id not in fleet.status:
+            raise HTTPException(404, "asset inconnu")
+        return {"data": fleet.status[asset_id]}
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": dict(calls), "assets": len(fleet.assets),
+                "tokens": sum(1 for exp in valid_tokens.values() if exp > time.time())}
+
+    @app.post("/_reset")
+    async def reset():
+        calls.clear()
+        return JSONResponse({"ok": True})
+
+    @app.post("/_flip")
+    async def flip(fraction: float = 0.05):
+        return {"changed": fleet.flip(fraction)}
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Faux MIB (tests de charge hors ligne)")
+    ap.add_argument("--host",      default="127.0.0.1")
+    ap.add_argument("--port",      type=int,   default=9443)
+    ap.add_argument("--assets",    type=int,   default=500)
+    ap.add_argument("--checks",    type=int,   default=10)
+    ap.add_argument("--mix",       default="ok=0.9,warning=0.07,critical=0.03")
+    ap.add_argument("--latency",   type=float, default=0.0, help="latence moyenne (s)")
+    ap.add_argument("--jitter",    type=float, default=0.5, help="écart-type relatif")
+    ap.add_argument("--errors",    type=float, default=0.0, help="taux d’erreurs 503")
+    ap.add_argument("--token-ttl", type=float, default=900)
+    ap.add_argument("--seed",      type=int,   default=42)
+    args = ap.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(create_app(args.assets, args.checks, args.mix, args.latency, args.jitter,
+                           args.errors, args.token_ttl, args.seed),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
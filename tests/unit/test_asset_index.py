@@ -0,0 +1,32 @@
+from backend.asset_index import AssetIndex
+
+ASSETS = [
+    {"assetId": 1, "assetName": "VM1", "customerName": "ORANGE APPLICATIONS FOR BUSINESS"},
+    {"assetId": 2, "assetName": "VM2", "customerName": "VERIFONE SYSTEMS FRANCE SAS"},
+    {"assetId": 3, "assetName": "VM3", "customerName": "Orange Applications for Business"},
+]
+
+def test_lookup_by_name_and_id():
+    idx = AssetIndex()
+    idx.rebuild(ASSETS)
+    assert idx.by_name("VM2")["assetId"] == 2
+    assert idx.by_id("3")["assetName"] == "VM3"
+    assert idx.by_name("absent") is None
+
+def test_client_filter_is_case_insensitive_substring():
+    idx = AssetIndex()
+    idx.rebuild(ASSETS)
+    names = {a["assetName"] for a in idx.for_client("orange")}
+    assert names == {"VM1", "VM3"}
+    assert len(idx.for_client(None)) == 3
+
+def test_filter_memo_is_bounded(monkeypatch):
+    import backend.asset_index as asset_index
+    monkeypatch.setattr(asset_index, "ASSET_INDEX_FILTER_MEMO", 2)
+    idx = AssetIndex()
+    idx.rebuild(ASSETS)
+    for needle in ("a", "b", "orange", "zz"):
+        idx.for_client(needle)
+        idx.etag_for(needle)
+    assert list(idx._by_filter) == ["orange", "zz"] and len(idx._etags) == 2
+    assert {a["assetName"] for a in idx.for_client("a")} == {"VM1", "VM2", "VM3"}
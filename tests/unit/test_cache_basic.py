@@ -1,7 +1,17 @@
-import time
-from backend.app import InMemoryTTLCache
+from fastapi.testclient import TestClient
+
+from backend.tiered_cache import LRUTTLCache
 
 def test_basic_set_get():
-    cache = InMemoryTTLCache()
+    cache = LRUTTLCache(max_entries=16, default_ttl=60)
     cache.set("abc", 123)
     assert cache.get("abc") == 123       # recupera mismo valor
+
+def test_stats_cache_endpoint_exposes_l1_l2_counters():
+    import backend.app as backend
+    r = TestClient(backend.app).get("/stats/cache")
+    assert r.status_code == 200
+    body = r.json()
+    assert set(body) == {"l1", "l2"}
+    assert {"entries", "bytes", "hits", "misses"} <= set(body["l1"])
+    assert set(body["l2"]) == {"hits", "misses"}
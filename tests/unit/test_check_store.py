@@ -0,0 +1,28 @@
+from backend import check_store
+from backend.check_store import CheckStore
+
+CHECKS = [{"objectClass": "cpu", "status": "Critical"},
+          {"objectClass": "disk", "status": "Ok", "description": None}]
+
+def test_replace_remove_and_absent_keys():
+    store = CheckStore(("vm",))
+    store.replace("1", {"vm": "vm1"}, CHECKS)
+    store.replace("2", {"vm": "vm2"}, CHECKS)
+    store.replace("1", {"vm": "vm1"}, CHECKS[:1])           # ancien bloc marqué mort
+    assert len(store) == 3
+    assert store.rows(store.select(vm=["vm1"])) == [{"vm": "vm1", **CHECKS[0]}]
+    assert store.rows(store.select(objectClass=["disk"])) == [{"vm": "vm2", **CHECKS[1]}]
+    store.remove("2")
+    store.compact()
+    assert len(store) == 1 and store.stats()["dead"] == 0 and store.keys() == ["1"]
+
+def test_predicate_filters_and_column_widening(monkeypatch):
+    monkeypatch.setattr(check_store, "COMPACT_MIN", 10**6)
+    store = CheckStore(("vm",), defaults={"status": "Unknown"})
+    for i in range(300):                                    # > 255 valeurs → codes 16 bits
+        store.replace(i, {"vm": f"vm{i}"}, [{"status": "Ok" if i % 2 else ""}])
+    assert store._cols["vm"].codes.typecode == "H"
+    odd = store.select(status=lambda s: s.lower() == "ok",
+                       vm=lambda v: v.startswith("vm1"))
+    assert [store.value("vm", i) for i in odd][:3] == ["vm1", "vm11", "vm13"]
+    assert store.rows(store.select(vm=["vm0"])) == [{"vm": "vm0", "status": "Unknown"}]
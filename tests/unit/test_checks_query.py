@@ -0,0 +1,31 @@
+import importlib.util, sys
+from pathlib import Path
+
+GATEWAY = Path(__file__).resolve().parents[2] / "api-gateway"
+sys.path.insert(0, str(GATEWAY))                # checks.py importe check_store (voisin)
+_spec = importlib.util.spec_from_file_location("gateway_checks", GATEWAY / "checks.py")
+checks = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(checks)
+
+VMS = [{"machine": f"vm{i}", "monitoring_details": [
+           {"objectClass": "cpu", "status": "Critical", "severity": "minor",
+            "lastChange": f"2024-01-0{i}"},
+           {"objectClass": "disk", "status": "Ok"}]}
+       for i in range(1, 6)]
+
+def test_cursor_pages_cover_all_rows_in_order():
+    table = checks.CheckTable("ACME", VMS)
+    seen, cursor = [], None
+    while True:
+        page = table.query(limit=2, cursor=cursor)
+        seen += [r["vm"] for r in page["data"]]
+        cursor = page["next"]
+        if cursor is None:
+            break
+    assert seen == ["vm5", "vm4", "vm3", "vm2", "vm1"]     # lastChange récent d’abord
+
+def test_filters():
+    table = checks.CheckTable("ACME", VMS)
+    assert len(table.query(status=["ok"])["data"]) == 5
+    assert [r["vm"] for r in table.query(vm_prefix="VM3")["data"]] == ["vm3"]
+    assert table.query(object_class=["disk"])["data"] == []   # OK exclu par défaut
@@ -0,0 +1,29 @@
+import importlib.util
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+_spec = importlib.util.spec_from_file_location(
+    "fake_mib", Path(__file__).resolve().parents[2] / "tests" / "perf" / "fake_mib.py")
+fake_mib = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_mib)
+
+def login(client):
+    r = client.post("/api/auth/login", data={"userId": "u", "password": "p"})
+    return {"Authorization": f"Bearer {r.json()['accessToken']}"}
+
+def test_search_paginates_with_l2support_filter():
+    client = TestClient(fake_mib.create_app(assets=50, checks=3))
+    body = {"pagination": {"page": 2, "perPage": 20},
+            "filtering": [{"property": "l2Support", "rule": "eq", "value": "ATQIHF"}]}
+    r = client.post("/api/v1/assets/search", headers=login(client), json=body).json()
+    assert r["pagination"]["total"] == 45                  # 1 asset sur 10 hors filtre
+    assert len(r["data"]) == 20
+    assert all(a["l2Support"] == "ATQIHF" for a in r["data"])
+
+def test_status_requires_token_and_counts_calls():
+    client = TestClient(fake_mib.create_app(assets=5, checks=4))
+    assert client.get("/api/v1/assets/100001/status").status_code == 401
+    checks = client.get("/api/v1/assets/100001/status", headers=login(client)).json()["data"]
+    assert len(checks) == 4
+    assert client.get("/_stats").json()["calls"] == {"unauthorized": 1, "login": 1, "status": 1}
@@ -0,0 +1,145 @@
+import asyncio, importlib.util, json, sys
+from pathlib import Path
+
+import httpx
+
+GATEWAY = Path(__file__).resolve().parents[2] / "api-gateway"
+sys.path.insert(0, str(GATEWAY))
+_spec = importlib.util.spec_from_file_location("gateway_app", GATEWAY / "app.py")
+gw = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gw)
+
+from singleflight import SingleFlight   # noqa: E402  (voisin de app.py)
+
+class FakeRedis:
+    """get / setex / mget avec expiration sur l’horloge du test."""
+    def __init__(self, clock):
+        self.clock, self.data = clock, {}
+
+    async def get(self, key):
+        val, exp = self.data.get(key, (None, 0))
+        return val if exp > self.clock[0] else None
+
+    async def setex(self, key, ttl, val):
+        self.data[key] = (val, self.clock[0] + ttl)
+
+    async def mget(self, keys):
+        return [await self.get(k) for k in keys]
+
+class LocalFlights:
+    def __init__(self):
+        self._sf = SingleFlight()
+
+    async def do(self, key, fn, read):
+        return await self._sf.do(key, fn)
+
+def setup(monkeypatch):
+    clock, calls = [1000.0], []
+
+    async def backend(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"data": [{"machine": "vm1"}], "ids": ["1"],
+                                         "errors": [], "stale": [], "missing": []})
+
+    monkeypatch.setattr(gw.time, "time", lambda: clock[0])
+    monkeypatch.setattr(gw.rcache, "_client", FakeRedis(clock))
+    monkeypatch.setattr(gw, "flights", LocalFlights())
+    monkeypatch.setattr(gw, "_http", httpx.AsyncClient(transport=httpx.MockTransport(backend)))
+    return clock, calls
+
+def test_fresh_stale_expired_with_single_revalidation(monkeypatch):
+    clock, calls = setup(monkeypatch)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=gw.app),
+                                   base_url="http://gw")
+        get = lambda: client.get("/api/status/ACME")
+        states = [(await get()).headers["x-cache"], (await get()).headers["x-cache"]]
+        assert calls == ["/machines"]                       # miss puis frais
+
+        clock[0] += gw.CACHE_TTL + 1                        # périmé mais servi
+        stale = await asyncio.gather(*(get() for _ in range(5)))
+        states.append({r.headers["x-cache"] for r in stale})
+        await asyncio.gather(*list(gw._refreshing.values()))
+        assert len(calls) == 2                              # un seul rafraîchissement
+        states.append((await get()).headers["x-cache"])
+
+        clock[0] += gw.CACHE_STALE_TTL + 1                  # entrée expirée → recalcul
+        r = await get()
+        states.append(r.headers["x-cache"])
+        assert r.json()["data"] == [{"machine": "vm1"}] and len(calls) == 3
+        await client.aclose()
+        return states
+    assert asyncio.run(run()) == ["miss", "fresh", {"stale"}, "fresh", "miss"]
+
+def test_frame_roundtrip_keeps_body_bytes(monkeypatch):
+    setup(monkeypatch)
+    body = b'{"data":[{"machine":"vm1"}]}'
+
+    async def run():
+        written = await gw.rset_swr("status:X", body, partial=2)
+        read = await gw.rget_swr("status:X")
+        return written, read
+    written, read = asyncio.run(run())
+    assert read["b"] == body and read["e"] == written["e"] and read["p"] == 2
+
+def test_stream_is_framed_per_batch_and_replays_stale(monkeypatch):
+    clock, _ = setup(monkeypatch)
+    monkeypatch.setattr(gw, "STATUS_STREAM_BATCH", 1)        # un lot par VM : ordre d’arrivée
+    delays, refreshed = {"1": 0.05, "2": 0.0}, []
+
+    async def backend(request):
+        if request.url.path == "/assets":
+            return httpx.Response(200, json={"data": [{"assetId": i, "assetName": f"vm{i}"}
+                                                      for i in ("1", "2", "3")]})
+        if request.method == "GET":                         # /machines?client= (SWR)
+            refreshed.append(request.url.path)
+            return httpx.Response(200, json={"data": [], "ids": [], "errors": [],
+                                             "stale": [], "missing": []})
+        (i,) = json.loads(request.content)["ids"]
+        if i == "3":
+            return httpx.Response(200, json={"data": [], "ids": [], "stale": [], "missing": [],
+                                             "errors": [{"assetId": i, "error": "KO"}]})
+        await asyncio.sleep(delays[i])
+        return httpx.Response(200, json={"data": [{"machine": f"vm{i}"}], "ids": [i],
+                                         "errors": [], "stale": [], "missing": []})
+    monkeypatch.setattr(gw, "_http", httpx.AsyncClient(transport=httpx.MockTransport(backend)))
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=gw.app),
+                                   base_url="http://gw")
+        first  = (await client.get("/api/status/ACME/stream")).content
+        cached = await gw.rget_swr("status:ACME")
+        replay = (await client.get("/api/status/ACME/stream")).content
+        clock[0] += gw.CACHE_TTL + 1                        # périmé : rejoué + refresh en fond
+        stale  = (await client.get("/api/status/ACME/stream")).content
+        await asyncio.gather(*list(gw._refreshing.values()))
+        await client.aclose()
+        return first, cached, replay, stale
+    first, cached, replay, stale = asyncio.run(run())
+
+    assert first.endswith(b"\n")
+    lines = [json.loads(l) for l in first.splitlines()]
+    assert [(l["type"], l.get("data")) for l in lines[:2]] == \
+           [("vm", {"machine": "vm2"}), ("vm", {"machine": "vm1"})]   # la VM lente ne retient pas l’autre
+    assert lines[2] == {"type": "end", "skipped": [], "source": "backend",
+                        "failed": [{"assetId": "3", "error": "KO", "machine": "vm3"}]}
+    assert len(lines) == 3
+
+    body = json.loads(cached["b"])
+    assert body["ids"] == ["1", "2"] and not cached.get("p")          # ordre de l’inventaire
+    assert json.loads(replay.splitlines()[-1])["source"] == "cache"
+    assert stale == replay and refreshed == ["/machines"]
+
+def test_refs_entry_with_expired_vm_is_served_partial(monkeypatch):
+    setup(monkeypatch)
+
+    async def run():
+        await gw.rcache.set_json("machine:1", {"e": '"a"', "v": {"machine": "vm1"}}, 60)
+        await gw.rset_swr_refs("status:R", {"data": [{"machine": "vm1"}, {"machine": "vm2"}]},
+                               ["1", "2"])
+        return await gw.rget_swr("status:R")
+    entry = asyncio.run(run())
+    assert entry["v"] == {"data": [{"machine": "vm1"}], "ids": ["1"]}
+    assert entry["p"] == 1 and not gw.is_fresh(entry)
@@ -0,0 +1,36 @@
+import asyncio
+
+from backend.hedge import hedged
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    calls, cancelled = [], []
+
+    async def make():
+        calls.append(1)
+        n = len(calls)
+        try:
+            await asyncio.sleep(1 if n == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return n
+
+    async def run():
+        res = await hedged(make, 0.05)
+        await asyncio.sleep(0)
+        return res
+    assert asyncio.run(run()) == 2 and cancelled == [1]
+
+def test_fast_failure_is_not_retried():
+    calls = []
+
+    async def make():
+        calls.append(1)
+        raise ValueError("boom")
+
+    async def run():
+        try:
+            await hedged(make, 0.05)
+        except ValueError:
+            return len(calls)
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,42 @@
+import asyncio
+
+from backend import history as history_mod
+from backend.history import HistoryStore
+
+def vm(status, cpu):
+    return {"machine": "vm1", "customerName": "ACME", "global_status": status,
+            "monitoring_details": [{"objectClass": "cpu", "status": cpu},
+                                   {"objectClass": "disk", "status": "Ok"}]}
+
+def test_only_transitions_are_recorded_and_queried(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.db"))
+    store.open()
+    assert store.observe(1, vm("OK", "Ok"), ts=1000) == 3            # état initial
+    assert store.observe(1, vm("OK", "Ok"), ts=1010) == 0
+    assert store.observe(1, vm("Critical", "Critical"), ts=1020) == 2
+    assert store.observe(1, vm("OK", "Ok"), ts=1060) == 2
+
+    checks = asyncio.run(store.machine(1, 1005, 1100, "cpu|-|-"))
+    assert checks[0]["initial"] == "Ok"
+    assert [t["to"] for t in checks[0]["transitions"]] == ["Critical", "Ok"]
+    assert checks[0]["time_in_state"] == {"Ok": 55.0, "Critical": 40.0}
+    counts = asyncio.run(store.client_counts(0, 2000))
+    assert counts == [{"client": "ACME", "transitions": 4, "vms": 1, "checks": 2,
+                       "to": {"Critical": 2, "OK": 1, "Ok": 1}}]
+
+    reopened = HistoryStore(store.path)                               # dernier état relu
+    reopened.open()
+    assert reopened.observe(1, vm("OK", "Ok"), ts=1100) == 0
+
+def test_downsampling_merges_flaps_and_keeps_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mod, "HISTORY_DOWNSAMPLE_AFTER", 0)
+    monkeypatch.setattr(history_mod, "HISTORY_DOWNSAMPLE_BUCKET", 3600)
+    store = HistoryStore(str(tmp_path / "h.db"))
+    store.open()
+    for i, cpu in enumerate(["Ok", "Critical", "Ok", "Critical"]):
+        store.observe(1, vm("OK", cpu), ts=7200 + i)
+    asyncio.run(store.flush())
+    assert store.maintain(now=8000)["merged"] == 2
+    [cpu] = asyncio.run(store.machine(1, 0, 8000, "cpu|-|-"))
+    assert [(t["from"], t["to"], t["n"]) for t in cpu["transitions"]] == \
+           [(None, "Ok", 1), ("Ok", "Critical", 3)]
@@ -0,0 +1,14 @@
+import asyncio
+from backend.http_pool import HttpPool
+
+def test_pool_is_reused_and_closed():
+    async def scenario():
+        pool = HttpPool()
+        await pool.startup()
+        first = pool.client
+        assert pool.client is first
+        assert pool.stats()["open"] is True
+        await pool.shutdown()
+        assert first.is_closed
+        assert pool.stats()["open"] is False
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+import asyncio
+import httpx
+from backend.limiter import AdaptiveLimiter, checked
+
+def test_window_grows_on_success_and_shrinks_on_overload():
+    lim = AdaptiveLimiter("t", initial=4, target_latency=10)
+
+    async def call(code):
+        return await lim.run(lambda: asyncio.sleep(0, httpx.Response(code)))
+
+    async def main():
+        for _ in range(4):
+            await call(200)
+        grown = lim.limit
+        await call(503)
+        return grown
+
+    grown = asyncio.run(main())
+    assert grown > 4
+    assert lim.limit < grown and lim.overloads == 1
+
+def test_queue_caps_in_flight():
+    lim = AdaptiveLimiter("t", initial=2, target_latency=10)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        peak = max(peak, lim.stats()["in_flight"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200)
+
+    async def main():
+        await asyncio.gather(*(lim.run(work) for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak <= 3 and lim.stats()["in_flight"] == 0
+
+def test_429_raised_inside_the_call_shrinks_the_window():
+    lim = AdaptiveLimiter("t", initial=8, target_latency=10)
+    req = httpx.Request("GET", "http://mib/status")
+
+    async def main():
+        try:
+            await lim.run(lambda: checked(asyncio.sleep(0, httpx.Response(429, request=req))))
+        except httpx.HTTPStatusError as exc:
+            return exc.response.status_code
+
+    assert asyncio.run(main()) == 429
+    assert lim.limit < 8 and lim.overloads == 1 and lim.stats()["in_flight"] == 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import backend.app as backend
+from backend.asset_index import AssetIndex
+from backend.redis_cache import tagged
+from backend.summary import FleetSummary
+
+ASSETS = [{"assetId": i, "assetName": f"vm{i}", "customerName": "ACME"} for i in (1, 2, 3)]
+CHECKS = [{"objectClass": "cpu", "status": "OK"}]
+
+def fake_backend(monkeypatch, cached):
+    idx = AssetIndex()
+    idx.rebuild(ASSETS)
+    writes, calls = {}, []
+
+    async def mget(prefix, ids):
+        return [cached.get(f"{prefix}:{i}") for i in ids]
+
+    async def mset(prefix, items, ttl):
+        writes.update({f"{prefix}:{i}": v for i, v in items.items()})
+
+    async def load_status(asset_id):
+        calls.append(asset_id)
+        if asset_id == "3":
+            raise httpx.ConnectError("MIB KO")
+        return CHECKS
+
+    monkeypatch.setattr(backend, "asset_index", idx)
+    monkeypatch.setattr(backend, "fleet_summary", FleetSummary())
+    monkeypatch.setattr(backend, "r_mget", mget)
+    monkeypatch.setattr(backend, "r_mset", mset)
+    monkeypatch.setattr(backend, "load_status", load_status)
+    return writes, calls
+
+def test_batch_mixes_hits_misses_unknown_ids_and_errors(monkeypatch):
+    cached_vm = backend.build_vm_payload(ASSETS[0], CHECKS)
+    writes, calls = fake_backend(monkeypatch, {"machine:1": tagged(cached_vm)})
+    r = TestClient(backend.app).post("/machines",
+                                     json={"names": ["vm1", "absent"], "ids": ["2", "3", "1"]})
+    body = r.json()
+    assert r.status_code == 200 and "x-partial" not in r.headers
+    assert body["ids"] == ["1", "2"] and body["data"][0] == cached_vm
+    assert body["not_found"] == ["absent"]
+    assert [e["assetId"] for e in body["errors"]] == ["3"]
+    assert body["missing"] == [] and sorted(calls) == ["2", "3"]   # hit : pas d’appel MIB
+    assert set(writes) == {"status:2", "machine:2"}
+
+def test_budget_returns_partial_then_fills_late_vms(monkeypatch):
+    writes, calls = fake_backend(monkeypatch, {})
+    delays = {"1": 0, "2": 0.2, "3": 0}
+
+    async def load_status(asset_id):
+        calls.append(asset_id)
+        await asyncio.sleep(delays[asset_id])
+        return CHECKS
+    monkeypatch.setattr(backend, "load_status", load_status)
+    monkeypatch.setattr(backend, "MACHINES_FETCH_CONCURRENCY", 1)   # "3" attend derrière "2"
+
+    async def run():
+        result = await backend.resolve_machines(ASSETS, budget=0.1)
+        early  = dict(writes)
+        await asyncio.gather(*list(backend._late_fills))
+        return result, early
+    result, early = asyncio.run(run())
+
+    assert result["ids"] == ["1"] and len(result["data"]) == 1
+    assert [m["assetId"] for m in result["missing"]] == [2, 3]
+    assert backend.partial_response(result).headers["x-partial"] == "2"
+    assert set(early) == {"status:1", "machine:1"}
+    assert calls == ["1", "2", "3"]                    # "3" fetché après l’échéance
+    assert {"machine:2", "machine:3", "status:2", "status:3"} <= set(writes)
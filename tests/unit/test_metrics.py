@@ -0,0 +1,12 @@
+from backend.metrics import Registry
+
+def test_histogram_and_counter_text_format():
+    reg = Registry()
+    h = reg.histogram("lat_seconds", "latence", ("route",), buckets=(0.1, 1))
+    h.observe(0.05, route="/a"); h.observe(0.5, route="/a")
+    reg.counter("hits_total", "hits", ("tier",)).inc(tier="l1")
+    text = reg.render()
+    assert 'lat_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'lat_seconds_count{route="/a"} 2' in text
+    assert 'hits_total{tier="l1"} 1' in text
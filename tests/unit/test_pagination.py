@@ -0,0 +1,36 @@
+import asyncio
+from backend.pagination import paginate, extract_total
+
+def make_fetch(n_items, per_page, with_total, calls):
+    async def fetch(page):
+        calls.append(page)
+        start = (page - 1) * per_page
+        items = list(range(start, min(start + per_page, n_items)))
+        return items, (n_items if with_total else None)
+    return fetch
+
+def test_paginate_with_total_keeps_order():
+    calls = []
+    items = asyncio.run(paginate(make_fetch(250, 100, True, calls),
+                                 per_page=100, concurrency=2))
+    assert items == list(range(250))
+    assert sorted(calls) == [1, 2, 3]
+
+def test_paginate_exact_multiple_does_not_speculate():
+    calls = []
+    items = asyncio.run(paginate(make_fetch(300, 100, True, calls),
+                                 per_page=100, concurrency=2, window=8))
+    assert items == list(range(300))
+    assert sorted(calls) == [1, 2, 3]
+
+def test_paginate_speculative_window_stops_at_short_page():
+    calls = []
+    items = asyncio.run(paginate(make_fetch(530, 100, False, calls),
+                                 per_page=100, concurrency=3, window=4))
+    assert items == list(range(530))
+    assert max(calls) <= 9
+
+def test_extract_total():
+    assert extract_total({"pagination": {"total": 12}}) == 12
+    assert extract_total({"data": []}) is None
+    assert extract_total({"count": 100, "data": []}) is None   # taille de page
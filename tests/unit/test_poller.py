@@ -0,0 +1,50 @@
+import asyncio
+
+from backend.poller import Lease, StatusPoller, _AssetState, POLL_INTERVAL_OK, POLL_INTERVAL_CRITICAL, POLL_JITTER
+
+def test_interval_follows_status():
+    poller = StatusPoller()
+    ok, crit = _AssetState({}), _AssetState({})
+    ok.status, crit.status = "OK", "Critical"
+    assert poller.interval(ok, 0) >= POLL_INTERVAL_OK * (1 - POLL_JITTER)
+    assert poller.interval(crit, 0) <= POLL_INTERVAL_CRITICAL * (1 + POLL_JITTER)
+
+def test_recent_change_is_polled_faster():
+    poller = StatusPoller()
+    st = _AssetState({})
+    st.status, st.changed_at = "OK", 100.0
+    assert poller.interval(st, 110.0) < POLL_INTERVAL_OK * (1 - POLL_JITTER)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, val, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = val
+        return True
+
+    async def eval(self, script, nkeys, key, token, *args):
+        if self.data.get(key) != token:
+            return 0
+        if "pexpire" in script:
+            return 1
+        del self.data[key]
+        return 1
+
+
+class FakeCache:
+    def __init__(self, client):
+        self.client = client
+
+
+def test_only_one_replica_holds_the_lease():
+    async def run():
+        cache = FakeCache(FakeRedis())
+        a, b = Lease(cache), Lease(cache)
+        first = [await a.hold(), await b.hold(), await a.hold()]
+        await a.release()                               # arrêt propre → b reprend
+        return first + [await b.hold()]
+    assert asyncio.run(run()) == [True, False, True, True]
@@ -0,0 +1,31 @@
+from backend.redis_cache import loads, dumps, tagged, etag_matches
+
+def test_json_roundtrip_and_corrupt_entry_is_a_miss():
+    assert loads(dumps({"a": [1, 2]})) == {"a": [1, 2]}
+    assert loads(None) is None
+    assert loads("{not json") is None
+
+def test_tagged_entry_etag_is_stable_and_matches():
+    env = tagged({"machine": "VM1"})
+    assert env["e"] == tagged({"machine": "VM1"})["e"]
+    assert etag_matches(f'W/{env["e"]}, "other"', env["e"])
+    assert not etag_matches(None, env["e"])
+
+def test_codec_versions_compression_and_legacy_text():
+    from backend.redis_cache import Codec
+    small, big = {"a": 1}, {"data": ["x" * 50] * 100}
+    codec = Codec("json", "zlib", threshold=256, version=1)
+    raw_small, raw_big = codec.encode(small), codec.encode(big)
+    assert raw_small[:2] == b"\x01\x00" and raw_big[:2] == b"\x01\x04"
+    assert len(raw_big) < len(dumps(big)) // 10
+    assert codec.decode(raw_small) == small and codec.decode(raw_big) == big
+    assert codec.decode(dumps(big)) == big                 # ancien JSON texte
+    assert codec.decode(Codec(version=0).encode(small)) == small
+    assert codec.decode(b"\x01\x0f{}") is None             # drapeaux inconnus → miss
+
+def test_packed_bytes_come_back_untouched():
+    from backend.redis_cache import Codec
+    body = b'{"data":["' + b"x" * 4000 + b'"]}'
+    codec = Codec("json", "zlib", threshold=1024)
+    raw = codec.pack(body)
+    assert len(raw) < 200 and codec.decode(raw) == body
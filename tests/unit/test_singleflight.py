@@ -0,0 +1,33 @@
+import asyncio
+from backend.singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def scenario():
+        sf = SingleFlight()
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "v"
+
+        return await asyncio.gather(*(sf.do("k", compute) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["v"] * 10
+    assert len(calls) == 1
+
+def test_waiters_receive_the_same_error():
+    async def scenario():
+        sf = SingleFlight()
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise ValueError("ko")
+
+        return await asyncio.gather(*(sf.do("k", boom) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert len({id(e) for e in errors}) == 1
@@ -0,0 +1,39 @@
+from backend.snapshot import Snapshot, SnapshotStore, write_snapshot
+
+ASSETS = [{"assetId": 1, "assetName": "vm1", "customerName": "ACME", "csuName": None},
+          {"assetId": 2, "assetName": "vm2", "customerName": "ACME"}]
+PAYLOAD = {"machine": "vm1", "customerName": "ACME", "global_status": "Critical",
+           "monitored_services": {"cpu": "Critical", "disk": "OK"},
+           "monitoring_details": [{"objectClass": "cpu", "status": "Critical"},
+                                  {"objectClass": "disk", "status": "Ok"}]}
+
+def test_roundtrip_keeps_absent_keys_and_payloads(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    write_snapshot(path, ASSETS, {"1": PAYLOAD, "9": {"machine": "gone"}})
+    snap = Snapshot(path)
+    assert snap.assets() == ASSETS                 # csuName None ≠ clé absente
+    assert snap.payload("1") == PAYLOAD
+    assert snap.payload("2") is None and snap.asset_ids() == ["1"]
+    snap.close()
+
+def test_store_serves_until_discarded(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    write_snapshot(path, ASSETS, {"1": PAYLOAD})
+    store = SnapshotStore(path)
+    assert store.load()
+    assert store.stale_payload("1") == PAYLOAD
+    store.discard(["1"])
+    assert store.stale_payload("1") is None and store.loaded is None
+    assert not SnapshotStore(str(tmp_path / "absent.bin")).load()
+
+def test_failing_vms_rotate_then_are_dropped(tmp_path, monkeypatch):
+    import backend.snapshot as snapshot
+    monkeypatch.setattr(snapshot, "SNAPSHOT_RECONCILE_ATTEMPTS", 2)
+    path = str(tmp_path / "snap.bin")
+    write_snapshot(path, ASSETS, {"1": PAYLOAD, "2": {**PAYLOAD, "machine": "vm2"}})
+    store = SnapshotStore(path)
+    assert store.load() and store.pending() == ["1", "2"]
+    assert store.retry_later(["1"]) == [] and store.pending() == ["2", "1"]   # fin de file
+    store.discard(["2"])                                                       # rafraîchie ailleurs
+    assert store.retry_later(["1"]) == ["1"]
+    assert store.pending() == [] and store.loaded is None                      # instantané libéré
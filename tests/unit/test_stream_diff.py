@@ -0,0 +1,60 @@
+import importlib.util, sys
+from pathlib import Path
+
+from backend.summary import FleetSummary
+
+GATEWAY = Path(__file__).resolve().parents[2] / "api-gateway"
+sys.path.insert(0, str(GATEWAY))
+_spec = importlib.util.spec_from_file_location("gateway_stream", GATEWAY / "stream.py")
+stream = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stream)
+
+def vm(name, status, *checks):
+    return {"machine": name, "global_status": status,
+            "monitoring_details": [{"objectClass": oc, "parameter": "p", "object": "o",
+                                    "status": st} for oc, st in checks]}
+
+def test_diff_reports_only_changes():
+    old = stream.snapshot([vm("A", "OK", ("cpu", "Ok"), ("disk", "Ok")), vm("B", "OK")])
+    new = stream.snapshot([vm("A", "Critical", ("cpu", "Critical"), ("mem", "Warning"))])
+    events = {(e["type"], e["op"], e.get("key")) for e in stream.diff_snapshots(old, new)}
+    assert events == {
+        ("vm", "remove", None),
+        ("vm", "status", None),
+        ("check", "update", "cpu|p|o"),
+        ("check", "add", "mem|p|o"),
+        ("check", "remove", "disk|p|o"),
+    }
+    assert stream.diff_snapshots(new, new) == []
+
+def test_ko_any_matches_the_backend_summary():
+    for status in ("Critical", "KO", "error", "Not OK", "Warning", "Ok"):
+        s = FleetSummary()
+        s.update(1, {"machine": "A", "customerName": "ACME", "global_status": "-",
+                     "monitoring_details": [{"status": status}]})
+        snap = stream.snapshot([vm("A", "-", ("cpu", status))])
+        assert stream.ko_any(snap) is s.clients()["ACME"]["ko_any"], status
+    assert (GATEWAY / "status_buckets.py").read_text().splitlines()[1:] == \
+           (GATEWAY.parent / "backend" / "status_buckets.py").read_text().splitlines()[1:]
+
+def test_hub_is_dropped_with_its_last_subscriber():
+    import asyncio
+
+    async def loader(client):
+        return []
+
+    async def run():
+        hubs = stream.StreamHubs(loader)
+        gone = {"v": False}
+
+        async def disconnected():
+            return gone["v"]
+        a, b = hubs.events("ACME", disconnected), hubs.events("ACME", disconnected)
+        await a.__anext__(); await b.__anext__()
+        same = len(hubs._hubs) == 1 and hubs.stats() == {"ACME": 2}
+        await a.aclose()
+        still = "ACME" in hubs._hubs
+        await b.aclose()
+        return same, still, hubs._hubs
+    same, still, left = asyncio.run(run())
+    assert same and still and left == {}
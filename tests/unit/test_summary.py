@@ -0,0 +1,24 @@
+from backend.summary import FleetSummary
+
+def vm(name, client, status, *checks):
+    return {"machine": name, "customerName": client, "global_status": status,
+            "monitoring_details": [{"status": s, "parameter": p} for p, s in checks]}
+
+def test_counts_and_inverted_index_follow_updates():
+    s = FleetSummary()
+    s.update(1, vm("a", "ACME", "Critical", ("cpu", "Critical"), ("disk", "Ok")))
+    s.update(2, vm("b", "ACME", "OK", ("cpu", "Ok")))
+    assert s.clients()["ACME"]["ko_any"] is True
+    assert [r["vm"] for r in s.checks("critical")] == ["a"]
+
+    v = s.version
+    assert s.update(2, vm("b", "ACME", "OK", ("cpu", "Ok"))) is False and s.version == v
+    s.update(1, vm("a", "ACME", "OK", ("cpu", "Ok"), ("disk", "Ok")))
+    assert s.clients()["ACME"] == {"vms": {"OK": 2}, "checks": {"OK": 3}, "ko_any": False}
+    assert s.checks("Critical") == []
+
+def test_retain_drops_removed_assets():
+    s = FleetSummary()
+    s.update(1, vm("a", "ACME", "Warning", ("cpu", "Warning")))
+    s.retain([])
+    assert s.clients() == {} and len(s) == 0
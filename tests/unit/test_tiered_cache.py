@@ -0,0 +1,32 @@
+import json, time
+from backend.tiered_cache import LRUTTLCache
+
+def test_lru_evicts_least_recently_used():
+    c = LRUTTLCache(max_entries=2, default_ttl=60)
+    c.set("a", 1); c.set("b", 2)
+    c.get("a")                          # "b" devient la plus ancienne
+    c.set("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions == 1
+
+def test_ttl_and_byte_bound():
+    c = LRUTTLCache(max_entries=10, max_bytes=10)
+    c.set("x", 1, ttl=0.01, size=4)
+    time.sleep(0.02)
+    assert c.get("x") is None and c.expirations == 1
+    c.set("y", 1, ttl=60, size=6); c.set("z", 2, ttl=60, size=6)
+    assert len(c) == 1 and c.stats()["bytes"] == 6
+
+def test_l1_counts_decoded_size_not_compressed_bytes():
+    from backend.redis_cache import Codec
+    from backend.tiered_cache import TieredCache, L1_OBJECT_OVERHEAD
+
+    class L2:
+        codec = Codec(compression="zlib", threshold=0)
+
+    cache = TieredCache(L2(), l1=LRUTTLCache(max_entries=10, max_bytes=1 << 20))
+    vm  = {"monitoring_details": [{"status": "Ok", "description": "d" * 40}] * 50}
+    raw = L2.codec.encode(vm)
+    assert cache._fill("machine:1", raw) == vm
+    assert cache.l1.stats()["bytes"] > len(raw) * 10      # le zlib ne compte plus
+    assert cache.l1.stats()["bytes"] >= len(json.dumps(vm)) * L1_OBJECT_OVERHEAD * 0.9
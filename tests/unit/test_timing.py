@@ -0,0 +1,52 @@
+from backend import timing
+
+def test_spans_and_upstream_merge_end_up_in_header():
+    timings = {}
+    tok = timing._current.set(timings)
+    try:
+        with timing.span("redis_read"):
+            pass
+        timing.merge("be", "mib_status;dur=12.5, total;dur=20")
+    finally:
+        timing._current.reset(tok)
+    header = timing.header_value(timings, 30.0)
+    assert "redis_read;dur=" in header
+    assert "be-mib_status;dur=12.5" in header and header.endswith("total;dur=30.0")
+
+def test_span_outside_request_is_noop():
+    with timing.span("x"):
+        pass
+    assert timing._current.get() is None
+
+def test_profile_is_exclusive_and_skips_streams(monkeypatch):
+    import asyncio, httpx
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    monkeypatch.setattr(timing, "PROFILE_ENABLED", True)
+    app = FastAPI()
+    app.add_middleware(timing.ServerTimingMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            yield b"a\n"
+            yield b"b\n"
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t")
+        a, b = await asyncio.gather(client.get("/slow?profile=1"), client.get("/slow?profile=1"))
+        s = await client.get("/stream?profile=1")
+        after = await client.get("/slow?profile=1")
+        await client.aclose()
+        return sorted([a.status_code, b.status_code]), s, after
+    codes, s, after = asyncio.run(run())
+    assert codes == [200, 409]
+    assert s.content == b"a\nb\n"                   # flux relayé tel quel
+    assert after.status_code == 200 and after.text.startswith("# ")
@@ -0,0 +1,37 @@
+import asyncio, base64, json, time
+from backend.token_manager import TokenManager, jwt_expiry
+
+def make_jwt(exp):
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"e30.{claims}.sig"
+
+def test_jwt_expiry_reads_exp_claim():
+    assert jwt_expiry(make_jwt(1700000000)) == 1700000000
+    assert jwt_expiry("not-a-jwt") is None
+
+def test_valid_token_is_served_without_renewal():
+    mgr = TokenManager()
+    tok = make_jwt(time.time() + 600)
+    mgr._state = (tok, time.time() + 600)
+
+    async def boom(force):
+        raise AssertionError("pas de renouvellement attendu")
+    mgr._renew = boom
+    assert asyncio.run(mgr.get_token()) == tok
+
+def test_short_lived_token_is_not_refreshed_in_a_loop(monkeypatch):
+    import backend.token_manager as tm
+    mgr = TokenManager()
+    mgr._state, mgr._lifetime = (make_jwt(time.time() + 60), time.time() + 60), 60.0
+    assert mgr._lead() == 12.0                       # 20 % de 60 s, pas 120 s
+
+    sleeps = []
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        raise asyncio.CancelledError
+    monkeypatch.setattr(tm.asyncio, "sleep", fake_sleep)
+    try:
+        asyncio.run(mgr._refresher())
+    except asyncio.CancelledError:
+        pass
+    assert 45 < sleeps[0] <= 48